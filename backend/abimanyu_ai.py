@@ -1,13 +1,62 @@
 import os
 import random
-from typing import List, Dict, Optional
+import asyncio
+from typing import AsyncIterator, List, Dict, Optional
 from dotenv import load_dotenv
 from utils.rag import get_rag
 from services.ai_service import ai_service
+from services.chat_sessions import ChatSession, chat_sessions
+from utils.stage_executor import StageExecutor, StageOverloaded
+from utils.concurrency_limiter import ProviderOverloaded
+from utils.response_cache import response_cache
+from utils.prompt_builder import PromptBuilder
+from nlp.emotion import DEFAULT_GITA_EMOTION, detect_gita_emotion
 
 # Load environment variables
 load_dotenv()
 
+# Retrieval (embedding + vector search) is blocking; run it off the event loop and
+# answer without RAG context if it misses its deadline
+rag_executor = StageExecutor(
+    "rag-context",
+    max_workers=int(os.getenv("RAG_CONTEXT_WORKERS", "4")),
+    timeout=float(os.getenv("RAG_CONTEXT_TIMEOUT_SECONDS", "2.0")),
+    max_in_flight=int(os.getenv("RAG_CONTEXT_MAX_IN_FLIGHT", "0")) or None
+)
+
+# Chunks retrieved per message; the prompt builder keeps the diverse ones that fit its budget
+RAG_CONTEXT_CANDIDATES = int(os.getenv("RAG_CONTEXT_CANDIDATES", "6"))
+prompt_builder = PromptBuilder()
+# Log each turn's token budget breakdown; the aggregates are always in /ai/stats
+PROMPT_DEBUG = os.getenv("PROMPT_DEBUG", "0") == "1"
+
+# When every provider is saturated: "fallback" answers with the local response at once,
+# "reject" lets ProviderOverloaded through so the endpoint can answer 503 + Retry-After
+LLM_OVERLOAD_POLICY = os.getenv("LLM_OVERLOAD_POLICY", "fallback")
+
+# Static part of the prompt: sent as the provider's system instruction, identical for
+# every turn, while the per-turn prompt carries only the scenario data and context
+SYSTEM_INSTRUCTIONS = """
+    YOU ARE ABIMANYU AI, a divine and brave guide inspired by the Bhagavad Gita and India's heroic history.
+    Personality: Empathetic, Poetic, Unshakeable, and Wise.
+
+    Every message brings SCENARIO DATA (the user's message, whether it is a greeting, the
+    detected emotion, a Gita verse and a hero story to include) and CONTEXT FROM SACRED TEXTS.
+
+    INSTRUCTIONS:
+    1. IF 'Is Greeting' is True: Respond as a divine guide. Use words like "Namaste", "Pranam", or "Blessings". Be warm and ask how you can help them navigate their Dharma today. Keep it brief.
+    2. IF 'Is Greeting' is False: 
+       - Validate their feelings with deep empathy.
+       - Explicitly integrate the provided Gita Wisdom under the heading "📖 Eternal Wisdom from the Bhagavad Gita:".
+       - Explicitly integrate the provided Heroic Story under the heading "🇮🇳 Heroic Legacy of India:".
+       - If PDF context is relevant, weave it into your guidance naturally.
+       - Use markdown for a premium feel (bolding, blockquotes).
+       - Conclude with a powerful, motivating sentence about growth and Dharma.
+       - Sign off as "— Abimanyu".
+
+    TONE: Divine, serene, yet powerful. Use the wisdom and story provided as the soul of your response.
+    """
+
 # --- EXPANDED KNOWLEDGE BASE ---
 
 GITA_VERSES = {
@@ -115,15 +164,7 @@ def detect_intent_and_emotion(text):
     is_greeting = any(text.startswith(g) or text == g for g in greetings)
     
     # Emotion detection
-    emotion = "bravery"
-    if any(word in text for word in ["afraid", "scared", "fear", "worry", "anxious", "panic", "terrified"]): emotion = "fear"
-    elif any(word in text for word in ["angry", "hate", "mad", "frustrated", "kill", "annoyed", "rage"]): emotion = "anger"
-    elif any(word in text for word in ["sad", "crying", "grief", "lost", "hurt", "lonely", "miss", "depressed"]): emotion = "grief"
-    elif any(word in text for word in ["confused", "unsure", "help", "what to do", "doubt", "uncertain"]): emotion = "confusion"
-    elif any(word in text for word in ["weak", "tired", "can't", "give up", "hopeless", "failed", "exhausted"]): emotion = "weakness"
-    elif any(word in text for word in ["patience", "wait", "long time", "slow", "endure", "how long"]): emotion = "patience"
-    elif any(word in text for word in ["determined", "focus", "goal", "success", "willpower", "achieve"]): emotion = "determination"
-    elif any(word in text for word in ["sacrifice", "give up", "for others", "selfless", "duty"]): emotion = "sacrifice"
+    emotion = detect_gita_emotion(text)
     
     return is_greeting, emotion
 
@@ -144,23 +185,86 @@ def build_abimanyu_response(user_text, gita_wisdom, fighter_story, is_greeting):
     response += "— **Abimanyu**"
     return response
 
-async def ai_response(user_input: str, history: Optional[List[Dict[str, str]]] = None):
-    """Unified AI response handler with multi-provider support and RAG context."""
+def _retrieve_for_prompt(rag, user_input: str, k: int, emotion: Optional[str], sources: Optional[List[str]]):
+    """Blocking: context chunks (with stored embeddings) and the query vector for MMR"""
+    use_vectors = rag.embedder_ready
+    docs = rag.get_context_documents(
+        user_input, k, with_embeddings=use_vectors, emotion=emotion, sources=sources
+    )
+    query_vector = rag.embed_query(user_input) if use_vectors and len(docs) > 1 else None
+    return docs, query_vector
+
+async def get_rag_documents(
+    user_input: str,
+    emotion: Optional[str] = None,
+    k: int = RAG_CONTEXT_CANDIDATES,
+    sources: Optional[List[str]] = None
+):
+    """RAG chunks within the retrieval deadline, or ([], None) if late, overloaded or failing"""
+    rag = get_rag()
+    if not rag:
+        return [], None
+    try:
+        return await rag_executor.run(_retrieve_for_prompt, rag, user_input, k, emotion, sources)
+    except asyncio.TimeoutError:
+        print(f"RAG context timed out after {rag_executor.timeout}s, answering without it")
+    except StageOverloaded as e:
+        print(f"RAG context skipped: {e}")
+    except Exception as e:
+        print(f"RAG context error: {e}")
+    return [], None
+
+async def embed_for_cache(user_input: str):
+    """Query embedding for the response cache, or None if the embedder isn't available"""
+    rag = get_rag()
+    if not rag or not rag.embedder_ready:
+        return None
+    try:
+        return await rag_executor.run(rag.embed_query, user_input)
+    except Exception as e:
+        print(f"Response cache skipped: {e!r}")
+        return None
+
+async def _prepare_turn(
+    user_input: str,
+    history: Optional[List[Dict[str, str]]],
+    sources: Optional[List[str]],
+    session: Optional[ChatSession] = None
+) -> dict:
+    """
+    Everything before the LLM call: response-cache lookup, retrieval and prompt assembly.
+    Returns {"cached"} on a cache hit, else {"prompt", "history", "emotion", "cache_vector", "fallback"};
+    both carry the user's chat "session" (None for anonymous turns).
+    """
     is_greeting, emotion = detect_intent_and_emotion(user_input)
+
+    # The session holds the conversation (it was seeded from the stored history if new)
+    if session is not None:
+        history = list(session.messages)
+    
+    # Near-duplicate messages without conversation history can reuse a stored reply
+    cache_vector = None
+    if response_cache.enabled and not history and not sources:
+        cache_vector = await embed_for_cache(user_input)
+        if cache_vector is not None:
+            cached = response_cache.get(emotion, cache_vector)
+            if cached:
+                return {"cached": cached, "session": session}
     
     # Select wisdom and heroic story
     gita_wisdom = random.choice(GITA_VERSES.get(emotion, GITA_VERSES["bravery"]))
     fighter_story = random.choice(FIGHTER_STORIES.get(emotion, FIGHTER_STORIES["bravery"]))
 
     # Get relevant context from sacred texts via RAG
-    rag = get_rag()
-    pdf_context = rag.get_context(user_input, k=3) if rag else ""
+    # (a detected emotion re-ranks its precomputed pool; the default one searches everything)
+    docs, query_vector = await get_rag_documents(
+        user_input, emotion if emotion != DEFAULT_GITA_EMOTION else None, sources=sources
+    )
 
-    # SYSTEM PROMPT with personality and context
-    PROMPT = f"""
-    YOU ARE ABIMANYU AI, a divine and brave guide inspired by the Bhagavad Gita and India's heroic history.
-    Personality: Empathetic, Poetic, Unshakeable, and Wise.
-    
+    # Per-turn prompt: scenario data and context (instructions are in SYSTEM_INSTRUCTIONS)
+    def render(pdf_context: str, earlier: str) -> str:
+        earlier_block = f"\n    EARLIER IN THIS CONVERSATION (summary): {earlier}\n" if earlier else ""
+        return f"""
     SCENARIO DATA:
     - User Message: "{user_input}"
     - Is Greeting: {is_greeting}
@@ -170,28 +274,117 @@ async def ai_response(user_input: str, history: Optional[List[Dict[str, str]]] =
     
     CONTEXT FROM SACRED TEXTS:
     {pdf_context if pdf_context else "No additional context available"}
+    {earlier_block}
+    """
 
-    INSTRUCTIONS:
-    1. IF 'Is Greeting' is True: Respond as a divine guide. Use words like "Namaste", "Pranam", or "Blessings". Be warm and ask how you can help them navigate their Dharma today. Keep it brief.
-    2. IF 'Is Greeting' is False: 
-       - Validate their feelings with deep empathy.
-       - Explicitly integrate the provided Gita Wisdom under the heading "📖 Eternal Wisdom from the Bhagavad Gita:".
-       - Explicitly integrate the provided Heroic Story under the heading "🇮🇳 Heroic Legacy of India:".
-       - If PDF context is relevant, weave it into your guidance naturally.
-       - Use markdown for a premium feel (bolding, blockquotes).
-       - Conclude with a powerful, motivating sentence about growth and Dharma.
-       - Sign off as "— Abimanyu".
+    # Fit retrieved context and history into the token budget
+    PROMPT, history, token_report = prompt_builder.build(
+        render, user_input, docs, history, query_vector, system=SYSTEM_INSTRUCTIONS
+    )
+    if PROMPT_DEBUG:
+        print(
+            f"🧮 Prompt tokens: {token_report['total_tokens']}/{token_report['budget']} "
+            f"(context {token_report['context_tokens']} from {token_report['context_chunks']} chunks, "
+            f"history {token_report['history_tokens']} from {token_report['history_messages']} messages"
+            f"{', summarized' if token_report['summarized'] else ''})"
+        )
 
-    TONE: Divine, serene, yet powerful. Use the wisdom and story provided as the soul of your response.
+    return {
+        "cached": None,
+        "session": session,
+        "prompt": PROMPT,
+        "history": history,
+        "emotion": emotion,
+        "cache_vector": cache_vector,
+        # Local deterministic response if the AI service fails
+        "fallback": build_abimanyu_response(user_input, gita_wisdom, fighter_story, is_greeting),
+    }
+
+def _record(turn: dict, user_input: str, reply: str) -> str:
+    """Append the finished turn to the user's chat session; returns the reply"""
+    if turn["session"] is not None:
+        chat_sessions.record(turn["session"], user_input, reply)
+    return reply
+
+def _remember(turn: dict, response_text: str) -> None:
+    """Store an LLM reply in the response cache (SQLite write-through runs off the event loop)"""
+    if turn["cache_vector"] is not None:
+        stored = asyncio.get_running_loop().run_in_executor(
+            None, response_cache.put, turn["emotion"], turn["cache_vector"], response_text
+        )
+        stored.add_done_callback(_log_cache_write)
+
+def _log_cache_write(stored: asyncio.Future) -> None:
+    # Nobody awaits the write, so report its failure here rather than lose it
+    if not stored.cancelled() and stored.exception() is not None:
+        print(f"Response cache write skipped: {stored.exception()!r}")
+
+async def ai_response(
+    user_input: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    sources: Optional[List[str]] = None,
+    session: Optional[ChatSession] = None
+):
     """
+    Unified AI response handler with multi-provider support and RAG context.
+    `sources` restricts retrieval to those corpus files (e.g. ["moral_values_gita.txt"]).
+    `session` (the user's chat session) holds the conversation between turns.
+    """
+    turn = await _prepare_turn(user_input, history, sources, session)
+    if turn["cached"]:
+        return _record(turn, user_input, turn["cached"])
 
     try:
         # Use AI Service for enhanced connectivity (Gemini/OpenAI)
-        response_text = await ai_service.get_response(PROMPT, history=history)
+        response_text = await ai_service.get_response(
+            turn["prompt"], history=turn["history"], system=SYSTEM_INSTRUCTIONS
+        )
         if response_text:
-            return response_text
+            _remember(turn, response_text)
+            return _record(turn, user_input, response_text)
+    except ProviderOverloaded as e:
+        if LLM_OVERLOAD_POLICY == "reject":
+            raise
+        print(f"AI Service overloaded: {e}. Answering locally.")
+    except Exception as e:
+        print(f"AI Service Error: {e}. Falling back to local logic.")
+
+    return _record(turn, user_input, turn["fallback"])
+
+async def ai_response_stream(
+    user_input: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    sources: Optional[List[str]] = None,
+    session: Optional[ChatSession] = None
+) -> AsyncIterator[str]:
+    """
+    ai_response, yielding the reply in pieces as the provider produces them.
+    Falls back to the local response if the provider fails before its first piece;
+    a failure after that is raised, since part of the reply has already been sent.
+    """
+    turn = await _prepare_turn(user_input, history, sources, session)
+    if turn["cached"]:
+        yield _record(turn, user_input, turn["cached"])
+        return
+
+    parts = []
+    try:
+        async for delta in ai_service.stream_response(
+            turn["prompt"], history=turn["history"], system=SYSTEM_INSTRUCTIONS
+        ):
+            parts.append(delta)
+            yield delta
+    except ProviderOverloaded as e:
+        # Raised before the first piece (waiting for a slot)
+        if LLM_OVERLOAD_POLICY == "reject":
+            raise
+        print(f"AI Service overloaded: {e}. Answering locally.")
     except Exception as e:
+        if parts:
+            raise
         print(f"AI Service Error: {e}. Falling back to local logic.")
 
-    # Fallback to local deterministic response if AI service fails
-    return build_abimanyu_response(user_input, gita_wisdom, fighter_story, is_greeting)
+    if parts:
+        _remember(turn, _record(turn, user_input, "".join(parts)))
+    else:
+        yield _record(turn, user_input, turn["fallback"])
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark: Chroma (utils.rag, used by /chat) vs FAISS (utils.rag_pipeline)
+Each backend ingests the bundled data/extracted corpus into a scratch directory in
+its own subprocess, then replays a fixed set of emotional queries. Results are
+written as one JSON artifact so runs can be compared across commits.
+
+    python bench_rag.py                       # both backends → data/bench/<commit>.json
+    python bench_rag.py --backends faiss --out faiss.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = [
+    "I am afraid of failing my exams",
+    "I'm scared about my future",
+    "I feel so angry at my friend who betrayed me",
+    "My grandmother passed away and I can't stop crying",
+    "I feel lonely and lost",
+    "I am confused about what to do with my career",
+    "Should I follow my passion or my parents' wishes?",
+    "I feel weak and want to give up",
+    "I failed again, I feel hopeless",
+    "How do I stay patient when results are slow?",
+    "How can I stay determined to reach my goal?",
+    "What does it mean to do my duty without attachment?",
+    "Is it right to sacrifice my happiness for others?",
+    "How do I control my anger?",
+    "Why do good people suffer?",
+    "What happens to the soul after death?",
+    "How can I find peace of mind?",
+    "I am worried about my family's health",
+    "I feel like nobody understands me",
+    "How do I overcome fear of public speaking?",
+    "What is the meaning of karma yoga?",
+    "How should I deal with success and failure equally?",
+    "I keep doubting myself",
+    "How can I be brave like Arjuna?",
+]
+CONCURRENCY_LEVELS = [1, 8, 32]
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux /proc), falling back to peak RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource  # not available on Windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _dir_size_mb(path: str) -> float:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file()) / 2**20
+
+
+def _percentiles(samples_ms: list) -> dict:
+    ordered = sorted(samples_ms)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+def _open_backend(name: str, workdir: str, corpus: str):
+    """Build the backend over the corpus; returns (search_fn, stats_fn, model_load_s, build_s)"""
+    txt_files = sorted(str(p) for p in Path(corpus).glob("*.txt"))
+    if name == "chroma":
+        from utils.rag import RAGPipeline
+        rag = RAGPipeline(persist_dir=os.path.join(workdir, "vector_db"))
+        started = time.perf_counter()
+        rag.embedder_loader.get()
+        model_load = time.perf_counter() - started
+        started = time.perf_counter()
+        rag.ingest_directory(corpus)
+        build = time.perf_counter() - started
+        return (lambda q, k: rag.retrieve(q, k)), rag.get_stats, model_load, build
+
+    from utils.rag_pipeline import RAGPipeline
+    rag = RAGPipeline(data_dir=workdir)
+    started = time.perf_counter()
+    rag.embedder_loader.get()
+    model_load = time.perf_counter() - started
+    started = time.perf_counter()
+    if not rag.build_index(resume=False, sources=txt_files):
+        raise RuntimeError("FAISS index build failed")
+    build = time.perf_counter() - started
+    stats = lambda: {"chunks": len(rag.chunks), "index": rag.index_config.to_dict(), "recall": rag.recall_report}
+    return (lambda q, k: rag.retrieve_relevant_chunks(q, k)), stats, model_load, build
+
+
+def run_backend(name: str, corpus: str, k: int, repeats: int) -> dict:
+    """Benchmark one backend in this process (called in a fresh subprocess)"""
+    rss_start = _rss_mb()
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_", ignore_cleanup_errors=True) as workdir:
+        search, stats, model_load, build = _open_backend(name, workdir, corpus)
+        rss_built = _rss_mb()
+        index_size = _dir_size_mb(workdir)
+
+        # Warm-up pass, also the result set used for the overlap comparison
+        results = {q: search(q, k) for q in QUERIES}
+
+        latencies = []
+        for _ in range(repeats):
+            for q in QUERIES:
+                started = time.perf_counter()
+                search(q, k)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        throughput = {}
+        for concurrency in CONCURRENCY_LEVELS:
+            batch = QUERIES * max(1, (concurrency * 8) // len(QUERIES) + 1)
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                started = time.perf_counter()
+                list(pool.map(lambda q: search(q, k), batch))
+                elapsed = time.perf_counter() - started
+            throughput[str(concurrency)] = round(len(batch) / elapsed, 2)
+
+        return {
+            "backend": name,
+            "model_load_s": round(model_load, 3),
+            "build_s": round(build, 3),
+            "index_size_mb": round(index_size, 3),
+            "rss_mb": {
+                "start": round(rss_start, 1),
+                "after_build": round(rss_built, 1),
+                "end": round(_rss_mb(), 1),
+            },
+            "latency": _percentiles(latencies),
+            "queries_timed": len(latencies),
+            "throughput_qps": throughput,
+            "stats": stats(),
+            "results": results,
+        }
+
+
+def _coverage(chunks: list, corpus: list) -> set:
+    """Character positions of the corpus covered by the chunks (backends chunk differently)"""
+    covered = set()
+    for chunk in chunks:
+        for file_idx, text in enumerate(corpus):
+            start = text.find(chunk)
+            if start >= 0:
+                covered.update((file_idx, pos) for pos in range(start, start + len(chunk)))
+                break
+    return covered
+
+
+def _overlap(a: dict, b: dict, corpus: list) -> dict:
+    """Mean character-level Jaccard overlap of the text two backends returned per query"""
+    scores = []
+    for q in QUERIES:
+        left, right = _coverage(a.get(q, []), corpus), _coverage(b.get(q, []), corpus)
+        if left or right:
+            scores.append(len(left & right) / len(left | right))
+    return {"mean_jaccard": round(statistics.fmean(scores), 4) if scores else None, "queries": len(scores)}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Chroma and FAISS retrieval backends")
+    parser.add_argument("--backends", default="chroma,faiss", help="Comma-separated: chroma, faiss")
+    parser.add_argument("--corpus", default="data/extracted", help="Directory of .txt files to ingest")
+    parser.add_argument("--k", type=int, default=3, help="Chunks retrieved per query")
+    parser.add_argument("--repeats", type=int, default=5, help="Sequential passes over the query set")
+    parser.add_argument("--out", help="Output JSON path (default data/bench/retrieval_<commit>.json)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.corpus, args.k, args.repeats)))
+        return
+
+    # Caches would turn repeated queries into dictionary lookups; measure the real path
+    env = dict(os.environ, RAG_EMBEDDING_CACHE_SIZE="0", RAG_RESULT_CACHE_SIZE="0")
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "corpus": args.corpus,
+        "k": args.k,
+        "repeats": args.repeats,
+        "queries": len(QUERIES),
+        "backends": {},
+    }
+    for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        print(f"⏱️  Benchmarking {name}...")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", name, "--corpus", args.corpus,
+             "--k", str(args.k), "--repeats", str(args.repeats)],
+            env=env, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(proc.stderr)
+            report["backends"][name] = {"error": proc.stderr.strip().splitlines()[-1:] or ["failed"]}
+            continue
+        # The worker prints progress too; its report is the last line
+        report["backends"][name] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    ok = {n: r for n, r in report["backends"].items() if "results" in r}
+    if len(ok) == 2:
+        (a, ra), (b, rb) = ok.items()
+        corpus = [p.read_text(encoding="utf-8") for p in sorted(Path(args.corpus).glob("*.txt"))]
+        report["overlap"] = {f"{a}_vs_{b}": _overlap(ra["results"], rb["results"], corpus)}
+    for r in ok.values():
+        r.pop("results")
+
+    out = args.out or os.path.join("data", "bench", f"retrieval_{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, r in report["backends"].items():
+        if "error" in r:
+            print(f"❌ {name}: {r['error']}")
+            continue
+        print(f"✅ {name}: build {r['build_s']}s, {r['index_size_mb']} MB on disk, "
+              f"p50 {r['latency']['p50_ms']} ms / p99 {r['latency']['p99_ms']} ms, "
+              f"{r['throughput_qps']} qps")
+    if "overlap" in report:
+        print(f"   overlap: {report['overlap']}")
+    print(f"📄 Report written to {out}")
+
+
+if __name__ == "__main__":
+    main()
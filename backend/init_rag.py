@@ -23,8 +23,9 @@ if __name__ == "__main__":
             print(f"✅ RAG Pipeline initialized successfully!")
             print(f"   - Chunks: {len(rag.chunks)}")
             print(f"   - Model: {rag.model_name}")
-            print(f"   - Index saved to: data/vector_index.faiss")
+            print(f"   - Index saved to: {rag.generations.path(rag.generation)}")
         else:
             print("❌ Failed to build RAG index")
             print("   Make sure PDFs are in: backend/data/docs/")
+            print("   Progress is checkpointed in data/index/staging/, rerun to resume")
             sys.exit(1)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+End-to-end /chat load test against simulated providers
+Starts the FastAPI app in-process (uvicorn on a free local port) with the LLM and TTS
+providers simulated (services/simulated.py), drives /chat or /chat/stream at each
+concurrency level and reports throughput, latency percentiles per stage and the lag
+of the server's event loop. Results are written as one JSON artifact, like bench_rag.py.
+
+    python load_test.py                                  # stream mode, levels 1,8,32
+    python load_test.py --mode chat --concurrency 16 --requests 400
+    SIM_GEMINI_LATENCY_MS=3000,9000 python load_test.py  # one slow provider
+
+Stages of a streamed turn: first_token (retrieval + time to the provider's first
+piece), generation (rest of the reply), tts (sentiment + speech synthesis) and total.
+The client shares the event loop with the server, so the measured loop lag is an
+upper bound of what the server alone would see.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import socket
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_rag import QUERIES, _git_commit, _percentiles
+
+LAG_INTERVAL = 0.01
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _probe_loop_lag(samples: list, stop: asyncio.Event) -> None:
+    """Record how late a periodic timer fires; a blocked event loop shows up as lag"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, (time.perf_counter() - started - LAG_INTERVAL) * 1000))
+
+
+async def _chat_once(client, message: str) -> dict:
+    started = time.perf_counter()
+    resp = await client.post("/chat", json={"message": message})
+    total = (time.perf_counter() - started) * 1000
+    body = resp.json() if resp.status_code == 200 else {}
+    # /chat answers 200 with an apology when something failed inside
+    ok = resp.status_code == 200 and not body.get("reply", "").startswith("I'm experiencing")
+    return {"ok": ok, "total": total}
+
+
+async def _stream_once(client, message: str) -> dict:
+    started = time.perf_counter()
+    marks = {}
+    async with client.stream("POST", "/chat/stream", json={"message": message}) as resp:
+        if resp.status_code != 200:
+            return {"ok": False, "total": (time.perf_counter() - started) * 1000}
+        async for line in resp.aiter_lines():
+            if line.startswith("event: "):
+                # First occurrence of each event marks the end of a stage
+                marks.setdefault(line[7:], (time.perf_counter() - started) * 1000)
+    total = (time.perf_counter() - started) * 1000
+    if "error" in marks or "done" not in marks:
+        return {"ok": False, "total": total}
+    first = marks.get("token", marks["done"])
+    generated = marks.get("sentiment", marks["done"])
+    return {
+        "ok": True,
+        "first_token": first,
+        "generation": generated - first,
+        "tts": marks.get("audio", marks["done"]) - generated,
+        "total": total,
+    }
+
+
+async def run_level(client, mode: str, concurrency: int, requests: int) -> dict:
+    """`requests` turns with `concurrency` of them in flight at a time"""
+    once = _stream_once if mode == "stream" else _chat_once
+    results, lag = [], []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            try:
+                results.append(await once(client, QUERIES[i % len(QUERIES)]))
+            except Exception as e:
+                results.append({"ok": False, "error": repr(e)})
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_loop_lag(lag, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    ok = [r for r in results if r["ok"]]
+    stages = ["first_token", "generation", "tts", "total"] if mode == "stream" else ["total"]
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency": {stage: _percentiles([r[stage] for r in ok]) for stage in stages} if ok else {},
+        "loop_lag": dict(_percentiles(lag), max_ms=round(max(lag), 3)) if lag else {},
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    import uvicorn
+    from main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+
+    levels = []
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits
+        ) as client:
+            for concurrency in args.concurrency:
+                print(f"⏱️  {args.mode}: {args.requests} requests at concurrency {concurrency}...")
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if args.quiet else sys.stdout):
+                    levels.append(await run_level(client, args.mode, concurrency, args.requests))
+            # Server-side counters (routing, hedging, caches) at the end of the run
+            server_stats = (await client.get("/ai/stats")).json().get("data")
+    finally:
+        server.should_exit = True
+        await serving
+    return {"levels": levels, "server": server_stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /chat with simulated LLM and TTS providers")
+    parser.add_argument("--mode", choices=["stream", "chat"], default="stream", help="/chat/stream or /chat")
+    parser.add_argument(
+        "--concurrency", default="1,8,32", type=lambda v: [int(c) for c in v.split(",")],
+        help="Comma-separated concurrency levels"
+    )
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request (seconds)")
+    parser.add_argument("--real-providers", action="store_true", help="Don't simulate (spends API credits)")
+    parser.add_argument("--verbose", dest="quiet", action="store_false", help="Keep the server's log output")
+    parser.add_argument("--out", help="Output JSON path (default data/bench/load_<commit>.json)")
+    args = parser.parse_args()
+
+    # Must be set before the app (and with it AIService and voice) is imported
+    if not args.real_providers:
+        os.environ.setdefault("SIMULATE_PROVIDERS", "all")
+    # Identical queries would be answered from the response cache instead of the providers
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "mode": args.mode,
+        "simulated": os.getenv("SIMULATE_PROVIDERS", ""),
+        "simulation": {k: v for k, v in os.environ.items() if k.startswith("SIM_")},
+    }
+    report.update(asyncio.run(run(args)))
+
+    out = args.out or os.path.join("data", "bench", f"load_{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for level in report["levels"]:
+        total = level["latency"].get("total", {})
+        print(f"✅ concurrency {level['concurrency']}: {level['throughput_rps']} req/s, "
+              f"{level['errors']} errors, total p50 {total.get('p50_ms')} ms / p99 {total.get('p99_ms')} ms, "
+              f"loop lag p99 {level['loop_lag'].get('p99_ms')} ms")
+        if "first_token" in level["latency"]:
+            print(f"   first token p50 {level['latency']['first_token']['p50_ms']} ms, "
+                  f"tts p50 {level['latency']['tts']['p50_ms']} ms")
+    print(f"📄 Report written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+import asyncio
+import contextlib
+import hashlib
+import json
 import uvicorn
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, ValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import AsyncIterator, Dict, Optional, List, Tuple
 from datetime import datetime
 from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from threading import Thread
 
-from abimanyu_ai import ai_response
+from abimanyu_ai import ai_response, ai_response_stream, prompt_builder, rag_executor
+from services.chat_sessions import ChatSession, chat_sessions
 from voice import get_audio_base64
 from database import get_db, init_db, SessionLocal
 from models import User, ChatMessage
@@ -24,9 +29,20 @@ from auth import (
     verify_google_token
 )
 from utils.rag import init_rag
+from utils.readiness import readiness
+from utils.response_cache import response_cache
+from utils.jobs import JobAlreadyRunning, jobs
+from utils.single_flight import SingleFlight
+from utils.concurrency_limiter import ProviderOverloaded
+from services.ai_service import ai_service
 
 app = FastAPI(title="Abimanyu AI", version="2.0")
 
+# Identical chat turns in flight at the same time (a user's resend after a client
+# timeout, the same greeting from many anonymous users) share one RAG + LLM + TTS run,
+# on /chat as well as on the streaming endpoints
+chat_flights = SingleFlight("chat")
+
 # Limit request body size to 1MB to prevent memory crashes
 class LimitedBodyMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -44,9 +60,23 @@ app.add_middleware(LimitedBodyMiddleware)
 # Initialize database and RAG on startup
 @app.on_event("startup")
 def startup():
-    init_db()
+    readiness.begin("db")
+    try:
+        init_db()
+        readiness.ready("db")
+    except Exception as e:
+        readiness.failed("db", str(e))
+        raise
 
-    # Initialize RAG in a background thread so server startup isn't blocked
+    readiness.begin("providers")
+    providers = ai_service.available_providers()
+    if providers:
+        readiness.ready("providers", ", ".join(providers))
+    else:
+        readiness.degraded("providers", "no LLM provider configured, answering with local responses")
+
+    # Load the RAG index snapshot and warm the embedder in a background thread so
+    # server startup isn't blocked; /health reports ready once it is done
     def _init_rag_bg():
         try:
             init_rag()
@@ -56,6 +86,10 @@ def startup():
     t = Thread(target=_init_rag_bg, daemon=True)
     t.start()
 
+@app.on_event("shutdown")
+async def shutdown():
+    await ai_service.aclose()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -66,6 +100,14 @@ app.add_middleware(
 
 @app.get("/health")
 def health_check():
+    """Readiness: 200 once every startup phase is done (or degraded), 503 while warming up or if the database failed"""
+    report = readiness.snapshot()
+    report["timestamp"] = datetime.now().isoformat()
+    return JSONResponse(report, status_code=200 if report["status"] == "ready" else 503)
+
+@app.get("/health/live")
+def liveness_check():
+    """Liveness: the process is up and serving HTTP"""
     return {"status": "healthy", "timestamp": datetime.now()}
 
 @app.get("/rag/stats")
@@ -73,12 +115,26 @@ def rag_stats():
     """Get RAG pipeline statistics"""
     from utils.rag import get_rag
     try:
+        from utils import rag_pipeline
         rag = get_rag()
+        if rag is None:
+            return {"success": False, "error": "RAG pipeline is still loading", "readiness": readiness.snapshot()}
         stats = rag.get_stats()
+        stats["context_retrieval"] = rag_executor.stats()
+        # Only report the FAISS pipeline if something already loaded it
+        if rag_pipeline._rag_instance is not None:
+            stats["faiss_query_cache"] = rag_pipeline._rag_instance.query_cache.stats()
         return {"success": True, "data": stats}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@app.get("/ai/stats")
+def ai_stats():
+    """LLM-side statistics (response cache, provider latency, hedging, circuit breakers and prompt token budgets)"""
+    return {"success": True, "data": {"response_cache": response_cache.stats(), "routing": ai_service.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "coalescing": chat_flights.stats(), "prompt": prompt_builder.stats()}}
+
 @app.post("/test/create-demo-user")
 def create_demo_user(db: Session = Depends(get_db)):
     """Create a demo user for testing."""
@@ -142,6 +198,8 @@ class UserResponse(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
+    # Restrict retrieval to these corpus files (None = all shards)
+    sources: Optional[List[str]] = None
 
 class ChatResponse(BaseModel):
     reply: str
@@ -357,30 +415,19 @@ async def chat(
 ):
     """Send a chat message and get AI response. Optionally saves history if authenticated."""
     try:
-        history = []
-        # Save user message if authenticated
-        if user:
-            user_msg = ChatMessage(
-                user_id=user.id,
-                content=request.message,
-                is_ai=False
+        history, session = _start_turn(db, user, request.message)
+
+        async def answer() -> Tuple[str, Optional[str]]:
+            # Get AI response (now async)
+            reply = await ai_response(
+                request.message, history=history, sources=request.sources, session=session
             )
-            db.add(user_msg)
-            
-            # Fetch recent history for context (last 10 messages)
-            recent_msgs = db.query(ChatMessage).filter(
-                ChatMessage.user_id == user.id
-            ).order_by(ChatMessage.timestamp.desc()).limit(10).all()
-            
-            # Convert to service format
-            for msg in reversed(recent_msgs):
-                history.append({
-                    "role": "model" if msg.is_ai else "user",
-                    "content": msg.content
-                })
-
-        # Get AI response (now async)
-        reply = await ai_response(request.message, history=history)
+            # Generate audio (optional)
+            # TTS is a blocking HTTP call; keep it off the event loop
+            return reply, await asyncio.to_thread(get_audio_base64, reply)
+
+        key = _flight_key(request.message, request.sources, user.id if user else None)
+        reply, audio_b64 = await chat_flights.do(key, answer)
         
         # Analyze sentiment
         sentiment = analyze_sentiment(request.message)
@@ -395,11 +442,15 @@ async def chat(
             db.add(ai_msg)
             db.commit()
         
-        # Generate audio (optional)
-        audio_b64 = get_audio_base64(reply)
-        
         return ChatResponse(reply=reply, sentiment=sentiment, audio=audio_b64)
     
+    except ProviderOverloaded as e:
+        # LLM_OVERLOAD_POLICY=reject: shed load instead of queueing more work
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Abimanyu is answering many seekers right now. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         print(f"Chat Error: {e}")
         return ChatResponse(
@@ -408,6 +459,169 @@ async def chat(
             audio=None
         )
 
+def _flight_key(message: str, sources: Optional[List[str]], user_id: Optional[int]) -> str:
+    """
+    Identity of a chat turn for coalescing: the normalized message and sources, plus the
+    conversation it continues. A signed-in user's conversation is their own, identified
+    by user id (a resend sees the unanswered first copy in its history, so the history
+    itself can't be compared). Anonymous turns carry no conversation at all, nothing is
+    stored for them, so the same message from any anonymous caller is the same turn.
+    """
+    digest = hashlib.sha256()
+    digest.update(" ".join(message.casefold().split()).encode("utf-8"))
+    digest.update(b"\0" + ",".join(sorted(sources or [])).encode("utf-8"))
+    if user_id is not None:
+        digest.update(f"\0user:{user_id}".encode("utf-8"))
+    return digest.hexdigest()
+
+def _start_turn(
+    db: Session, user: Optional[User], message: str
+) -> Tuple[List[Dict[str, str]], Optional[ChatSession]]:
+    """
+    Add the user's message (if authenticated) and resolve their chat session: the live one,
+    or a new one seeded from their recent stored history. Returns (history, session);
+    history is empty when the session was already live, since it holds the conversation.
+    """
+    history = []
+    session = None
+    if user:
+        user_msg = ChatMessage(
+            user_id=user.id,
+            content=message,
+            is_ai=False
+        )
+        db.add(user_msg)
+        # One lookup: a session evicted after a separate check would lose the conversation
+        session = chat_sessions.lookup(user.id)
+        if session is not None:
+            return history, session
+        
+        # Fetch recent history for context (last 10 messages)
+        recent_msgs = db.query(ChatMessage).filter(
+            ChatMessage.user_id == user.id
+        ).order_by(ChatMessage.timestamp.desc()).limit(10).all()
+        
+        # Convert to service format
+        for msg in reversed(recent_msgs):
+            history.append({
+                "role": "model" if msg.is_ai else "user",
+                "content": msg.content
+            })
+
+        # The current message is recorded in the session together with its reply
+        seed = list(history)
+        if seed and seed[-1]["role"] == "user" and seed[-1]["content"].strip() == message.strip():
+            seed.pop()
+        session = chat_sessions.get(user.id, seed)
+    return history, session
+
+async def _chat_events(
+    message: str,
+    sources: Optional[List[str]],
+    user_id: Optional[int]
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    (event, data) pairs of one streamed chat turn: "token" pieces as the reply is
+    generated, then "sentiment", "audio" and "done" (full reply), or "error"
+    """
+    # Own session: the request's dependency session may be closed before a stream ends
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first() if user_id else None
+        history, session = _start_turn(db, user, message)
+        if user:
+            db.commit()
+
+        parts = []
+        async for delta in ai_response_stream(
+            message, history=history, sources=sources, session=session
+        ):
+            parts.append(delta)
+            yield "token", {"text": delta}
+        reply = "".join(parts)
+
+        # Persist the complete reply once the stream has finished
+        if user:
+            db.add(ChatMessage(user_id=user.id, content=reply, is_ai=True))
+            db.commit()
+
+        yield "sentiment", {"sentiment": analyze_sentiment(message)}
+        # TTS is a blocking HTTP call; keep it off the event loop
+        yield "audio", {"audio": await asyncio.to_thread(get_audio_base64, reply)}
+        yield "done", {"reply": reply}
+    except ProviderOverloaded as e:
+        yield "error", {
+            "message": "Abimanyu is answering many seekers right now. Please try again shortly.",
+            "retry_after": e.retry_after
+        }
+    except Exception as e:
+        print(f"Chat Stream Error: {e}")
+        yield "error", {"message": "I'm experiencing some technical difficulties. Please try again later."}
+    finally:
+        db.close()
+
+def _shared_chat_events(
+    message: str,
+    sources: Optional[List[str]],
+    user_id: Optional[int]
+) -> AsyncIterator[Tuple[str, dict]]:
+    """_chat_events, shared with identical turns already streaming (see _flight_key)"""
+    return chat_flights.stream(
+        _flight_key(message, sources, user_id), lambda: _chat_events(message, sources, user_id)
+    )
+
+def _user_id_from_token(token: Optional[str]) -> Optional[int]:
+    payload = decode_access_token(token) if token else None
+    user_id = payload.get("sub") if payload else None
+    return int(user_id) if user_id else None
+
+@app.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    user: Optional[User] = Depends(get_current_user)
+):
+    """
+    Server-Sent Events variant of /chat: "token" events arrive as the reply is
+    generated, followed by "sentiment", "audio" and "done".
+    """
+    user_id = user.id if user else None
+
+    async def events():
+        # Closed explicitly so a dropped client ends the turn now (unless others share it)
+        async with contextlib.aclosing(_shared_chat_events(request.message, request.sources, user_id)) as turn:
+            async for event, data in turn:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies must pass each event through as soon as it is written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket, token: Optional[str] = None):
+    """
+    WebSocket variant of /chat/stream. Send {"message", "sources"?} per turn; every
+    event comes back as {"event": ..., ...data}. Browsers can't set headers on a
+    WebSocket, so the JWT is passed as ?token=.
+    """
+    user_id = _user_id_from_token(token)
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                request = ChatRequest(**await websocket.receive_json())
+            except (ValidationError, TypeError, ValueError) as e:
+                await websocket.send_json({"event": "error", "message": f"Invalid chat message: {e}"})
+                continue
+            # A failed send leaves the turn unfinished: close it rather than leave it to the GC
+            async with contextlib.aclosing(_shared_chat_events(request.message, request.sources, user_id)) as turn:
+                async for event, data in turn:
+                    await websocket.send_json({"event": event, **data})
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/chat/history", response_model=List[ChatHistoryItem])
 def get_chat_history(
     limit: int = 50,
@@ -440,23 +654,46 @@ def clear_chat_history(
     """Clear chat history for authenticated user."""
     db.query(ChatMessage).filter(ChatMessage.user_id == user.id).delete()
     db.commit()
+    chat_sessions.drop(user.id)
     return {"message": "Chat history cleared"}
 
 # ========== RAG MANAGEMENT ENDPOINTS ==========
 @app.post("/admin/rag/rebuild")
 def rebuild_rag_index():
-    """Rebuild vector index from PDFs (admin only)"""
+    """
+    Start a background rebuild of the vector index from PDFs (admin only).
+    The live index keeps serving until the new generation is swapped in;
+    poll GET /admin/rag/jobs/{id} for progress.
+    """
     try:
         from utils.rag_pipeline import get_rag_pipeline
         rag = get_rag_pipeline()
-        success = rag.build_index()
-        if success:
-            return {"status": "success", "message": f"RAG index rebuilt with {len(rag.chunks)} chunks"}
-        else:
-            return {"status": "error", "message": "Failed to build index"}
+
+        def rebuild(progress):
+            if not rag.build_index(progress=progress):
+                return False
+            return {"generation": rag.generation, "chunks": len(rag.chunks), "recall": rag.recall_report}
+
+        job = jobs.submit("rag-rebuild", rebuild)
+        return {"status": "accepted", "message": f"RAG rebuild started as job {job['id']}", "job": job}
+    except JobAlreadyRunning as e:
+        return {"status": "error", "message": str(e), "job": e.job}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/admin/rag/jobs")
+def rag_jobs():
+    """Recent RAG rebuild jobs (index and shard rebuilds), newest first"""
+    return {"status": "success", "data": [job for job in jobs.list() if job["kind"].startswith("rag-")]}
+
+@app.get("/admin/rag/jobs/{job_id}")
+def rag_job(job_id: int):
+    """State, progress and result of one rebuild job"""
+    job = jobs.get(job_id)
+    if job is None:
+        return {"status": "error", "message": f"Job {job_id} not found"}
+    return {"status": "success", "data": job}
+
 @app.get("/admin/rag/status")
 def rag_status():
     """Get RAG pipeline status"""
@@ -465,12 +702,63 @@ def rag_status():
         rag = get_rag_pipeline()
         return {
             "status": "ready" if rag.vector_store else "not_ready",
+            "generation": rag.generation,
             "chunks_count": len(rag.chunks),
-            "model": rag.model_name
+            "model": rag.model_name,
+            "query_cache": rag.query_cache.stats(),
+            "embedding_batcher": rag.batcher.stats(),
+            "embedder": rag.embedder_loader.stats(),
+            "retrieval_modes": dict(rag.retrieval_modes),
+            "index": rag.index_config.to_dict(),
+            "recall": rag.recall_report,
+            "rebuild": next(iter(jobs.list("rag-rebuild")), None)
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/admin/rag/shards")
+def rag_shards():
+    """Chunk count per source shard of the /chat index"""
+    from utils.rag import get_rag
+    rag = get_rag()
+    if rag is None:
+        return {"status": "error", "message": "RAG pipeline is still loading"}
+    try:
+        return {"status": "success", "data": rag.shards.counts()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.post("/admin/rag/shards/{source}/rebuild")
+def rebuild_rag_shard(source: str):
+    """
+    Start a background re-embed of one source's shard of the /chat index, leaving the
+    others as they are. The current shard keeps serving until the new one is swapped
+    in; poll GET /admin/rag/jobs/{id} for the result.
+    """
+    from utils.rag import get_rag
+    rag = get_rag()
+    if rag is None:
+        return {"status": "error", "message": "RAG pipeline is still loading"}
+    if not rag.known_source(source):
+        return {"status": "error", "message": f"Unknown source: {source}"}
+    try:
+        job = jobs.submit("rag-shard-rebuild", lambda progress: rag.rebuild_shard(source))
+        return {"status": "accepted", "message": f"Shard {source} rebuild started as job {job['id']}", "job": job}
+    except JobAlreadyRunning as e:
+        return {"status": "error", "message": str(e), "job": e.job}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/admin/rag/recall")
+def rag_recall(k: int = 10, sample_size: int = 200):
+    """Measure recall@k of the configured index against the exact flat index"""
+    try:
+        from utils.rag_pipeline import get_rag_pipeline
+        rag = get_rag_pipeline()
+        return {"status": "success", "data": rag.evaluate_recall(k=k, sample_size=sample_size)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app", 
@@ -1,3 +1,47 @@
+# Emotions used to pick Gita wisdom and hero stories in abimanyu_ai, checked in order;
+# messages matching none of them are treated as a call for bravery
+GITA_EMOTION_KEYWORDS = {
+    "fear": ["afraid", "scared", "fear", "worry", "anxious", "panic", "terrified"],
+    "anger": ["angry", "hate", "mad", "frustrated", "kill", "annoyed", "rage"],
+    "grief": ["sad", "crying", "grief", "lost", "hurt", "lonely", "miss", "depressed"],
+    "confusion": ["confused", "unsure", "help", "what to do", "doubt", "uncertain"],
+    "weakness": ["weak", "tired", "can't", "give up", "hopeless", "failed", "exhausted"],
+    "patience": ["patience", "wait", "long time", "slow", "endure", "how long"],
+    "determination": ["determined", "focus", "goal", "success", "willpower", "achieve"],
+    "sacrifice": ["sacrifice", "give up", "for others", "selfless", "duty"],
+}
+DEFAULT_GITA_EMOTION = "bravery"
+
+# Extra vocabulary describing how the Gita speaks to each emotion, used with the
+# keywords above to precompute per-emotion retrieval candidates
+GITA_EMOTION_SEED_TERMS = {
+    "fear": ["fearless", "soul eternal", "death", "unborn", "steady mind", "protection"],
+    "anger": ["desire", "delusion", "self-control", "lust", "calm", "senses"],
+    "grief": ["sorrow", "lament", "death", "soul", "body", "mourn"],
+    "confusion": ["dharma", "duty", "wisdom", "knowledge", "path", "discrimination"],
+    "weakness": ["strength", "arise", "faint-heartedness", "despondency", "courage"],
+    "patience": ["equanimity", "endurance", "steady", "pleasure and pain", "tolerance"],
+    "determination": ["resolute", "discipline", "yoga", "practice", "single-pointed"],
+    "sacrifice": ["yajna", "offering", "renunciation", "without attachment", "selfless action"],
+    "bravery": ["courage", "valor", "warrior", "battle", "fight", "kshatriya", "heroism"],
+}
+
+
+def detect_gita_emotion(text: str) -> str:
+    """Map a message to one of the Gita emotions (first keyword group that matches)"""
+    text = text.lower()
+    for emotion, keywords in GITA_EMOTION_KEYWORDS.items():
+        if any(word in text for word in keywords):
+            return emotion
+    return DEFAULT_GITA_EMOTION
+
+
+def emotion_seed_query(emotion: str) -> str:
+    """Seed vocabulary of an emotion as one retrieval query"""
+    terms = [emotion] + GITA_EMOTION_KEYWORDS.get(emotion, []) + GITA_EMOTION_SEED_TERMS.get(emotion, [])
+    return " ".join(dict.fromkeys(terms))
+
+
 def detect_emotion(text: str) -> str:
     """
     Detect basic emotion from text.
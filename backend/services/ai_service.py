@@ -1,78 +1,363 @@
 import os
 import random
-from typing import List, Dict, Optional, Any
+import asyncio
+import time
+from typing import AsyncIterator, List, Dict, Optional, Any
+import httpx
 import google.generativeai as genai
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from utils.provider_health import ProviderHealth
+from utils.concurrency_limiter import AdaptiveLimiter, ProviderOverloaded
+from services import simulated
 
 load_dotenv()
 
+# History is stored with Gemini's role names; OpenAI calls the model "assistant"
+OPENAI_ROLES = {"user": "user", "model": "assistant", "assistant": "assistant", "system": "system"}
+
 class AIService:
     def __init__(self):
         self.gemini_key = os.getenv("GEMINI_API_KEY")
         self.openai_key = os.getenv("OPENAI_API_KEY")
         self.anthropic_key = os.getenv("ANTHROPIC_API_KEY")
         
+        # Provider calls are awaited natively, so the event loop keeps serving other
+        # users while a reply is generated; every call has a deadline
+        self.connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+        self.timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+        self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+        # SDK retries (with backoff) on 429/5xx and connection errors; 2 is the SDK default
+        self.openai_max_retries = int(os.getenv("LLM_OPENAI_MAX_RETRIES", "2"))
+        
         # Configure Gemini
         if self.gemini_key and "your_" not in self.gemini_key.lower():
             genai.configure(api_key=self.gemini_key)
             self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
         else:
             self.gemini_model = None
+        # Local stand-ins with configurable latency and errors, for load testing (SIMULATE_PROVIDERS)
+        self.simulated: Dict[str, simulated.SimulatedLLM] = {}
+        if simulated.enabled("llm"):
+            self.simulated = {name: simulated.SimulatedLLM(name) for name in ("gemini", "openai")}
+            print("🧪 LLM providers are simulated")
+
+        # One model object per system instruction, created once (instructions are fixed)
+        self._gemini_models: Dict[str, Any] = {}
             
-        # Configure OpenAI
+        # Configure OpenAI (one pooled HTTP client, connections kept alive between calls)
         if self.openai_key and "your_" not in self.openai_key.lower():
-            self.openai_client = OpenAI(api_key=self.openai_key)
+            self.openai_client = AsyncOpenAI(
+                api_key=self.openai_key,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                max_retries=self.openai_max_retries,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections
+                    )
+                )
+            )
         else:
             self.openai_client = None
 
+        # Latency-aware routing: the provider with the lower observed latency goes first,
+        # and if it is still running past its own p95 the other one is asked as well
+        # (first answer wins, the loser is cancelled)
+        self.health = {name: ProviderHealth(name) for name in ("gemini", "openai")}
+        self.hedge_enabled = os.getenv("LLM_HEDGE", "1") != "0"
+        # Hedge delay until a provider has enough samples for a meaningful p95
+        self.hedge_default_delay = float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "4"))
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self.hedges = 0
+        self.hedge_wins = 0
+
+        # Concurrent calls per provider are capped by an AIMD limit with a short wait
+        # queue; calls that can't get a slot in time raise ProviderOverloaded
+        self.limiters = {name: AdaptiveLimiter(name) for name in ("gemini", "openai")}
+
+    def available_providers(self) -> List[str]:
+        """Providers with usable credentials, in preference order"""
+        if self.simulated:
+            return list(self.simulated)
+        providers = []
+        if self.gemini_model:
+            providers.append("gemini")
+        if self.openai_client:
+            providers.append("openai")
+        return providers
+
+    async def aclose(self) -> None:
+        """Close pooled provider connections (app shutdown)"""
+        if self.openai_client:
+            await self.openai_client.close()
+
+    @staticmethod
+    def _is_throttled(error: Exception) -> bool:
+        """Provider rate-limit response (OpenAI RateLimitError, Gemini ResourceExhausted)"""
+        return getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429
+
+    def _route(self, provider: Optional[str]) -> List[str]:
+        """
+        Configured providers whose breaker is not open, fastest (lowest EWMA) first;
+        `provider`, when given, stays first even if saturated (its call waits in the queue).
+        Otherwise providers without samples follow the sampled ones in config order, and
+        providers with a free concurrency slot go before saturated ones.
+        """
+        available = self.available_providers()
+        if provider in available:
+            available.remove(provider)
+            available.insert(0, provider)
+            return [name for name in available if self.health[name].state != "open"]
+        available.sort(key=lambda name: (self.health[name].ewma is None, self.health[name].ewma or 0.0))
+        routed = [name for name in available if self.health[name].state != "open"]
+        return sorted(routed, key=lambda name: not self.limiters[name].has_free_slot())
+
+    def _hedge_delay(self, name: str) -> float:
+        health = self.health[name]
+        if health.samples() < self.hedge_min_samples:
+            return self.hedge_default_delay
+        return health.percentile(0.95)
+
+    async def _call(
+        self,
+        name: str,
+        prompt: str,
+        history: Optional[List[Dict[str, str]]],
+        system: Optional[str],
+        queue: bool = True
+    ) -> str:
+        """
+        One provider call within its concurrency limit, recorded in its health stats;
+        without `queue` (hedges) it only runs if a slot is free right now
+        """
+        limiter = self.limiters[name]
+        await limiter.acquire(queue=queue)
+        if not self.health[name].allow():
+            limiter.release()
+            raise Exception(f"{name} circuit is open")
+        started = time.perf_counter()
+        try:
+            if name in self.simulated:
+                text = await self.simulated[name].complete(prompt)
+            elif name == "gemini":
+                text = await self._get_gemini_response(prompt, history, system)
+            else:
+                text = await self._get_openai_response(prompt, history, system)
+        except asyncio.CancelledError:
+            self.health[name].abandoned(time.perf_counter() - started)
+            limiter.release()
+            raise
+        except Exception as e:
+            self.health[name].failure()
+            limiter.release(throttled=self._is_throttled(e))
+            raise
+        elapsed = time.perf_counter() - started
+        self.health[name].success(elapsed)
+        limiter.release(elapsed)
+        return text
+
     async def get_response(
         self, 
         prompt: str, 
         history: Optional[List[Dict[str, str]]] = None,
-        provider: str = "gemini"
+        provider: Optional[str] = None,
+        system: Optional[str] = None
     ) -> str:
-        """Get AI response from the specified provider with optional history."""
-        if provider == "gemini" and self.gemini_model:
-            return await self._get_gemini_response(prompt, history)
-        elif provider == "openai" and self.openai_client:
-            return await self._get_openai_response(prompt, history)
+        """
+        Get AI response with optional history. `system` holds the static instructions; it is
+        sent as the provider's system instruction, ahead of the history, so every turn of
+        every user starts with the same prefix (which the providers cache).
+        The primary provider gets a head start of its p95 latency; after that (or as soon
+        as it fails) the next one is raced against it. Raises ProviderOverloaded when no
+        provider had a slot within the queue-time deadline.
+        """
+        candidates = self._route(provider)
+        if not candidates:
+            raise Exception("No AI provider configured properly (or all circuits are open).")
+
+        pending = {asyncio.ensure_future(self._call(candidates[0], prompt, history, system)): candidates[0]}
+        waiting = candidates[1:]
+        hedged = False
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                timeout = None
+                if waiting and self.hedge_enabled and len(pending) == 1:
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slower than usual: hedge with the next provider
+                    name = waiting.pop(0)
+                    self.hedges += 1
+                    hedged = True
+                    print(f"⏱️ {next(iter(pending.values()))} past its p95, hedging with {name}")
+                    pending[asyncio.ensure_future(self._call(name, prompt, history, system, queue=False))] = name
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        if hedged and name != candidates[0]:
+                            self.hedge_wins += 1
+                        return task.result()
+                    # Report a real provider failure over "no slot" (a skipped hedge, a full queue)
+                    if error is None or not isinstance(task.exception(), ProviderOverloaded):
+                        error = task.exception()
+                if not pending and waiting:
+                    # Everything in flight failed: fall over to the next provider now
+                    name = waiting.pop(0)
+                    pending[asyncio.ensure_future(self._call(name, prompt, history, system))] = name
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream_response(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        provider: Optional[str] = None,
+        system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Like get_response, but yields the reply in pieces as the provider generates it.
+        Streams are not hedged (pieces may already be on the wire); the fastest provider
+        with a closed breaker is used and the outcome feeds its health stats.
+        """
+        candidates = self._route(provider)
+        if not candidates:
+            raise Exception("No AI provider configured properly (or all circuits are open).")
+        name = candidates[0]
+        limiter = self.limiters[name]
+        await limiter.acquire()
+        if not self.health[name].allow():
+            limiter.release()
+            raise Exception(f"{name} circuit is open")
+        if name in self.simulated:
+            stream = self.simulated[name].stream(prompt)
+        elif name == "gemini":
+            stream = self._stream_gemini_response(prompt, history, system)
         else:
-            # Fallback logic or error
-            if self.gemini_model:
-                return await self._get_gemini_response(prompt, history)
-            elif self.openai_client:
-                return await self._get_openai_response(prompt, history)
-            else:
-                raise Exception("No AI provider configured properly.")
+            stream = self._stream_openai_response(prompt, history, system)
+        started = time.perf_counter()
+        try:
+            async for delta in stream:
+                yield delta
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled, or the consumer stopped reading (client went away): close the
+            # provider stream now rather than leaving its connection to the garbage collector
+            self.health[name].abandoned(time.perf_counter() - started)
+            limiter.release()
+            await stream.aclose()
+            raise
+        except Exception as e:
+            self.health[name].failure()
+            limiter.release(throttled=self._is_throttled(e))
+            raise
+        elapsed = time.perf_counter() - started
+        self.health[name].success(elapsed)
+        limiter.release(elapsed)
+
+    def stats(self) -> dict:
+        """Routing, hedging, breaker and concurrency-limit state per provider"""
+        return {
+            "providers": {name: self.health[name].stats() for name in self.available_providers()},
+            "concurrency": {name: self.limiters[name].stats() for name in self.available_providers()},
+            "hedging": {
+                "enabled": self.hedge_enabled,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            },
+        }
+
+    @staticmethod
+    def _gemini_history(history: Optional[List[Dict[str, str]]]) -> List[Dict[str, Any]]:
+        # Gemini chat history format: [{"role": "user", "parts": ["..."]}, {"role": "model", "parts": ["..."]}]
+        gemini_history = []
+        for msg in history or []:
+            role = "user" if msg["role"] == "user" else "model"
+            gemini_history.append({"role": role, "parts": [msg["content"]]})
+        return gemini_history
+
+    def _gemini_chat(self, history: Optional[List[Dict[str, str]]], system: Optional[str]):
+        model = self.gemini_model
+        if system:
+            model = self._gemini_models.get(system)
+            if model is None:
+                model = genai.GenerativeModel('gemini-1.5-flash', system_instruction=system)
+                self._gemini_models[system] = model
+        return model.start_chat(history=self._gemini_history(history))
+
+    @staticmethod
+    def _openai_messages(
+        prompt: str, history: Optional[List[Dict[str, str]]], system: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        messages = [{"role": "system", "content": system}] if system else []
+        for msg in history or []:
+            messages.append({"role": OPENAI_ROLES.get(msg["role"], "user"), "content": msg["content"]})
+        messages.append({"role": "user", "content": prompt})
+        return messages
 
-    async def _get_gemini_response(self, prompt: str, history: Optional[List[Dict[str, str]]]) -> str:
+    async def _get_gemini_response(
+        self, prompt: str, history: Optional[List[Dict[str, str]]], system: Optional[str] = None
+    ) -> str:
         try:
-            # Gemini chat history format: [{"role": "user", "parts": ["..."]}, {"role": "model", "parts": ["..."]}]
-            gemini_history = []
-            if history:
-                for msg in history:
-                    role = "user" if msg["role"] == "user" else "model"
-                    gemini_history.append({"role": role, "parts": [msg["content"]]})
-            
-            chat = self.gemini_model.start_chat(history=gemini_history)
-            response = chat.send_message(prompt)
+            chat = self._gemini_chat(history, system)
+            # gRPC channel of the async client is shared across calls; the outer
+            # wait_for also bounds connection setup
+            response = await asyncio.wait_for(
+                chat.send_message_async(prompt, request_options={"timeout": self.timeout}),
+                self.timeout + self.connect_timeout
+            )
             return response.text.strip()
         except Exception as e:
             print(f"Gemini Error: {e}")
             raise
 
-    async def _get_openai_response(self, prompt: str, history: Optional[List[Dict[str, str]]]) -> str:
+    async def _stream_gemini_response(
+        self, prompt: str, history: Optional[List[Dict[str, str]]], system: Optional[str] = None
+    ) -> AsyncIterator[str]:
         try:
-            messages = []
-            if history:
-                for msg in history:
-                    messages.append({"role": msg["role"], "content": msg["content"]})
-            messages.append({"role": "user", "content": prompt})
-            
-            response = self.openai_client.chat.completions.create(
+            chat = self._gemini_chat(history, system)
+            # The deadline covers the wait for the first chunk; later chunks are bounded
+            # by the request timeout
+            response = await asyncio.wait_for(
+                chat.send_message_async(prompt, stream=True, request_options={"timeout": self.timeout}),
+                self.timeout + self.connect_timeout
+            )
+            async for chunk in response:
+                # Chunks without text parts (e.g. safety metadata only) raise on .text
+                text = chunk.text if chunk.parts else ""
+                if text:
+                    yield text
+        except Exception as e:
+            print(f"Gemini Error: {e}")
+            raise
+
+    async def _stream_openai_response(
+        self, prompt: str, history: Optional[List[Dict[str, str]]], system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        try:
+            stream = await self.openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=self._openai_messages(prompt, history, system),
+                stream=True
+            )
+            async for event in stream:
+                delta = event.choices[0].delta.content if event.choices else None
+                if delta:
+                    yield delta
+        except Exception as e:
+            print(f"OpenAI Error: {e}")
+            raise
+
+    async def _get_openai_response(
+        self, prompt: str, history: Optional[List[Dict[str, str]]], system: Optional[str] = None
+    ) -> str:
+        try:
+            response = await self.openai_client.chat.completions.create(
                 model="gpt-4o-mini",
-                messages=messages
+                messages=self._openai_messages(prompt, history, system)
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
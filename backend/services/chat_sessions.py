@@ -0,0 +1,131 @@
+"""
+Per-user chat sessions kept in memory between turns
+A session holds the user's recent conversation in the form sent to the providers, so a
+turn only appends the new message and reply instead of reloading and rebuilding the
+history from the database. Sessions idle for too long are dropped, and the least
+recently used ones are evicted when the total size passes the memory cap; an evicted
+user's next turn simply reseeds the session from the stored chat history.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+
+class ChatSession:
+    def __init__(self, key: Hashable, max_messages: int):
+        self.key = key
+        self.max_messages = max_messages
+        self.messages: List[Dict[str, str]] = []
+        self.size = 0
+        self.turns = 0
+        self.last_used = time.monotonic()
+
+    def _append(self, role: str, content: str) -> None:
+        self.messages.append({"role": role, "content": content})
+        self.size += len(content)
+        while len(self.messages) > self.max_messages:
+            self.size -= len(self.messages.pop(0)["content"])
+
+    def seed(self, history: List[Dict[str, str]]) -> None:
+        for msg in history:
+            self._append(msg["role"], msg["content"])
+
+    def record(self, user_text: str, reply: str) -> None:
+        """Append a finished turn (the user's own words, not the prompt built around them)"""
+        self._append("user", user_text)
+        self._append("model", reply)
+        self.turns += 1
+        self.last_used = time.monotonic()
+
+
+class ChatSessionManager:
+    def __init__(
+        self,
+        idle_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        max_messages: Optional[int] = None,
+    ):
+        """
+        Args:
+            idle_seconds: Sessions unused this long are dropped (CHAT_SESSION_IDLE_SECONDS)
+            max_bytes: Approximate cap on the text held by all sessions (CHAT_SESSION_MAX_BYTES)
+            max_messages: Messages kept per session (CHAT_SESSION_MAX_MESSAGES)
+        """
+        self.idle_seconds = idle_seconds or float(os.getenv("CHAT_SESSION_IDLE_SECONDS", "1800"))
+        self.max_bytes = max_bytes or int(os.getenv("CHAT_SESSION_MAX_BYTES", str(8 * 1024 * 1024)))
+        self.max_messages = max_messages or int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "20"))
+        self._lock = threading.Lock()
+        # key → session, least recently used first
+        self._sessions: "OrderedDict[Hashable, ChatSession]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, s in self._sessions.items() if now - s.last_used > self.idle_seconds]:
+            del self._sessions[key]
+            self.evictions += 1
+        total = sum(s.size for s in self._sessions.values())
+        while total > self.max_bytes and len(self._sessions) > 1:
+            _, session = self._sessions.popitem(last=False)
+            total -= session.size
+            self.evictions += 1
+
+    def lookup(self, key: Hashable) -> Optional[ChatSession]:
+        """The user's live session (marked as used), or None if there is none"""
+        with self._lock:
+            self._evict()
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            self.hits += 1
+            self._sessions.move_to_end(key)
+            session.last_used = time.monotonic()
+            return session
+
+    def get(self, key: Hashable, history: Optional[List[Dict[str, str]]] = None) -> ChatSession:
+        """The user's session, created and seeded from `history` if there is none"""
+        with self._lock:
+            self._evict()
+            session = self._sessions.get(key)
+            if session is None:
+                self.misses += 1
+                session = ChatSession(key, self.max_messages)
+                session.seed(history or [])
+                self._sessions[key] = session
+            else:
+                self.hits += 1
+                self._sessions.move_to_end(key)
+            session.last_used = time.monotonic()
+            return session
+
+    def record(self, session: ChatSession, user_text: str, reply: str) -> None:
+        with self._lock:
+            session.record(user_text, reply)
+            if session.key in self._sessions:
+                self._sessions.move_to_end(session.key)
+            self._evict()
+
+    def drop(self, key: Hashable) -> None:
+        """Forget a session (the user cleared their history)"""
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": sum(s.size for s in self._sessions.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Process-wide sessions, keyed by user id
+chat_sessions = ChatSessionManager()
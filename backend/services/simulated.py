@@ -0,0 +1,118 @@
+"""
+Simulated LLM and TTS providers for offline load testing
+Enabled with SIMULATE_PROVIDERS ("llm", "tts", "llm,tts" or "all"): AIService and
+voice.generate_voice_bytes then answer locally, with latencies drawn from a lognormal
+distribution fitted to a configured median and p95, a configured error rate and
+word-by-word streaming, instead of calling Gemini, OpenAI or ElevenLabs.
+
+    SIM_LLM_LATENCY_MS=800,2500        median,p95 of a full (non-streamed) reply
+    SIM_LLM_FIRST_TOKEN_MS=300,900     median,p95 until the first streamed piece
+    SIM_LLM_TOKENS_PER_SECOND=60       streaming speed after the first piece
+    SIM_LLM_REPLY_WORDS=120            length of a reply
+    SIM_LLM_ERROR_RATE=0.02            share of calls that fail
+    SIM_TTS_LATENCY_MS=600,1500        median,p95 of one synthesis
+    SIM_TTS_ERROR_RATE=0
+
+Every SIM_LLM_* setting can be overridden per provider (SIM_GEMINI_*, SIM_OPENAI_*),
+e.g. to make one provider slower and see how routing and hedging react.
+SIM_SEED makes runs repeatable.
+"""
+
+import asyncio
+import math
+import os
+import random
+import time
+from typing import AsyncIterator, Optional
+
+# Words the simulated replies are made of
+REPLY_WORDS = (
+    "Dear friend, the Gita teaches that you have a right to your duty but not to its "
+    "results. Like Arjuna on the field of Kurukshetra, stand firm, act with courage and "
+    "let go of fear, for the soul is eternal and every challenge is a path to growth."
+).split()
+
+_rng = random.Random(int(os.environ["SIM_SEED"]) if os.getenv("SIM_SEED") else None)
+
+
+def enabled(kind: str) -> bool:
+    """Whether `kind` ("llm" or "tts") is simulated"""
+    kinds = {k.strip().lower() for k in os.getenv("SIMULATE_PROVIDERS", "").split(",") if k.strip()}
+    return kind in kinds or "all" in kinds
+
+
+def _setting(prefix: str, name: str, default: str) -> str:
+    return os.getenv(f"SIM_{prefix}_{name}") or os.getenv(f"SIM_LLM_{name}", default)
+
+
+class LatencyModel:
+    def __init__(self, median_ms: float, p95_ms: float):
+        """Lognormal latency with the given median and 95th percentile"""
+        self.median_ms = median_ms
+        self.p95_ms = max(p95_ms, median_ms)
+        self.mu = math.log(max(median_ms, 1e-3))
+        # z(0.95) = 1.645
+        self.sigma = math.log(self.p95_ms / max(median_ms, 1e-3)) / 1.645
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """"median,p95" in milliseconds (a single number means no spread)"""
+        parts = [float(p) for p in spec.split(",")]
+        return cls(parts[0], parts[1] if len(parts) > 1 else parts[0])
+
+    def sample(self) -> float:
+        """One latency in seconds"""
+        return _rng.lognormvariate(self.mu, self.sigma) / 1000.0
+
+
+class SimulatedLLM:
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Provider it stands in for ("gemini", "openai"); selects SIM_<NAME>_* overrides
+        """
+        prefix = name.upper()
+        self.name = name
+        self.latency = LatencyModel.parse(_setting(prefix, "LATENCY_MS", "800,2500"))
+        self.first_token = LatencyModel.parse(_setting(prefix, "FIRST_TOKEN_MS", "300,900"))
+        self.tokens_per_second = float(_setting(prefix, "TOKENS_PER_SECOND", "60"))
+        self.reply_words = int(_setting(prefix, "REPLY_WORDS", "120"))
+        self.error_rate = float(_setting(prefix, "ERROR_RATE", "0.02"))
+
+    def _reply(self) -> list:
+        return [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(self.reply_words)]
+
+    def _maybe_fail(self) -> None:
+        if _rng.random() < self.error_rate:
+            raise RuntimeError(f"simulated {self.name} error")
+
+    async def complete(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency.sample())
+        self._maybe_fail()
+        return " ".join(self._reply()) + "\n— Abimanyu (simulated)"
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token.sample())
+        self._maybe_fail()
+        words = self._reply()
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(delay)
+            yield word if i == 0 else " " + word
+        yield "\n— Abimanyu (simulated)"
+
+
+class SimulatedTTS:
+    def __init__(self):
+        self.latency = LatencyModel.parse(os.getenv("SIM_TTS_LATENCY_MS", "600,1500"))
+        self.error_rate = float(os.getenv("SIM_TTS_ERROR_RATE", "0"))
+
+    def generate(self, text: str) -> Optional[bytes]:
+        """Blocking, like the ElevenLabs call it replaces; None on a simulated failure"""
+        time.sleep(self.latency.sample())
+        if _rng.random() < self.error_rate:
+            print("Simulated TTS error.")
+            return None
+        # Roughly the size of real speech audio (~1 KB per word at 64 kbps)
+        return b"\0" * (1024 * max(1, len(text.split())))
@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+for _module in ("dotenv", "httpx", "google.generativeai", "openai"):
+    pytest.importorskip(_module)
+
+from services.ai_service import AIService
+
+
+class _ScriptedLLM:
+    """Stand-in provider: streams the given pieces, optionally stalling after the first"""
+
+    def __init__(self, pieces, stall=False):
+        self.pieces = pieces
+        self.stall = stall
+        self.closed = False
+
+    async def stream(self, prompt):
+        try:
+            for i, piece in enumerate(self.pieces):
+                if i and self.stall:
+                    await asyncio.sleep(10)
+                yield piece
+        finally:
+            self.closed = True
+
+
+class _DelayedLLM:
+    """Stand-in provider: answers its name after a delay, or fails"""
+
+    def __init__(self, name, delay, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = False
+
+    async def complete(self, prompt):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        return self.name
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("SIMULATE_PROVIDERS", "llm")
+    service = AIService()
+    service.simulated = {"gemini": _ScriptedLLM(["Dear ", "friend"], stall=True)}
+    return service
+
+
+def test_stream_yields_pieces_and_records_success(service):
+    service.simulated["gemini"].stall = False
+
+    async def run():
+        return [piece async for piece in service.stream_response("hi")]
+
+    assert asyncio.run(run()) == ["Dear ", "friend"]
+    assert service.health["gemini"].stats()["calls"] == 1
+    assert service.limiters["gemini"].in_flight == 0
+
+
+def test_abandoned_stream_closes_provider_and_frees_slot(service):
+    async def run():
+        stream = service.stream_response("hi")
+        assert await stream.__anext__() == "Dear "
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert service.simulated["gemini"].closed
+    assert service.health["gemini"].stats()["cancelled"] == 1
+    # The elapsed time moved the EWMA even though the call never finished
+    assert service.health["gemini"].ewma is not None
+    assert service.limiters["gemini"].in_flight == 0
+
+
+def test_cancelled_stream_closes_provider_and_frees_slot(service):
+    async def run():
+        async def consume():
+            async for _ in service.stream_response("hi"):
+                pass
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert service.simulated["gemini"].closed
+    assert service.health["gemini"].stats()["cancelled"] == 1
+    assert service.limiters["gemini"].in_flight == 0
+
+
+def test_openai_retries_default_to_the_sdk_default(monkeypatch):
+    monkeypatch.delenv("LLM_OPENAI_MAX_RETRIES", raising=False)
+    assert AIService().openai_max_retries == 2
+    monkeypatch.setenv("LLM_OPENAI_MAX_RETRIES", "0")
+    assert AIService().openai_max_retries == 0
+
+
+@pytest.fixture
+def pair(monkeypatch):
+    monkeypatch.setenv("SIMULATE_PROVIDERS", "llm")
+    service = AIService()
+    service.simulated = {"gemini": _DelayedLLM("gemini", 0.01), "openai": _DelayedLLM("openai", 0.01)}
+    service.hedge_default_delay = 0.05
+    return service
+
+
+def test_routing_prefers_the_lower_ewma_and_skips_open_breakers(pair):
+    assert pair._route(None) == ["gemini", "openai"]
+    pair.health["gemini"].success(2.0)
+    pair.health["openai"].success(0.5)
+    assert pair._route(None) == ["openai", "gemini"]
+    # An explicit provider stays first regardless of latency
+    assert pair._route("gemini") == ["gemini", "openai"]
+    for _ in range(pair.health["openai"].failure_threshold):
+        pair.health["openai"].failure()
+    assert pair._route(None) == ["gemini"]
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled(pair):
+    pair.simulated["gemini"].delay = 5
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        text = await pair.get_response("hi")
+        return text, asyncio.get_running_loop().time() - started
+
+    text, elapsed = asyncio.run(run())
+    assert text == "openai"
+    # The hedge went out after the default delay, not after the primary's 5 s
+    assert 0.05 <= elapsed < 1
+    assert pair.hedges == 1 and pair.hedge_wins == 1
+    assert pair.simulated["gemini"].cancelled
+    assert pair.health["gemini"].stats()["cancelled"] == 1
+    assert pair.health["openai"].stats()["calls"] == 1
+
+
+def test_hedge_waits_for_the_primary_p95_once_sampled(pair):
+    pair.hedge_min_samples = 3
+    for _ in range(3):
+        pair.health["gemini"].success(0.2)
+    assert pair._hedge_delay("gemini") == pytest.approx(0.2)
+    assert pair._hedge_delay("openai") == pair.hedge_default_delay
+
+    # A primary answering within its p95 is never hedged
+    pair.simulated["gemini"].delay = 0.05
+    assert asyncio.run(pair.get_response("hi")) == "gemini"
+    assert pair.hedges == 0 and pair.simulated["openai"].calls == 0
+
+
+def test_failed_primary_falls_over_at_once(pair):
+    pair.simulated["gemini"].fail = True
+    pair.hedge_enabled = False
+    assert asyncio.run(pair.get_response("hi")) == "openai"
+    assert pair.health["gemini"].stats()["failures"] == 1
+    assert pair.hedges == 0
@@ -0,0 +1,62 @@
+import math
+
+import pytest
+
+from utils.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCS = [
+    ("duty", "Do your duty without attachment to the fruits of action."),
+    ("soul", "The soul is eternal; it is never born and never dies."),
+    ("anger", "From anger comes delusion, from delusion loss of memory."),
+    ("duty-long", "Duty, duty and duty again: the warrior's duty is to stand and fight for what is right in the battle."),
+]
+
+
+def test_tokenize_drops_stopwords_and_single_letters():
+    assert tokenize("What is MY duty, O Arjuna?") == ["duty", "arjuna"]
+
+
+def test_score_matches_the_bm25_formula():
+    index = BM25Index.from_documents(DOCS)
+    (doc_id, score), = index.search("eternal", k=1)
+    assert doc_id == "soul"
+
+    n, df, tf = 4, 1, 1
+    avg_len = sum(len(tokenize(text)) for _, text in DOCS) / n
+    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    norm = 1.5 * (1 - 0.75 + 0.75 * len(tokenize(DOCS[1][1])) / avg_len)
+    assert score == pytest.approx(idf * tf * 2.5 / (tf + norm))
+
+
+def test_term_frequency_saturates_and_length_is_normalized():
+    index = BM25Index.from_documents(DOCS)
+    results = dict(index.search("duty", k=4))
+    assert set(results) == {"duty", "duty-long"}
+    # Four mentions in a long chunk beat one in a short chunk, but by far less than 4x
+    assert results["duty"] < results["duty-long"] < 2 * results["duty"]
+
+
+def test_search_honours_k_and_the_allow_filter():
+    index = BM25Index.from_documents(DOCS)
+    assert len(index.search("duty anger soul", k=2)) == 2
+    assert [d for d, _ in index.search("duty", allow=lambda d: d != "duty-long")] == ["duty"]
+    assert index.search("krishna") == []
+    assert BM25Index().search("duty") == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = BM25Index.from_documents(DOCS)
+    path = str(tmp_path / "bm25.json")
+    index.save(path)
+    assert BM25Index.load(path).search("anger delusion") == index.search("anger delusion")
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    vector = ["a", "b", "c", "d"]
+    lexical = ["c", "e", "a"]
+    fused = reciprocal_rank_fusion([vector, lexical], k=3)
+    # a (ranks 1 and 3) and c (ranks 3 and 1) tie ahead of b, which only one list found
+    assert set(fused[:2]) == {"a", "c"}
+    assert fused[2] == "b"
+    assert reciprocal_rank_fusion([vector], k=2) == ["a", "b"]
+    assert reciprocal_rank_fusion([], k=3) == []
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+main = pytest.importorskip("main")
+
+
+class _SlowTurn:
+    """LLM calls that finish when released; records each call"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = None
+
+    async def ai_response(self, message, history=None, sources=None, session=None):
+        self.calls.append(message)
+        await self.release.wait()
+        return f"reply to {message}"
+
+    async def ai_response_stream(self, message, history=None, sources=None, session=None):
+        self.calls.append(message)
+        yield "reply "
+        await self.release.wait()
+        yield f"to {message}"
+
+
+@pytest.fixture
+def slow_turn(monkeypatch):
+    turn = _SlowTurn()
+    monkeypatch.setattr(main, "ai_response", turn.ai_response)
+    monkeypatch.setattr(main, "ai_response_stream", turn.ai_response_stream)
+    monkeypatch.setattr(main, "get_audio_base64", lambda text: None)
+    monkeypatch.setattr(main, "analyze_sentiment", lambda text: "neutral")
+    monkeypatch.setattr(main, "chat_flights", main.SingleFlight("chat"))
+    return turn
+
+
+def _ask(message):
+    # Anonymous callers: no user, so no database work
+    return main.chat(main.ChatRequest(message=message), db=None, user=None)
+
+
+def test_identical_chat_turns_share_one_call(slow_turn):
+    async def run():
+        slow_turn.release = asyncio.Event()
+        turns = [asyncio.ensure_future(_ask("What is dharma?")) for _ in range(3)]
+        turns.append(asyncio.ensure_future(_ask("what is  DHARMA?")))
+        await asyncio.sleep(0)
+        slow_turn.release.set()
+        replies = await asyncio.gather(*turns)
+        assert {r.reply for r in replies} == {"reply to What is dharma?"}
+        assert len(slow_turn.calls) == 1
+        assert main.chat_flights.stats()["coalesced"] == 3
+
+    asyncio.run(run())
+
+
+def test_cancelled_leader_still_answers_followers(slow_turn):
+    async def run():
+        slow_turn.release = asyncio.Event()
+        leader = asyncio.ensure_future(_ask("What is karma?"))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(_ask("What is karma?"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        slow_turn.release.set()
+        assert (await follower).reply == "reply to What is karma?"
+        assert len(slow_turn.calls) == 1
+
+    asyncio.run(run())
+
+
+def test_identical_streamed_turns_share_one_call(slow_turn):
+    async def collect():
+        return [event async for event in main._shared_chat_events("What is yoga?", None, None)]
+
+    async def run():
+        slow_turn.release = asyncio.Event()
+        turns = [asyncio.ensure_future(collect()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        slow_turn.release.set()
+        first, second = await asyncio.gather(*turns)
+        assert first == second
+        assert first[-1] == ("done", {"reply": "reply to What is yoga?"})
+        assert len(slow_turn.calls) == 1
+
+    asyncio.run(run())
@@ -0,0 +1,66 @@
+import time
+
+from services.chat_sessions import ChatSessionManager
+
+
+def _history(turns):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"question {i}"})
+        history.append({"role": "model", "content": f"answer {i}"})
+    return history
+
+
+def test_new_session_is_seeded_and_reused():
+    sessions = ChatSessionManager(idle_seconds=60, max_bytes=10_000, max_messages=10)
+    session = sessions.get(1, _history(2))
+    assert [m["content"] for m in session.messages] == ["question 0", "answer 0", "question 1", "answer 1"]
+    # A live session ignores the history passed in again
+    assert sessions.get(1, _history(5)) is session
+    assert sessions.lookup(2) is None
+    assert sessions.stats()["hits"] == 1 and sessions.stats()["misses"] == 1
+
+
+def test_history_is_trimmed_to_the_newest_messages():
+    sessions = ChatSessionManager(idle_seconds=60, max_bytes=10_000, max_messages=4)
+    session = sessions.get(1, _history(3))
+    assert [m["content"] for m in session.messages] == ["question 1", "answer 1", "question 2", "answer 2"]
+
+    sessions.record(session, "why?", "because")
+    assert [m["content"] for m in session.messages] == ["question 2", "answer 2", "why?", "because"]
+    assert session.size == sum(len(m["content"]) for m in session.messages)
+    assert session.turns == 1
+
+
+def test_idle_sessions_are_dropped():
+    sessions = ChatSessionManager(idle_seconds=0.02, max_bytes=10_000, max_messages=10)
+    sessions.get(1, _history(1))
+    time.sleep(0.03)
+    assert sessions.lookup(1) is None
+    assert sessions.stats()["evictions"] == 1
+
+
+def test_least_recently_used_sessions_go_first_past_the_memory_cap():
+    sessions = ChatSessionManager(idle_seconds=60, max_bytes=60, max_messages=10)
+    first = sessions.get(1, [{"role": "user", "content": "a" * 20}])
+    sessions.get(2, [{"role": "user", "content": "b" * 20}])
+    # Using session 1 makes session 2 the least recently used
+    sessions.record(first, "c" * 10, "d" * 10)
+    sessions.get(3, [{"role": "user", "content": "e" * 20}])
+    assert sessions.lookup(2) is None
+    assert sessions.lookup(1) is first
+    assert sessions.stats()["bytes"] <= 60
+
+
+def test_a_single_oversized_session_is_kept():
+    sessions = ChatSessionManager(idle_seconds=60, max_bytes=10, max_messages=10)
+    session = sessions.get(1, [{"role": "user", "content": "x" * 50}])
+    assert sessions.lookup(1) is session
+
+
+def test_dropped_session_is_reseeded():
+    sessions = ChatSessionManager(idle_seconds=60, max_bytes=10_000, max_messages=10)
+    old = sessions.get(1, _history(1))
+    sessions.drop(1)
+    fresh = sessions.get(1, [])
+    assert fresh is not old and fresh.messages == []
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from utils.chunk_store import ChunkStore, ChunkStoreWriter
+
+
+def _paths(tmp_path):
+    return str(tmp_path / "chunks.bin"), str(tmp_path / "chunks.idx")
+
+
+def test_write_and_read(tmp_path):
+    store = ChunkStore.write(["alpha", "βeta", ""], *_paths(tmp_path))
+    assert len(store) == 3
+    assert list(store) == ["alpha", "βeta", ""]
+
+
+def test_resume_drops_rows_after_checkpoint(tmp_path):
+    writer = ChunkStoreWriter(*_paths(tmp_path))
+    writer.extend(["a", "b"])
+    writer.checkpoint()
+    writer.append("not checkpointed")
+    writer.release()
+
+    writer = ChunkStoreWriter(*_paths(tmp_path), resume=True)
+    assert len(writer) == 2
+    writer.append("c")
+    assert list(writer.close()) == ["a", "b", "c"]
+
+
+def test_resume_cuts_back_to_build_checkpoint_rows(tmp_path):
+    # Crash between writer.checkpoint() (4 rows) and the build checkpoint (2 rows):
+    # the writer must resume at the build checkpoint so row i still matches vector i
+    writer = ChunkStoreWriter(*_paths(tmp_path))
+    writer.extend(["a", "b"])
+    writer.checkpoint()
+    writer.extend(["c", "d"])
+    writer.checkpoint()
+    writer.release()
+
+    writer = ChunkStoreWriter(*_paths(tmp_path), resume=True, rows=2)
+    assert len(writer) == 2
+    writer.extend(["c", "d"])
+    store = writer.close()
+    assert list(store) == ["a", "b", "c", "d"]
+    assert np.asarray(store.offsets).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_resume_to_more_rows_than_written_fails(tmp_path):
+    writer = ChunkStoreWriter(*_paths(tmp_path))
+    writer.append("a")
+    writer.checkpoint()
+    writer.release()
+    with pytest.raises(ValueError):
+        ChunkStoreWriter(*_paths(tmp_path), resume=True, rows=3)
+
+
+def test_resume_without_unfinished_write_fails(tmp_path):
+    with pytest.raises(ValueError):
+        ChunkStoreWriter(*_paths(tmp_path), resume=True, rows=2)
+
+
+def test_spool_and_store_stay_aligned_after_crash(tmp_path):
+    pytest.importorskip("pdfplumber")
+    from utils.index_builder import BuildCheckpoint, EmbeddingSpool
+
+    spool_path = str(tmp_path / "embeddings.f32")
+    checkpoint = BuildCheckpoint(str(tmp_path / "checkpoint.json"), [])
+    writer = ChunkStoreWriter(*_paths(tmp_path))
+    spool = EmbeddingSpool(spool_path)
+    for batch in (["a", "b"], ["c", "d"]):
+        spool.append(np.full((len(batch), 3), ord(batch[0]), dtype=np.float32))
+        writer.extend(batch)
+        writer.checkpoint()
+        spool.checkpoint()
+        if batch[0] == "a":
+            checkpoint.save(rows=len(writer), dimension=spool.dimension)
+        # second batch: crash before checkpoint.save()
+    writer.release()
+    spool.close()
+
+    assert checkpoint.load()
+    rows = checkpoint.state["rows"]
+    writer = ChunkStoreWriter(*_paths(tmp_path), resume=True, rows=rows)
+    spool = EmbeddingSpool(spool_path, checkpoint.state["dimension"], rows)
+    assert len(writer) == spool.rows == 2
+    assert spool.read()[:, 0].tolist() == [ord("a"), ord("a")]
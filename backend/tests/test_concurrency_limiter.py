@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from utils.concurrency_limiter import AdaptiveLimiter, ProviderOverloaded
+
+
+def _limiter(**kwargs):
+    options = dict(initial=2, min_limit=1, max_limit=8, queue_size=2, queue_timeout=1.0, latency_target=5.0)
+    options.update(kwargs)
+    return AdaptiveLimiter("test", **options)
+
+
+def test_admits_up_to_the_limit():
+    async def run():
+        limiter = _limiter()
+        await limiter.acquire()
+        await limiter.acquire()
+        assert limiter.in_flight == 2
+        assert not limiter.has_free_slot()
+        with pytest.raises(ProviderOverloaded):
+            await limiter.acquire(queue=False)
+
+    asyncio.run(run())
+
+
+def test_queued_call_gets_the_released_slot():
+    async def run():
+        limiter = _limiter(initial=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued_now"] == 1
+        limiter.release()
+        await waiter
+        assert limiter.in_flight == 1
+        assert limiter.stats()["queued_now"] == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_rejects_at_once():
+    async def run():
+        limiter = _limiter(initial=1, queue_size=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(ProviderOverloaded) as overloaded:
+            await limiter.acquire()
+        assert overloaded.value.retry_after >= 1
+        assert limiter.rejected == 1
+        limiter.release()
+        await waiter
+
+    asyncio.run(run())
+
+
+def test_queue_timeout():
+    async def run():
+        limiter = _limiter(initial=1, queue_timeout=0.05)
+        await limiter.acquire()
+        with pytest.raises(ProviderOverloaded):
+            await limiter.acquire()
+        assert limiter.timed_out == 1
+        assert limiter.stats()["queued_now"] == 0
+        assert limiter.in_flight == 1
+
+    asyncio.run(run())
+
+
+def test_throttled_call_halves_the_limit():
+    async def run():
+        limiter = _limiter(initial=8)
+        await limiter.acquire()
+        await limiter.acquire()
+        limiter.release(throttled=True)
+        assert limiter.stats()["limit"] == 4
+        # Within the cooldown a second 429 doesn't halve it again
+        limiter.release(throttled=True)
+        assert limiter.stats()["limit"] == 4
+        assert limiter.decreases == 1
+
+    asyncio.run(run())
+
+
+def test_slow_call_halves_the_limit():
+    async def run():
+        limiter = _limiter(initial=4)
+        await limiter.acquire()
+        limiter.release(6.0)
+        assert limiter.stats()["limit"] == 2
+
+    asyncio.run(run())
+
+
+def test_fast_calls_grow_the_limit_additively():
+    async def run():
+        limiter = _limiter(initial=2)
+        for _ in range(4):
+            await limiter.acquire()
+            limiter.release(0.1)
+        assert limiter.stats()["limit"] == 3
+        assert limiter.limit < 4
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def run():
+        limiter = _limiter(initial=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.stats()["queued_now"] == 0
+        limiter.release()
+        assert limiter.in_flight == 0
+        await limiter.acquire()
+        assert limiter.in_flight == 1
+
+    asyncio.run(run())
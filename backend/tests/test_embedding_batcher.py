@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from utils.embedding_batcher import EmbeddingBatcher
+
+
+class _Encoder:
+    """Records each batch; optionally holds the first call until released"""
+
+    def __init__(self, hold=False, error=None):
+        self.batches = []
+        self.error = error
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return [len(text) for text in texts]
+
+
+def test_full_batch_is_flushed_without_waiting():
+    encoder = _Encoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=3, max_wait_ms=10_000)
+    futures = [batcher.submit("x" * n) for n in range(1, 8)]
+
+    started = time.monotonic()
+    # Two full batches go out at once; the seventh text is still waiting for company
+    assert [f.result(timeout=2) for f in futures[:6]] == [1, 2, 3, 4, 5, 6]
+    assert time.monotonic() - started < 1
+    assert not futures[6].done()
+    assert encoder.batches == [["x", "xx", "xxx"], ["xxxx", "xxxxx", "xxxxxx"]]
+
+
+def test_partial_batch_is_flushed_after_the_wait():
+    encoder = _Encoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=32, max_wait_ms=50)
+    started = time.monotonic()
+    futures = [batcher.submit("a"), batcher.submit("bb")]
+    assert [f.result(timeout=2) for f in futures] == [1, 2]
+    assert time.monotonic() - started >= 0.04
+    assert encoder.batches == [["a", "bb"]]
+
+
+def test_encoder_error_reaches_every_caller_in_the_batch():
+    encoder = _Encoder(error=RuntimeError("model unavailable"))
+    batcher = EmbeddingBatcher(encoder, max_batch_size=32, max_wait_ms=20)
+    futures = [batcher.submit(text) for text in ("a", "b", "c")]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model unavailable"):
+            future.result(timeout=2)
+
+    # The worker survives and serves the next batch
+    encoder.error = None
+    assert batcher.embed("dddd", timeout=2) == 4
+
+
+def test_cancelled_requests_are_not_encoded():
+    encoder = _Encoder(hold=True)
+    batcher = EmbeddingBatcher(encoder, max_batch_size=32, max_wait_ms=0)
+    batcher.submit("a")
+    while not encoder.batches:
+        time.sleep(0.001)
+    abandoned = batcher.submit("skip")
+    kept = batcher.submit("keep")
+    assert abandoned.cancel()
+    encoder.release.set()
+    assert kept.result(timeout=2) == 4
+    assert ["skip"] not in encoder.batches and all("skip" not in batch for batch in encoder.batches)
@@ -0,0 +1,74 @@
+from utils.bm25 import BM25Index
+from utils.emotion_pools import EmotionPools, index_signature
+
+CHUNKS = {
+    "c0": ("Fear not, for the soul is never slain.", [1.0, 0.0, 0.0]),
+    "c1": ("Anger leads to delusion and ruin.", [0.0, 1.0, 0.0]),
+    "c2": ("The fearless warrior does his duty.", [0.7, 0.0, 0.7]),
+    "c3": ("Calm the angry mind through steady practice.", [0.0, 0.7, 0.7]),
+}
+SEEDS = {"fear": "fear fearless", "anger": "anger angry", "joy": "bliss delight"}
+
+
+def _fetch(ids):
+    return [{"text": CHUNKS[i][0], "metadata": {"id": i}, "embedding": CHUNKS[i][1]} for i in ids]
+
+
+def _fetch_without_vectors(ids):
+    return [{"text": CHUNKS[i][0], "metadata": {"id": i}} for i in ids]
+
+
+def _build(tmp_path, fetch=_fetch, vector_search=None):
+    pools = EmotionPools(str(tmp_path / "pools.json"), pool_size=3)
+    bm25 = BM25Index.from_documents((i, text) for i, (text, _) in CHUNKS.items())
+    pools.build(SEEDS, bm25, fetch, index_signature(CHUNKS), vector_search=vector_search)
+    return pools
+
+
+def test_signature_ignores_order():
+    assert index_signature(["b", "a"]) == index_signature(["a", "b"])
+    assert index_signature(["a"]) != index_signature(["a", "b"])
+
+
+def test_emotion_without_matches_falls_back_to_full_retrieval(tmp_path):
+    pools = _build(tmp_path)
+    # No chunk mentions the seed words: the pool is empty and rank() defers to the retriever
+    assert pools.has("joy")
+    assert pools.rank("joy", "happy", 2) == []
+    assert pools.rank("grief", "sad", 2) == []
+    assert [d["metadata"]["id"] for d in pools.rank("anger", "angry", 2)] == ["c3", "c1"]
+
+
+def test_lexical_only_pools_rank_without_vectors(tmp_path):
+    pools = _build(tmp_path, fetch=_fetch_without_vectors)
+    assert not pools.with_vectors
+    docs = pools.rank("fear", "duty", 1, query_vector=[1.0, 0.0, 0.0])
+    assert [d["metadata"]["id"] for d in docs] == ["c2"]
+
+
+def test_query_vector_reorders_the_pool(tmp_path):
+    pools = _build(tmp_path, vector_search=lambda query, k: ["c2", "c0"])
+    assert pools.with_vectors
+    docs = pools.rank("fear", "warrior", 2, query_vector=[0.0, 0.0, 1.0])
+    assert docs[0]["metadata"]["id"] == "c2"
+
+
+def test_pools_are_rebuilt_when_the_index_or_embedder_changes(tmp_path):
+    pools = _build(tmp_path)
+    signature = index_signature(CHUNKS)
+    assert pools.is_current(signature, want_vectors=False)
+    # Lexical-only pools are upgraded once the embedder is ready
+    assert not pools.is_current(signature, want_vectors=True)
+    assert not pools.is_current(index_signature(["c0"]), want_vectors=False)
+    pools.clear()
+    assert not pools.is_current(signature, want_vectors=False)
+
+
+def test_persisted_pools_load_only_for_the_same_index(tmp_path):
+    _build(tmp_path)
+    reloaded = EmotionPools(str(tmp_path / "pools.json"), pool_size=3)
+    assert not reloaded.load(index_signature(["c0"]), _fetch)
+    assert not reloaded.has("fear")
+    assert reloaded.load(index_signature(CHUNKS), _fetch)
+    assert [d["metadata"]["id"] for d in reloaded.rank("fear", "fear", 1)] == ["c0"]
+    assert not EmotionPools(str(tmp_path / "missing.json")).load(index_signature(CHUNKS), _fetch)
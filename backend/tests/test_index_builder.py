@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("pdfplumber")
+
+from utils.index_builder import BuildCheckpoint, StreamingChunker, iter_text_pages
+
+
+class _KeepWhole:
+    """Splitter stand-in that returns the buffer as one chunk"""
+
+    def split_text(self, text):
+        return [text]
+
+
+def test_text_pages_rebuild_the_file_when_fed(tmp_path):
+    # Every 4-line block ends in a blank line, i.e. a paragraph break at the boundary
+    lines = ["\n" if i % 4 == 3 else f"line {i}\n" for i in range(23)]
+    path = tmp_path / "book.txt"
+    path.write_text("".join(lines), encoding="utf-8")
+
+    chunker = StreamingChunker(_KeepWhole())
+    for _, text in iter_text_pages(str(path), lines_per_page=4):
+        chunker.feed(text)
+    assert chunker.buffer == "".join(lines)
+
+
+def test_text_pages_resume_at_start_page(tmp_path):
+    path = tmp_path / "book.txt"
+    path.write_text("".join(f"{i}\n" for i in range(10)), encoding="utf-8")
+    pages = list(iter_text_pages(str(path), start_page=1, lines_per_page=4))
+    assert pages == [(1, "4\n5\n6\n7"), (2, "8\n9")]
+
+
+def test_checkpoint_resumes_only_for_the_same_inputs(tmp_path):
+    pdf = tmp_path / "book.pdf"
+    pdf.write_bytes(b"%PDF")
+    path = str(tmp_path / "build.json")
+    BuildCheckpoint(path, [str(pdf)]).save(pdf_index=0, next_page=12, rows=40)
+
+    checkpoint = BuildCheckpoint(path, [str(pdf)])
+    assert checkpoint.load()
+    assert checkpoint.state["next_page"] == 12
+    assert checkpoint.state["rows"] == 40
+
+    pdf.write_bytes(b"%PDF changed")
+    assert not BuildCheckpoint(path, [str(pdf)]).load()
@@ -0,0 +1,78 @@
+import os
+
+from utils.index_generations import IndexGenerations
+
+
+def _stage(generations, content):
+    os.makedirs(generations.staging_dir, exist_ok=True)
+    with open(os.path.join(generations.staging_dir, "index.bin"), "w") as f:
+        f.write(content)
+
+
+def _read(generations, number):
+    with open(os.path.join(generations.path(number), "index.bin")) as f:
+        return f.read()
+
+
+def test_publish_swaps_the_live_generation(tmp_path):
+    generations = IndexGenerations(str(tmp_path))
+    assert generations.current() is None
+
+    _stage(generations, "v1")
+    assert generations.publish() == 1
+    _stage(generations, "v2")
+    assert generations.publish() == 2
+    assert generations.current() == 2
+    assert _read(generations, 2) == "v2"
+    # The previous generation stays on disk until it is removed explicitly
+    assert generations.existing() == [1, 2]
+    assert not os.path.exists(generations.staging_dir)
+
+
+def test_failed_build_leaves_the_old_generation_live(tmp_path):
+    generations = IndexGenerations(str(tmp_path))
+    _stage(generations, "v1")
+    generations.publish()
+
+    # A build that dies while staging never touches CURRENT
+    _stage(generations, "half written")
+    reopened = IndexGenerations(str(tmp_path))
+    assert reopened.current() == 1
+    assert _read(reopened, 1) == "v1"
+
+
+def test_rolling_back_to_a_kept_generation(tmp_path):
+    generations = IndexGenerations(str(tmp_path))
+    for content in ("v1", "v2"):
+        _stage(generations, content)
+        generations.publish()
+
+    # Re-publishing a kept generation makes it live again under a new number
+    generations.publish(generations.path(1))
+    assert generations.current() == 3
+    assert _read(generations, 3) == "v1"
+    generations.prune([generations.current()])
+    assert generations.existing() == [3]
+
+
+def test_pointer_to_a_missing_directory_means_no_index(tmp_path):
+    generations = IndexGenerations(str(tmp_path))
+    _stage(generations, "v1")
+    generations.publish()
+    generations.remove(1)
+    assert generations.current() is None
+
+    with open(generations.pointer_path, "w") as f:
+        f.write("garbage")
+    assert generations.current() is None
+
+
+def test_reset_forgets_everything(tmp_path):
+    generations = IndexGenerations(str(tmp_path))
+    _stage(generations, "v1")
+    generations.publish()
+    _stage(generations, "v2")
+    generations.reset()
+    assert generations.current() is None
+    assert generations.existing() == []
+    assert not os.path.exists(generations.staging_dir)
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from utils.jobs import JobAlreadyRunning, JobRunner
+
+
+def _wait(runner, job_id, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id)
+        if job["state"] not in ("queued", "running"):
+            return job
+        time.sleep(0.005)
+    raise AssertionError(f"job {job_id} still {runner.get(job_id)['state']}")
+
+
+def test_job_result_and_progress_are_recorded():
+    runner = JobRunner()
+
+    def build(count, progress):
+        progress({"done": count})
+        return {"chunks": count}
+
+    job = _wait(runner, runner.submit("rag-rebuild", build, 7)["id"])
+    assert job["state"] == "succeeded"
+    assert job["result"] == {"chunks": 7}
+    assert job["progress"] == {"done": 7}
+    assert job["seconds"] is not None
+
+
+def test_only_one_job_of_a_kind_runs_at_a_time():
+    runner = JobRunner()
+    release = threading.Event()
+    first = runner.submit("rag-rebuild", lambda progress: release.wait(2))
+
+    with pytest.raises(JobAlreadyRunning) as excinfo:
+        runner.submit("rag-rebuild", lambda progress: None)
+    assert excinfo.value.job["id"] == first["id"]
+    # Other kinds are independent
+    other = runner.submit("rag-shard-rebuild", lambda progress: None)
+    release.set()
+
+    assert _wait(runner, first["id"])["state"] == "succeeded"
+    assert _wait(runner, other["id"])["state"] == "succeeded"
+    again = runner.submit("rag-rebuild", lambda progress: None)
+    assert _wait(runner, again["id"])["state"] == "succeeded"
+
+
+def test_failures_are_reported_not_raised():
+    runner = JobRunner()
+
+    def broken(progress):
+        raise RuntimeError("disk full")
+
+    failed = _wait(runner, runner.submit("rag-rebuild", broken)["id"])
+    assert failed["state"] == "failed" and failed["error"] == "disk full"
+
+    reported = _wait(runner, runner.submit("rag-rebuild", lambda progress: False)["id"])
+    assert reported["state"] == "failed" and reported["result"] is False
+
+
+def test_history_keeps_the_newest_finished_jobs():
+    runner = JobRunner(history=2)
+    ids = [_wait(runner, runner.submit(f"kind-{i}", lambda progress: None)["id"])["id"] for i in range(4)]
+    assert [job["id"] for job in runner.list()] == ids[:1:-1]
+    assert runner.get(ids[0]) is None
+    assert [job["kind"] for job in runner.list("kind-3")] == ["kind-3"]
@@ -0,0 +1,79 @@
+from utils.prompt_builder import PromptBuilder, count_tokens, dedupe_chunks, mmr_order, truncate_to_tokens
+
+
+def _render(context, summary):
+    return f"Context:\n{context}\nEarlier: {summary}\nAnswer kindly."
+
+
+def _doc(text, source="gita.txt", embedding=None):
+    return {"text": text, "metadata": {"source": source}, "embedding": embedding}
+
+
+def test_prompt_and_history_stay_within_the_budget():
+    builder = PromptBuilder(budget=120, context_budget=40, summary_budget=20)
+    docs = [_doc(f"passage {i} " + "word " * 20, source=f"s{i}") for i in range(5)]
+    history = []
+    for i in range(10):
+        history.append({"role": "user", "content": f"Question {i}. " + "more " * 10})
+        history.append({"role": "assistant", "content": "answer " * 12})
+
+    prompt, kept, report = builder.build(_render, "Now?", docs, history, system="Be calm.")
+    assert report["context_tokens"] <= 40
+    assert report["total_tokens"] <= 120
+    assert report["total_tokens"] == count_tokens("Be calm.") + count_tokens(prompt) + sum(count_tokens(m["content"]) for m in kept)
+    # The newest turns are kept, starting on a user turn, and the rest are summarized
+    assert kept and kept[0]["role"] == "user" and kept[-1] == history[-1]
+    # The summary favours the most recent of the dropped turns
+    assert report["summarized"] and "Question 7." in prompt and "Question 0." not in prompt
+
+
+def test_repeated_user_message_is_not_sent_twice():
+    builder = PromptBuilder(budget=500)
+    history = [{"role": "user", "content": "Hello"}, {"role": "assistant", "content": "Hi"}, {"role": "user", "content": "Why?"}]
+    _, kept, report = builder.build(_render, "Why?", [], history)
+    assert kept == history[:2]
+    assert report["history_messages"] == "2/2"
+
+
+def test_overlapping_and_duplicate_chunks_are_merged():
+    shared = "the soul is never born and never dies at any time whatsoever "
+    docs = [
+        _doc("Arjuna asks Krishna about grief. " + shared),
+        _doc(shared + "it is unborn, eternal and primeval."),
+        _doc("Arjuna asks Krishna about grief."),
+        _doc("Arjuna asks Krishna about grief.", source="other.txt"),
+    ]
+    kept = dedupe_chunks(docs)
+    assert len(kept) == 1
+    assert kept[0]["text"] == "Arjuna asks Krishna about grief. " + shared + "it is unborn, eternal and primeval."
+    assert kept[0]["embedding"] is None
+
+
+def test_mmr_prefers_a_different_passage_over_a_near_copy():
+    query = [1.0, 0.0]
+    docs = [
+        _doc("a", embedding=[1.0, 0.0]),
+        _doc("b", embedding=[0.99, 0.05]),
+        _doc("c", embedding=[0.7, 0.7]),
+    ]
+    assert [d["text"] for d in mmr_order(docs, query, diversity=0.0)] == ["a", "b", "c"]
+    assert [d["text"] for d in mmr_order(docs, query, diversity=0.7)] == ["a", "c", "b"]
+
+
+def test_single_oversized_chunk_is_truncated_not_dropped():
+    builder = PromptBuilder(budget=1000, context_budget=60)
+    chunks, used = builder.select_context([_doc("word " * 200)], 60)
+    assert len(chunks) == 1 and chunks[0].endswith(" …")
+    assert used <= 60
+    assert truncate_to_tokens("short", 10) == "short"
+
+
+def test_stats_aggregate_builds():
+    builder = PromptBuilder(budget=500)
+    assert builder.stats()["prompts"] == 0
+    builder.build(_render, "one", [_doc("first passage")])
+    _, _, report = builder.build(_render, "two", [])
+    stats = builder.stats()
+    assert stats["prompts"] == 2
+    assert stats["last"] is report
+    assert stats["max_tokens"] >= stats["avg_tokens"] > 0
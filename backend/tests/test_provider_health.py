@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from utils.provider_health import ProviderHealth
+
+
+def test_ewma_follows_recent_latencies():
+    health = ProviderHealth("gemini", window=10, alpha=0.5, failure_threshold=3, cooldown_seconds=60)
+    health.success(1.0)
+    assert health.ewma == 1.0
+    health.success(3.0)
+    assert health.ewma == pytest.approx(2.0)
+    health.success(3.0)
+    assert health.ewma == pytest.approx(2.5)
+
+
+def test_percentiles_use_the_recent_window():
+    health = ProviderHealth("gemini", window=20, failure_threshold=3, cooldown_seconds=60)
+    assert health.percentile(0.95) is None
+    for ms in range(1, 41):
+        health.success(ms / 1000)
+    # Only the last 20 samples (21..40 ms) are kept
+    assert health.samples() == 20
+    assert health.percentile(0.5) == pytest.approx(0.031)
+    assert health.percentile(0.95) == pytest.approx(0.040)
+
+
+def test_abandoned_call_moves_the_ewma_but_not_the_percentiles():
+    health = ProviderHealth("openai", window=10, alpha=0.5, failure_threshold=3, cooldown_seconds=60)
+    health.success(1.0)
+    health.abandoned(5.0)
+    assert health.ewma == pytest.approx(3.0)
+    assert health.samples() == 1
+    assert health.stats()["cancelled"] == 1
+
+
+def test_breaker_opens_probes_and_closes():
+    health = ProviderHealth("gemini", window=10, failure_threshold=2, cooldown_seconds=0.05)
+    health.failure()
+    assert health.allow()
+    health.failure()
+    assert health.state == "open" and not health.allow()
+    assert health.error_rate() == 1.0
+
+    time.sleep(0.06)
+    assert health.state == "half-open"
+    # One probe at a time
+    assert health.allow() and not health.allow()
+    health.failure()
+    assert health.state == "open"
+
+    time.sleep(0.06)
+    assert health.allow()
+    health.success(0.1)
+    assert health.state == "closed" and health.consecutive_failures == 0
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from utils import ann_index
+from utils.ann_index import IndexConfig
+from utils.quantization import QuantizedVectors, open_vectors, rerank, write_vectors
+
+
+def _unit_vectors(n=500, dimension=32, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("int8", 0.02)])
+def test_quantize_dequantize_round_trip(dtype, tolerance):
+    vectors = _unit_vectors()
+    quantized = QuantizedVectors.quantize(vectors, dtype)
+    restored = quantized.dequantize(range(len(vectors)))
+    assert restored.shape == vectors.shape
+    assert np.abs(restored - vectors).max() < tolerance
+    assert quantized.nbytes < quantized.float32_nbytes
+
+
+def test_int8_inner_product_matches_dequantized_vectors():
+    vectors = _unit_vectors()
+    quantized = QuantizedVectors.quantize(vectors, "int8")
+    query = vectors[7]
+    expected = quantized.dequantize(range(len(vectors))) @ query
+    assert np.allclose(quantized.inner_product(query), expected, atol=1e-4)
+    assert quantized.search_rows(query, 1)[0] == 7
+
+
+def test_save_and_load_keep_codes_and_ids(tmp_path):
+    vectors = _unit_vectors(n=20)
+    ids = [f"chunk-{i}" for i in range(20)]
+    path = str(tmp_path / "quantized.npz")
+    QuantizedVectors.quantize(vectors, "int8", ids=ids).save(path)
+    loaded = QuantizedVectors.load(path)
+    assert loaded.dtype == "int8"
+    assert loaded.ids == ids
+    assert np.abs(loaded.dequantize(range(20)) - vectors).max() < 0.02
+
+
+def test_rerank_uses_exact_vectors(tmp_path):
+    vectors = _unit_vectors(n=50)
+    path = str(tmp_path / "vectors.f32")
+    write_vectors(path, vectors)
+    mapped = open_vectors(path, vectors.shape[1])
+    assert rerank(vectors[3], [10, 3, 20], mapped, 2)[0] == 3
+
+
+def test_ivfpq_falls_back_to_flat_below_training_size():
+    vectors = _unit_vectors(n=500)
+    index = ann_index.build_index(vectors, IndexConfig(index_type="ivfpq", pq_m=8))
+    assert ann_index.index_type_of(index) == "flat"
+    hnsw = ann_index.build_index(vectors, IndexConfig(index_type="hnsw", vector_dtype="float32"))
+    assert ann_index.index_type_of(hnsw) == "hnsw"
@@ -0,0 +1,58 @@
+import time
+
+from utils.query_cache import LRUCache, QueryCache, normalize_query
+
+
+def test_least_recently_used_key_is_evicted():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["size"] == 2
+
+
+def test_expired_entries_miss_and_are_dropped():
+    cache = LRUCache(maxsize=4, ttl=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 0, "maxsize": 4, "hits": 0, "misses": 1, "hit_rate": 0.0}
+
+
+def test_zero_size_cache_stores_nothing():
+    cache = LRUCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_queries_are_normalized():
+    cache = QueryCache(max_embeddings=4, max_results=4, ttl=60)
+    assert normalize_query("  Why   do I\tfeel LOST? ") == "why do i feel lost?"
+    cache.put_embedding("Why do I feel lost?", [0.1, 0.2])
+    assert cache.get_embedding("why do i  feel lost?") == [0.1, 0.2]
+
+
+def test_results_are_keyed_by_k_and_scope():
+    cache = QueryCache(max_embeddings=4, max_results=4, ttl=60)
+    cache.put_result("duty", 3, ["a", "b", "c"], cache.generation)
+    cache.put_result("duty", 3, ["x"], cache.generation, scope=("gita.txt",))
+    assert cache.get_result("duty", 3) == ["a", "b", "c"]
+    assert cache.get_result("duty", 3, scope=("gita.txt",)) == ["x"]
+    assert cache.get_result("duty", 5) is None
+
+
+def test_generation_bump_invalidates_everything():
+    cache = QueryCache(max_embeddings=4, max_results=4, ttl=60)
+    started = cache.generation
+    cache.put_embedding("duty", [1.0])
+    cache.put_result("duty", 3, ["a"], started)
+    assert cache.bump_generation() == started + 1
+    assert cache.get_embedding("duty") is None
+    assert cache.get_result("duty", 3) is None
+    # A search that began before the rebuild must not repopulate the cache
+    cache.put_result("duty", 3, ["stale"], started)
+    assert cache.get_result("duty", 3) is None
+    assert cache.stats()["result_cache"]["size"] == 0
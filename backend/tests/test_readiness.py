@@ -0,0 +1,37 @@
+from utils.readiness import Readiness
+
+
+def test_starting_until_every_phase_is_done():
+    readiness = Readiness(phases=("db", "index"))
+    assert readiness.snapshot()["status"] == "starting"
+    readiness.begin("db")
+    assert readiness.state("db") == "starting"
+    readiness.ready("db")
+    assert readiness.snapshot()["status"] == "starting"
+    assert not readiness.is_ready
+    readiness.begin("index")
+    readiness.ready("index", "snapshot loaded")
+    report = readiness.snapshot()
+    assert report["status"] == "ready"
+    assert report["phases"]["index"]["state"] == "ready"
+    assert report["phases"]["index"]["detail"] == "snapshot loaded"
+    assert readiness.is_ready
+
+
+def test_degraded_phase_still_serves():
+    readiness = Readiness(phases=("db", "index"))
+    readiness.ready("db")
+    readiness.degraded("index", "answering without retrieval")
+    assert readiness.is_ready
+    assert readiness.snapshot()["status"] == "ready"
+    assert readiness.state("index") == "degraded"
+
+
+def test_failed_phase_fails_the_report():
+    readiness = Readiness(phases=("db", "index"))
+    readiness.failed("db", "no database")
+    readiness.ready("index")
+    report = readiness.snapshot()
+    assert report["status"] == "failed"
+    assert report["phases"]["db"]["detail"] == "no database"
+    assert not readiness.is_ready
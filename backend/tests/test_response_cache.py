@@ -0,0 +1,86 @@
+import threading
+import time
+
+import numpy as np
+
+from utils.response_cache import SemanticResponseCache
+
+
+def _cache(tmp_path=None, **kwargs):
+    path = str(tmp_path / "cache.sqlite3") if tmp_path is not None else ""
+    options = dict(path=path, enabled=True, threshold=0.9, ttl=60, maxsize=10)
+    options.update(kwargs)
+    return SemanticResponseCache(**options)
+
+
+def test_similar_message_with_same_emotion_hits():
+    cache = _cache()
+    cache.put("fear", [1.0, 0.0, 0.1], "Do your duty without fear.")
+    assert cache.get("fear", [0.98, 0.02, 0.12]) == "Do your duty without fear."
+    assert cache.stats()["hits"] == 1
+
+
+def test_below_threshold_or_other_emotion_misses():
+    cache = _cache()
+    cache.put("fear", [1.0, 0.0, 0.0], "reply")
+    assert cache.get("fear", [0.6, 0.8, 0.0]) is None
+    assert cache.get("joy", [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_expired_entries_are_not_served():
+    cache = _cache(ttl=0.01)
+    cache.put("fear", [1.0, 0.0], "reply")
+    time.sleep(0.02)
+    assert cache.get("fear", [1.0, 0.0]) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = _cache(maxsize=2)
+    cache.put("fear", [1.0, 0.0, 0.0], "first")
+    cache.put("fear", [0.0, 1.0, 0.0], "second")
+    assert cache.get("fear", [1.0, 0.0, 0.0]) == "first"
+    time.sleep(0.001)
+    cache.put("fear", [0.0, 0.0, 1.0], "third")
+    assert cache.get("fear", [0.0, 1.0, 0.0]) is None
+    assert cache.get("fear", [1.0, 0.0, 0.0]) == "first"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_survive_a_restart(tmp_path):
+    cache = _cache(tmp_path)
+    vector = np.array([0.3, 0.4, 0.5], dtype=np.float32)
+    cache.put("sadness", vector, "This too shall pass.")
+
+    reloaded = _cache(tmp_path)
+    assert reloaded.stats()["size"] == 1
+    assert reloaded.get("sadness", vector) == "This too shall pass."
+
+    reloaded.clear()
+    assert _cache(tmp_path).stats()["size"] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = _cache(enabled=False)
+    cache.put("fear", [1.0, 0.0], "reply")
+    assert cache.get("fear", [1.0, 0.0]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_concurrent_puts_and_gets_stay_consistent(tmp_path):
+    cache = _cache(tmp_path, maxsize=20)
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(4, 50, 8))
+
+    def work(worker):
+        for i, vector in enumerate(vectors[worker]):
+            cache.put("joy", vector, f"reply {worker}-{i}")
+            cache.get("joy", vector)
+
+    threads = [threading.Thread(target=work, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats()["size"] == 20
+    assert _cache(tmp_path, maxsize=20).stats()["size"] == 20
@@ -0,0 +1,65 @@
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+pytest.importorskip("langchain_community")
+
+from langchain_core.documents import Document
+
+from utils.shards import ShardSet, shard_name, staging_name
+
+
+class _LetterEmbeddings:
+    """Deterministic embeddings: letter frequencies, so texts sharing letters are close"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        text = text.lower()
+        return [float(text.count(letter)) + 0.01 for letter in "abcdefghijklmnopqrstuvwxyz"]
+
+
+@pytest.fixture
+def shards(tmp_path):
+    shard_set = ShardSet(chromadb.EphemeralClient(), _LetterEmbeddings(), str(tmp_path), max_workers=2)
+    yield shard_set
+    for source in list(shard_set.stores):
+        shard_set.drop(source)
+    shard_set.close()
+
+
+def _add(shards, source, texts, staged=False):
+    ids = [f"{source}:{i}" for i in range(len(texts))]
+    shards.add(source, [Document(page_content=t, metadata={"source": source}) for t in texts], ids, 2, staged=staged)
+    return ids
+
+
+def test_shard_names_are_valid_and_distinct():
+    names = {shard_name(s) for s in ("gita.txt", "gita.md", "moral values (gita).txt")}
+    assert len(names) == 3
+    long_source = "x" * 200 + ".txt"
+    assert 3 <= len(staging_name(long_source)) <= 63
+
+
+def test_query_merges_shards_and_honours_the_source_filter(shards):
+    gita = _add(shards, "gita.txt", ["aaaa", "bbbb"])
+    values = _add(shards, "values.txt", ["aaab", "cccc"])
+    assert shards.query(_LetterEmbeddings().embed_query("aaaa"), 2) == [gita[0], values[0]]
+    assert shards.query(_LetterEmbeddings().embed_query("aaaa"), 2, sources=["values.txt"]) == [values[0], values[1]]
+    assert shards.query(_LetterEmbeddings().embed_query("aaaa"), 2, sources=["missing.txt"]) == []
+    assert shards.counts() == {"gita.txt": 2, "values.txt": 2}
+
+
+def test_staged_rebuild_keeps_serving_until_swapped(shards):
+    old = _add(shards, "gita.txt", ["aaaa", "bbbb"])
+    shards.stage("gita.txt")
+    _add(shards, "gita.txt", ["aaaa", "bbbb", "cccc"], staged=True)
+    # The live shard answers while the new one is built
+    assert shards.counts() == {"gita.txt": 2}
+    assert shards.query(_LetterEmbeddings().embed_query("aaaa"), 1) == [old[0]]
+
+    shards.swap("gita.txt")
+    assert shards.counts() == {"gita.txt": 3}
+    names = {c.name if hasattr(c, "name") else c for c in shards.client.list_collections()}
+    assert shard_name("gita.txt") in names
+    assert staging_name("gita.txt") not in names
@@ -0,0 +1,214 @@
+import asyncio
+import gc
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "reply"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        assert results == ["reply"] * 5
+        assert calls == 1
+        assert flight.stats()["coalesced"] == 4
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_different_keys_run_separately():
+    async def run():
+        flight = SingleFlight("test")
+
+        async def work(value):
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(flight.do("a", lambda: work(1)), flight.do("b", lambda: work(2)))
+        assert results == [1, 2]
+        assert flight.stats()["executed"] == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def run():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "reply"
+
+        leader = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await follower == "reply"
+        assert leader.cancelled()
+
+    asyncio.run(run())
+
+
+def test_error_reaches_every_caller():
+    async def run():
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flight.do("key", work), flight.do("key", work), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(run())
+
+
+def test_error_with_all_callers_cancelled_is_not_reported_as_unretrieved():
+    unhandled = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            raise ValueError("boom")
+
+        caller = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        release.set()
+        await asyncio.sleep(0.01)
+        gc.collect()
+
+    asyncio.run(run())
+    assert not unhandled
+
+
+async def _collect(items):
+    return [item async for item in items]
+
+
+def test_concurrent_streams_share_one_execution():
+    async def run():
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            for piece in ("a", "b", "c"):
+                await asyncio.sleep(0.001)
+                yield piece
+
+        results = await asyncio.gather(*(_collect(flight.stream("key", work)) for _ in range(3)))
+        assert results == [["a", "b", "c"]] * 3
+        assert calls == 1
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_late_stream_caller_gets_the_missed_items():
+    async def run():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def work():
+            yield "first"
+            await release.wait()
+            yield "second"
+
+        early = flight.stream("key", work)
+        assert await early.__anext__() == "first"
+        late = asyncio.ensure_future(_collect(flight.stream("key", work)))
+        await asyncio.sleep(0)
+        release.set()
+        assert await _collect(early) == ["second"]
+        assert await late == ["first", "second"]
+        assert flight.stats()["coalesced"] == 1
+
+    asyncio.run(run())
+
+
+def test_stream_keeps_running_while_anyone_reads():
+    async def run():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+        closed = []
+
+        async def work():
+            try:
+                yield "first"
+                await release.wait()
+                yield "second"
+            finally:
+                closed.append(True)
+
+        leader = flight.stream("key", work)
+        follower = flight.stream("key", work)
+        assert await leader.__anext__() == "first"
+        assert await follower.__anext__() == "first"
+        await leader.aclose()
+        release.set()
+        assert await _collect(follower) == ["second"]
+        assert closed == [True]
+
+    asyncio.run(run())
+
+
+def test_stream_is_cancelled_when_its_last_caller_leaves():
+    async def run():
+        flight = SingleFlight("test")
+        closed = []
+
+        async def work():
+            try:
+                yield "first"
+                await asyncio.sleep(10)
+                yield "never"
+            finally:
+                closed.append(True)
+
+        only = flight.stream("key", work)
+        assert await only.__anext__() == "first"
+        await only.aclose()
+        await asyncio.sleep(0)
+        assert closed == [True]
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_stream_error_reaches_every_caller():
+    async def run():
+        flight = SingleFlight("test")
+
+        async def work():
+            yield "first"
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            _collect(flight.stream("key", work)), _collect(flight.stream("key", work)), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(run())
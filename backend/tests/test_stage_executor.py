@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.stage_executor import StageExecutor, StageOverloaded
+
+
+def test_result_is_returned_within_the_deadline():
+    stage = StageExecutor("embed", max_workers=1, timeout=1.0)
+    assert asyncio.run(stage.run(lambda x: x * 2, 21)) == 42
+    stats = stage.stats()
+    assert stats["completed"] == 1 and stats["in_flight"] == 0
+
+
+def test_deadline_raises_but_the_call_keeps_its_worker():
+    stage = StageExecutor("search", max_workers=1, timeout=0.05)
+    release = threading.Event()
+
+    async def run():
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await stage.run(release.wait, 5)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 1
+    # The timed-out call still occupies its slot until it actually returns
+    assert stage.stats()["timeouts"] == 1
+    assert stage.stats()["in_flight"] == 1
+    release.set()
+    deadline = time.monotonic() + 2
+    while stage.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stage.stats()["in_flight"] == 0
+
+
+def test_per_call_timeout_overrides_the_default():
+    stage = StageExecutor("search", max_workers=1, timeout=0.01)
+    assert asyncio.run(stage.run(time.sleep, 0.05, timeout=1.0)) is None
+    assert stage.stats()["timeouts"] == 0
+
+
+def test_calls_past_the_cap_are_rejected_at_once():
+    stage = StageExecutor("search", max_workers=2, timeout=0.02, max_in_flight=2)
+    release = threading.Event()
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await stage.run(release.wait, 5)
+        with pytest.raises(StageOverloaded):
+            await stage.run(lambda: "never runs")
+
+    asyncio.run(run())
+    release.set()
+    assert stage.stats()["rejected"] == 1
+
+
+def test_queued_call_that_times_out_frees_its_slot():
+    stage = StageExecutor("search", max_workers=1, timeout=0.02, max_in_flight=2)
+    release = threading.Event()
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await stage.run(release.wait, 5)
+        # The second call never started, so only the first still holds a slot
+        assert stage.stats()["in_flight"] == 1
+
+    asyncio.run(run())
+    release.set()
+
+
+def test_errors_propagate_and_are_counted():
+    stage = StageExecutor("embed", max_workers=1, timeout=1.0)
+
+    def fail():
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError, match="bad input"):
+        asyncio.run(stage.run(fail))
+    assert stage.stats()["errors"] == 1
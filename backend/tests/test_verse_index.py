@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from utils.verse_index import VerseIndex, is_valid_verse, parse_verse_reference, parse_verses
+
+BOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "extracted", "bhagavad_gita_text.txt")
+
+
+@pytest.mark.parametrize("message, reference", [
+    ("What does Chapter 2 Verse 47 say?", (2, 47)),
+    ("explain ch. 3 v. 9", (3, 9)),
+    ("chapter 18, sloka 66", (18, 66)),
+    ("BG 2.47", (2, 47)),
+    ("gita 18:66 please", (18, 66)),
+    ("Bhagavad Gita (4.7)", (4, 7)),
+    ("what is verse 6.5 about", (6, 5)),
+])
+def test_explicit_references_are_found(message, reference):
+    assert parse_verse_reference(message) == reference
+
+
+@pytest.mark.parametrize("message", [
+    "I only slept (2.5) hours and feel anxious",
+    "my grade went from 3.2 to 2.8",
+    "version 1.10 of the app",
+    "BG 2.99",  # chapter 2 has 72 verses
+    "chapter 19 verse 1",
+])
+def test_other_numbers_are_not_references(message):
+    assert parse_verse_reference(message) is None
+
+
+def test_verse_counts():
+    assert is_valid_verse(2, 72)
+    assert not is_valid_verse(2, 73)
+    assert not is_valid_verse(0, 1)
+
+
+SAMPLE = (
+    "Introduction mentioning (2.47) as a cross-reference.\n"
+    "dharma-kshetre && 1 &&\n"
+    "Dhritarashtra said: at Kurukshetra, what did my sons do? (1.1)\n"
+    "sanjaya uvacha && 2 &&\n"
+    "Sanjaya said: seeing the army, Duryodhana spoke. (1.2)\n"
+    "pashyaitam && 3-4 &&\n"
+    "Behold the mighty army. (1.3) (1.4)\n"
+    "Stray note on (1.2) again.\n"
+    "next chapter && 1 &&\n"
+    "Sanjaya said: to him, overcome with pity. (2.1)\n"
+)
+
+
+def test_parse_verses_follows_reading_order():
+    verses = parse_verses(SAMPLE)
+    assert sorted(verses) == [(1, 1), (1, 2), (1, 3), (1, 4), (2, 1)]
+    assert verses[(1, 1)]["text"] == "Dhritarashtra said: at Kurukshetra, what did my sons do?"
+    # A marker covering two verses maps both to the same translation
+    assert verses[(1, 3)] is verses[(1, 4)]
+    assert SAMPLE[verses[(2, 1)]["start"]:verses[(2, 1)]["end"]].strip() == "Sanjaya said: to him, overcome with pity."
+
+
+def test_index_lookup_and_locate():
+    index = VerseIndex()
+    index.set_source("gita.txt", "hash", parse_verses(SAMPLE))
+    assert index.lookup(1, 2)["text"] == "Sanjaya said: seeing the army, Duryodhana spoke."
+    assert index.lookup(5, 5) is None
+    span = parse_verses(SAMPLE)[(1, 2)]
+    assert index.locate("gita.txt", span["start"], span["end"]) == (1, 2)
+
+
+@pytest.mark.skipif(not os.path.exists(BOOK), reason="extracted book not available")
+def test_extracted_book_parses_almost_every_verse():
+    with open(BOOK, encoding="utf-8") as f:
+        verses = parse_verses(f.read())
+    assert len(verses) >= 697
+    assert verses[(2, 47)]["text"].startswith("You only have the right to do your duty")
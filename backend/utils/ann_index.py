@@ -0,0 +1,225 @@
+"""
+FAISS index factory for the RAG pipeline
+flat (exact brute force), hnsw (graph) or ivfpq (trained inverted lists + product quantization),
+optionally storing vectors as float16 or int8 (scalar quantization with a per-dimension
+scale), with runtime search parameters and a recall@k check against the exact flat index.
+"""
+
+import os
+import time
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from utils.quantization import VECTOR_DTYPES, vector_dtype_from_env
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+# QT_8bit trains a min/max range per dimension
+SCALAR_QUANTIZERS = {"float16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+
+
+class IndexConfig:
+    """Index type plus its build and search parameters (all overridable via env)"""
+
+    def __init__(
+        self,
+        index_type: Optional[str] = None,
+        hnsw_m: Optional[int] = None,
+        hnsw_ef_construction: Optional[int] = None,
+        hnsw_ef_search: Optional[int] = None,
+        ivf_nlist: Optional[int] = None,
+        ivf_nprobe: Optional[int] = None,
+        pq_m: Optional[int] = None,
+        pq_nbits: Optional[int] = None,
+        vector_dtype: Optional[str] = None,
+        rescore_factor: Optional[int] = None,
+    ):
+        self.index_type = (index_type or os.getenv("RAG_INDEX_TYPE", "flat")).lower()
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown RAG index type '{self.index_type}', expected one of {INDEX_TYPES}")
+        self.hnsw_m = hnsw_m or int(os.getenv("RAG_HNSW_M", "32"))
+        self.hnsw_ef_construction = hnsw_ef_construction or int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "200"))
+        self.hnsw_ef_search = hnsw_ef_search or int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+        # 0 = derive from corpus size at build time
+        self.ivf_nlist = ivf_nlist if ivf_nlist is not None else int(os.getenv("RAG_IVF_NLIST", "0"))
+        self.ivf_nprobe = ivf_nprobe or int(os.getenv("RAG_IVF_NPROBE", "8"))
+        self.pq_m = pq_m or int(os.getenv("RAG_PQ_M", "16"))
+        self.pq_nbits = pq_nbits or int(os.getenv("RAG_PQ_NBITS", "8"))
+        # Stored vector precision for flat/hnsw (ivfpq is already compressed by PQ)
+        self.vector_dtype = (vector_dtype or vector_dtype_from_env()).lower()
+        if self.vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype '{self.vector_dtype}', expected one of {VECTOR_DTYPES}")
+        # Fetch k * factor candidates and re-rank them on the float32 vectors (0/1 = off)
+        self.rescore_factor = rescore_factor if rescore_factor is not None else int(os.getenv("RAG_RESCORE_FACTOR", "0"))
+
+    @property
+    def variant(self) -> str:
+        """Index type plus stored precision, e.g. flat, hnsw-float16, flat-int8"""
+        if self.vector_dtype == "float32" or self.index_type == "ivfpq":
+            return self.index_type
+        return f"{self.index_type}-{self.vector_dtype}"
+
+    def to_dict(self) -> dict:
+        params = {"index_type": self.index_type, "variant": self.variant}
+        if self.variant != "flat":
+            params["rescore_factor"] = self.rescore_factor
+        if self.index_type == "hnsw":
+            params.update(m=self.hnsw_m, ef_construction=self.hnsw_ef_construction, ef_search=self.hnsw_ef_search)
+        elif self.index_type == "ivfpq":
+            params.update(nlist=self.ivf_nlist, nprobe=self.ivf_nprobe, pq_m=self.pq_m, pq_nbits=self.pq_nbits)
+        return params
+
+
+def index_path_for(flat_path: str, variant: str) -> str:
+    """vector_index.faiss → vector_index.hnsw.faiss, vector_index.flat-int8.faiss etc."""
+    if variant == "flat":
+        return flat_path
+    root, ext = os.path.splitext(flat_path)
+    return f"{root}.{variant}{ext}"
+
+
+def build_index(embeddings: np.ndarray, config: IndexConfig) -> faiss.Index:
+    """
+    Build the configured index over float32 embeddings
+
+    IVF-PQ needs enough vectors to train its coarse and PQ codebooks (39 per centroid);
+    below that it falls back to an exact flat index, which is fast at that size anyway.
+    """
+    n, dimension = embeddings.shape
+    qtype = SCALAR_QUANTIZERS.get(config.vector_dtype)
+
+    if config.index_type == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dimension, config.hnsw_m)
+        else:
+            index = faiss.IndexHNSWSQ(dimension, qtype, config.hnsw_m)
+            index.train(embeddings)
+        index.hnsw.efConstruction = config.hnsw_ef_construction
+        index.add(embeddings)
+        apply_search_params(index, config)
+        return index
+
+    if config.index_type == "ivfpq":
+        # faiss wants ~39 training points per centroid, for the coarse and each PQ codebook
+        nlist = config.ivf_nlist or max(1, min(int(4 * np.sqrt(n)), n // 39))
+        needed = max(39 * nlist, 39 * 2 ** config.pq_nbits)
+        if dimension % config.pq_m != 0 or n < needed:
+            print(f"⚠️ IVF-PQ needs {needed} vectors, have {n} (nlist={nlist}); using flat index")
+        else:
+            quantizer = faiss.IndexFlatL2(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, config.pq_m, config.pq_nbits)
+            index.train(embeddings)
+            index.add(embeddings)
+            apply_search_params(index, config)
+            return index
+
+    if qtype is not None and config.index_type == "flat":
+        index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_L2)
+        index.train(embeddings)
+        index.add(embeddings)
+        return index
+
+    index = faiss.IndexFlatL2(dimension)
+    index.add(embeddings)
+    return index
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Type of a built index (build_index may have fallen back from the configured one)"""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def apply_search_params(index: faiss.Index, config: IndexConfig) -> None:
+    """Set runtime search knobs (not persisted by faiss.write_index for all types)"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.hnsw_ef_search
+        return
+    try:
+        faiss.extract_index_ivf(index).nprobe = config.ivf_nprobe
+    except RuntimeError:
+        pass  # not an IVF index
+
+
+class RescoredSearch:
+    """
+    Search an approximate index for k * factor candidates, then re-rank them by
+    exact L2 distance on the float32 vectors (a memory-mapped copy on disk)
+    """
+
+    def __init__(self, index: faiss.Index, vectors: np.ndarray, factor: int):
+        self.index = index
+        self.vectors = vectors
+        self.factor = factor
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def search(self, queries: np.ndarray, k: int):
+        candidates = min(self.index.ntotal, k * self.factor)
+        _, found = self.index.search(queries, candidates)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, (query, rows) in enumerate(zip(queries, found)):
+            rows = rows[(rows >= 0) & (rows < len(self.vectors))]
+            if not len(rows):
+                continue
+            exact = ((np.asarray(self.vectors[rows]) - query) ** 2).sum(axis=1)
+            order = np.argsort(exact)[:k]
+            distances[row, :len(order)] = exact[order]
+            ids[row, :len(order)] = rows[order]
+        return distances, ids
+
+
+def memory_report(index: faiss.Index, exact: faiss.Index) -> dict:
+    """Serialized (≈ in-memory) size of the live index against the float32 flat index"""
+    size = faiss.serialize_index(index).nbytes
+    flat_size = faiss.serialize_index(exact).nbytes
+    return {
+        "memory_mb": round(size / 2**20, 3),
+        "flat_memory_mb": round(flat_size / 2**20, 3),
+        "memory_saving": round(1 - size / flat_size, 4) if flat_size else 0.0,
+    }
+
+
+def recall_at_k(
+    exact: faiss.Index,
+    approx,
+    queries: np.ndarray,
+    k: int = 10,
+) -> dict:
+    """
+    Compare an approximate index against exact search on the same queries
+
+    Returns:
+        recall@k (fraction of exact top-k ids the approximate index also returned)
+        and mean per-query latency of both indexes in milliseconds
+    """
+    k = min(k, exact.ntotal)
+    if k <= 0 or len(queries) == 0:
+        return {"k": k, "queries": 0, "recall": None}
+
+    start = time.perf_counter()
+    _, exact_ids = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    _, approx_ids = approx.search(queries, k)
+    approx_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = sum(
+        len(set(e[e >= 0].tolist()) & set(a[a >= 0].tolist()))
+        for e, a in zip(exact_ids, approx_ids)
+    )
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall": round(hits / (k * len(queries)), 4),
+        "exact_ms_per_query": round(exact_ms, 4),
+        "approx_ms_per_query": round(approx_ms, 4),
+    }
@@ -0,0 +1,111 @@
+"""
+BM25 inverted index over RAG chunks
+Pure-Python lexical retrieval: needs no embedding model, so it can answer queries
+while the embedder is still loading and act as a cheap first stage afterwards.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "do", "for", "from",
+    "have", "he", "his", "i", "in", "is", "it", "its", "me", "my", "of", "on",
+    "or", "so", "that", "the", "their", "them", "they", "this", "to", "was",
+    "we", "were", "what", "which", "who", "will", "with", "you", "your",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[Hashable] = []
+        self.doc_len: List[int] = []
+        self.postings: Dict[str, List[List[int]]] = defaultdict(list)
+        self._total_len = 0
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Tuple[Hashable, str]], **kwargs) -> "BM25Index":
+        index = cls(**kwargs)
+        for doc_id, text in documents:
+            index.add(doc_id, text)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        tokens = tokenize(text)
+        doc_idx = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_len.append(len(tokens))
+        self._total_len += len(tokens)
+        for term, tf in Counter(tokens).items():
+            self.postings[term].append([doc_idx, tf])
+
+    def search(
+        self, query: str, k: int = 10, allow: Optional[Callable[[Hashable], bool]] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """Return up to k (doc_id, score) pairs, best first (only ids passing `allow`, if given)"""
+        n = len(self.doc_ids)
+        if not n:
+            return []
+        avg_len = self._total_len / n or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc_idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_idx] / avg_len)
+                scores[doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        candidates = scores.items()
+        if allow is not None:
+            candidates = [(i, score) for i, score in candidates if allow(self.doc_ids[i])]
+        best = heapq.nlargest(k, candidates, key=lambda item: item[1])
+        return [(self.doc_ids[doc_idx], score) for doc_idx, score in best]
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "doc_ids": self.doc_ids,
+                "doc_len": self.doc_len,
+                "postings": self.postings,
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.doc_ids = data["doc_ids"]
+        index.doc_len = data["doc_len"]
+        index.postings = defaultdict(list, data["postings"])
+        index._total_len = sum(index.doc_len)
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int, rrf_k: int = 60) -> List[Hashable]:
+    """Fuse several ranked id lists into one (Reciprocal Rank Fusion)"""
+    scores: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (rrf_k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: -item[1])[:k]]
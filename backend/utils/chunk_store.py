@@ -0,0 +1,148 @@
+"""
+Memory-mapped chunk store
+All chunk texts live in one contiguous UTF-8 blob (chunks.bin) with an int64 offsets
+array (chunks.idx, .npy format). Both are opened with mmap, so each lookup decodes
+only the rows it needs and every worker process shares the same page cache.
+"""
+
+import mmap
+import os
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+class ChunkStoreWriter:
+    """Append chunks one at a time; nothing but the offsets is held in memory"""
+
+    def __init__(self, data_path: str, offsets_path: str, resume: bool = False, rows: Optional[int] = None):
+        """
+        Args:
+            data_path: Destination of the UTF-8 blob
+            offsets_path: Destination of the offsets array
+            resume: Continue appending to an unfinished write (see checkpoint())
+            rows: On resume, the row count the caller's own checkpoint recorded; rows
+                checkpointed here after it are dropped so both stay in step
+
+        Raises:
+            ValueError: resuming to more rows than the unfinished write holds
+        """
+        self.data_path = data_path
+        self.offsets_path = offsets_path
+        self._tmp_data = data_path + ".tmp"
+        self._tmp_offsets = offsets_path + ".tmp"
+        self.offsets = [0]
+        if resume and os.path.exists(self._tmp_data) and os.path.exists(self._tmp_offsets):
+            self.offsets = np.load(self._tmp_offsets).tolist()
+            if rows is not None:
+                if rows > len(self.offsets) - 1:
+                    raise ValueError(f"unfinished chunk store has {len(self.offsets) - 1} rows, expected {rows}")
+                del self.offsets[rows + 1:]
+            self._file = open(self._tmp_data, "r+b")
+            # Drop bytes written after the last checkpoint
+            self._file.truncate(self.offsets[-1])
+            self._file.seek(self.offsets[-1])
+        elif resume and rows:
+            raise ValueError(f"unfinished chunk store is missing, expected {rows} rows")
+        else:
+            self._file = open(self._tmp_data, "wb")
+
+    def append(self, chunk: str) -> int:
+        """Append one chunk and return its row number"""
+        encoded = chunk.encode("utf-8")
+        self._file.write(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+        return len(self.offsets) - 2
+
+    def extend(self, chunks: Iterable[str]) -> None:
+        for chunk in chunks:
+            self.append(chunk)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _write_offsets(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.save(f, np.asarray(self.offsets, dtype=np.int64))
+
+    def checkpoint(self) -> None:
+        """Flush everything appended so far so a crashed write can be resumed"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._write_offsets(self._tmp_offsets)
+
+    def close(self) -> "ChunkStore":
+        """Finish the write, atomically publish both files and open them for reading"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._write_offsets(self._tmp_offsets)
+        os.replace(self._tmp_data, self.data_path)
+        os.replace(self._tmp_offsets, self.offsets_path)
+        return ChunkStore(self.data_path, self.offsets_path)
+
+    def release(self) -> None:
+        """Close the file but keep the unfinished write so it can be resumed"""
+        if not self._file.closed:
+            self._file.close()
+
+    def abort(self) -> None:
+        """Discard an unfinished write"""
+        self._file.close()
+        for path in (self._tmp_data, self._tmp_offsets):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class ChunkStore:
+    """Read-only, list-like view over a written chunk store"""
+
+    def __init__(self, data_path: str, offsets_path: str):
+        self.data_path = data_path
+        self.offsets_path = offsets_path
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        self._file = open(data_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._data: Optional[mmap.mmap] = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        )
+
+    @staticmethod
+    def exists(data_path: str, offsets_path: str) -> bool:
+        return os.path.exists(data_path) and os.path.exists(offsets_path)
+
+    @classmethod
+    def write(cls, chunks: Iterable[str], data_path: str, offsets_path: str) -> "ChunkStore":
+        writer = ChunkStoreWriter(data_path, offsets_path)
+        writer.extend(chunks)
+        return writer.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("chunk index out of range")
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        if self._data is None:
+            return ""
+        return self._data[start:end].decode("utf-8")
+
+    def get_many(self, indices: Iterable[int]) -> List[str]:
+        return [self[int(i)] for i in indices]
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def nbytes(self) -> int:
+        return int(self.offsets[-1]) if len(self.offsets) else 0
+
+    def close(self) -> None:
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        self._file.close()
@@ -0,0 +1,162 @@
+"""
+Adaptive (AIMD) concurrency limit for calls to one LLM provider
+Calls beyond the current limit wait in a bounded FIFO queue for at most a queue-time
+deadline; past that, or with the queue full, they are rejected at once so the caller
+can answer locally (or with 503) instead of piling onto a provider that is already
+saturated. The limit grows by about one per limit's worth of fast successful calls
+(additive increase) and halves on a rate-limit response or a call slower than the
+latency target (multiplicative decrease), at most once per cooldown.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Optional
+
+# Minimum time between two decreases: one overload burst should halve the limit once
+DECREASE_COOLDOWN_SECONDS = 2.0
+
+
+class ProviderOverloaded(RuntimeError):
+    """Raised when a call can't get a provider slot in time; retry_after is a hint in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        name: str,
+        initial: Optional[int] = None,
+        min_limit: Optional[int] = None,
+        max_limit: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        latency_target: Optional[float] = None,
+    ):
+        """
+        Args:
+            name: Provider name (errors, stats)
+            initial: Starting concurrency limit (LLM_CONCURRENCY_INITIAL)
+            min_limit: Lowest the limit may shrink to (LLM_CONCURRENCY_MIN)
+            max_limit: Highest the limit may grow to (LLM_CONCURRENCY_MAX)
+            queue_size: Calls allowed to wait for a slot (LLM_QUEUE_SIZE)
+            queue_timeout: Longest a call waits for a slot, in seconds (LLM_QUEUE_TIMEOUT_SECONDS)
+            latency_target: Calls slower than this count as congestion (LLM_LATENCY_TARGET_SECONDS)
+        """
+        self.name = name
+        self.min_limit = min_limit or int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+        self.max_limit = max_limit or int(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+        self.limit = float(initial or int(os.getenv("LLM_CONCURRENCY_INITIAL", "8")))
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv("LLM_QUEUE_SIZE", "32"))
+        self.queue_timeout = (
+            queue_timeout if queue_timeout is not None
+            else float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "2"))
+        )
+        self.latency_target = latency_target or float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "8"))
+        self.in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._last_decrease = 0.0
+        self._latency: Optional[float] = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.throttled = 0
+        self.decreases = 0
+
+    def _capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def has_free_slot(self) -> bool:
+        return self.in_flight < self._capacity() and not self._waiters
+
+    def retry_after(self) -> int:
+        """Rough seconds until a slot frees up for a new caller"""
+        latency = self._latency or self.queue_timeout
+        return max(1, math.ceil(latency * (len(self._waiters) + 1) / self._capacity()))
+
+    def _wake(self) -> None:
+        """Hand free slots to waiters, oldest first"""
+        while self._waiters and self.in_flight < self._capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self, queue: bool = True) -> None:
+        """
+        Take a slot, waiting in the queue if `queue` and there is room
+
+        Raises:
+            ProviderOverloaded: no slot within the queue-time deadline, or no room to wait
+        """
+        if self.has_free_slot():
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if not queue or len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise ProviderOverloaded(
+                f"{self.name}: {self.in_flight} calls in flight, {len(self._waiters)} queued", self.retry_after()
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise ProviderOverloaded(
+                    f"{self.name}: no slot within {self.queue_timeout}s", self.retry_after()
+                ) from None
+            raise
+        self.admitted += 1
+
+    def release(self, seconds: Optional[float] = None, throttled: bool = False) -> None:
+        """
+        Give the slot back. `seconds` (a completed call's latency) and `throttled`
+        (the provider answered 429) adjust the limit; a release without either doesn't.
+        """
+        if seconds is not None:
+            self._latency = seconds if self._latency is None else 0.2 * seconds + 0.8 * self._latency
+        if throttled:
+            self.throttled += 1
+        if throttled or (seconds is not None and seconds > self.latency_target):
+            now = time.monotonic()
+            if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+                self._last_decrease = now
+                self.limit = max(float(self.min_limit), self.limit / 2)
+                self.decreases += 1
+                print(f"⚠️ {self.name} concurrency limit lowered to {self._capacity()}")
+        elif seconds is not None:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        self.in_flight -= 1
+        self._wake()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self._capacity(),
+            "in_flight": self.in_flight,
+            "queued_now": len(self._waiters),
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "queue_timeouts": self.timed_out,
+            "throttled": self.throttled,
+            "decreases": self.decreases,
+        }
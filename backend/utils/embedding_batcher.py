@@ -0,0 +1,103 @@
+"""
+Micro-batching embedding executor
+Queries arriving within a few milliseconds of each other are encoded in one
+batched model call instead of one call per query; each caller gets its own vector.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence
+
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], Sequence[Any]],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        name: str = "embedder",
+    ):
+        """
+        Args:
+            encode_batch: Function encoding a list of texts into one vector per text
+            max_batch_size: Most texts encoded in a single call (RAG_EMBED_BATCH_SIZE)
+            max_wait_ms: How long the first query of a batch waits for company (RAG_EMBED_MAX_WAIT_MS)
+            name: Worker thread name
+        """
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size or int(os.getenv("RAG_EMBED_BATCH_SIZE", "32"))
+        wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv("RAG_EMBED_MAX_WAIT_MS", "5"))
+        self.max_wait = max(wait_ms, 0.0) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for embedding; the future resolves to its vector"""
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> Any:
+        """Embed one text, blocking until its batch has been encoded"""
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            # Callers that gave up (cancelled futures) don't need encoding
+            batch = [(text, fut) for text, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                vectors = self.encode_batch([text for text, _ in batch])
+                for (_, fut), vector in zip(batch, vectors):
+                    fut.set_result(vector)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "pending": self._queue.qsize(),
+        }
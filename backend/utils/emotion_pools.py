@@ -0,0 +1,155 @@
+"""
+Per-emotion retrieval candidate pools
+Every /chat message is mapped to one of a few fixed emotions, and the passages worth
+quoting for an emotion hardly change between messages. Each emotion's seed vocabulary
+is searched once (BM25, fused with vector search when the embedder is available) to
+get a ranked pool of chunks; at request time only that small pool is re-ranked against
+the message. Pools are tied to a signature of the indexed chunk ids and rebuilt when
+the index changes.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from utils.bm25 import BM25Index, reciprocal_rank_fusion
+
+
+def index_signature(doc_ids: Iterable[Hashable]) -> str:
+    """Order-independent fingerprint of the indexed chunk ids"""
+    digest = hashlib.sha256()
+    for doc_id in sorted(str(d) for d in doc_ids):
+        digest.update(doc_id.encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+class EmotionPools:
+    def __init__(self, path: str, pool_size: Optional[int] = None):
+        """
+        Args:
+            path: JSON file holding the pooled ids and the index signature they were built for
+            pool_size: Chunks kept per emotion
+        """
+        self.path = path
+        self.pool_size = pool_size or int(os.getenv("RAG_EMOTION_POOL_SIZE", "40"))
+        self.signature: Optional[str] = None
+        self.with_vectors = False
+        self._lock = threading.Lock()
+        # emotion → {"ids", "docs", "matrix", "bm25"}
+        self._pools: Dict[str, dict] = {}
+        self.rebuilds = 0
+
+    def is_current(self, signature: str, want_vectors: bool) -> bool:
+        return bool(self._pools) and self.signature == signature and (self.with_vectors or not want_vectors)
+
+    def _materialize(self, ids: List[Hashable], fetch: Callable[[List[Hashable]], List[dict]]) -> dict:
+        docs = fetch(ids)
+        embeddings = [d.get("embedding") for d in docs]
+        matrix = None
+        if docs and all(e is not None for e in embeddings):
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return {
+            "ids": ids,
+            "docs": docs,
+            "matrix": matrix,
+            "bm25": BM25Index.from_documents((i, d["text"]) for i, d in enumerate(docs)),
+        }
+
+    def build(
+        self,
+        seeds: Dict[str, str],
+        bm25: BM25Index,
+        fetch: Callable[[List[Hashable]], List[dict]],
+        signature: str,
+        vector_search: Optional[Callable[[str, int], List[Hashable]]] = None,
+    ) -> None:
+        """
+        Args:
+            seeds: emotion → seed query
+            bm25: Lexical index over all chunks
+            fetch: ids → [{"text", "metadata", "embedding"}] in the same order
+            signature: index_signature of the chunks the pools are built from
+            vector_search: (query, k) → ranked ids, when the embedder is available
+        """
+        pools, stored = {}, {}
+        for emotion, seed in seeds.items():
+            rankings = [[doc_id for doc_id, _ in bm25.search(seed, self.pool_size)]]
+            if vector_search is not None:
+                rankings.append(vector_search(seed, self.pool_size))
+            ids = reciprocal_rank_fusion([r for r in rankings if r], self.pool_size)
+            pools[emotion] = self._materialize(ids, fetch)
+            stored[emotion] = ids
+        with self._lock:
+            self._pools = pools
+            self.signature = signature
+            self.with_vectors = vector_search is not None
+            self.rebuilds += 1
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"signature": signature, "with_vectors": self.with_vectors, "pools": stored}, f)
+        os.replace(tmp_path, self.path)
+        print(f"✅ Emotion pools built: {len(pools)} emotions × ≤{self.pool_size} chunks"
+              f"{' (lexical only)' if vector_search is None else ''}")
+
+    def load(self, signature: str, fetch: Callable[[List[Hashable]], List[dict]]) -> bool:
+        """Load persisted pools if they were built for the current index"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if data.get("signature") != signature:
+            return False
+        pools = {emotion: self._materialize(ids, fetch) for emotion, ids in data["pools"].items()}
+        with self._lock:
+            self._pools = pools
+            self.signature = signature
+            self.with_vectors = data.get("with_vectors", False)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pools = {}
+            self.signature = None
+            self.with_vectors = False
+
+    def has(self, emotion: str) -> bool:
+        return emotion in self._pools
+
+    def rank(
+        self,
+        emotion: str,
+        query: str,
+        k: int,
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> List[dict]:
+        """
+        Top-k pool chunks for a message: fuses the pool's own order with BM25 over
+        the pool and, when given, cosine similarity to the live query vector
+        """
+        pool = self._pools.get(emotion)
+        if not pool or not pool["docs"]:
+            return []
+        rankings = [list(range(len(pool["docs"])))]
+        lexical = [i for i, _ in pool["bm25"].search(query, len(pool["docs"]))]
+        if lexical:
+            rankings.append(lexical)
+        if query_vector is not None and pool["matrix"] is not None:
+            vector = np.asarray(query_vector, dtype=np.float32)
+            scores = pool["matrix"] @ (vector / max(float(np.linalg.norm(vector)), 1e-12))
+            # The live query outweighs the precomputed order
+            rankings.extend([np.argsort(-scores).tolist()] * 2)
+        return [pool["docs"][i] for i in reciprocal_rank_fusion(rankings, k)]
+
+    def stats(self) -> dict:
+        return {
+            "emotions": len(self._pools),
+            "pool_size": self.pool_size,
+            "with_vectors": self.with_vectors,
+            "rebuilds": self.rebuilds,
+        }
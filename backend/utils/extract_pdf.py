@@ -1,16 +1,196 @@
+"""
+Streaming PDF text extraction with a per-page cache
+Pages are yielded one at a time and written out as they come, so memory stays flat
+for 700+ page books. Extracted page texts are cached in SQLite by PDF hash and page
+number, plus a fingerprint of the page's content streams: an unchanged file is read
+back from the cache without opening it, and after an edit only pages whose content
+changed go through pdfplumber again.
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+from typing import Iterator, Optional, Tuple
+
 import pdfplumber
+from pdfminer.pdftypes import resolve1
+
+# Pages extracted between cache commits
+COMMIT_EVERY = 32
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def page_fingerprint(page) -> str:
+    """Hash of a page's size and raw content streams (what the text is drawn from)"""
+    digest = hashlib.sha256(repr(page.bbox).encode("utf-8"))
+    contents = page.page_obj.contents or []
+    for stream in contents if isinstance(contents, list) else [contents]:
+        stream = resolve1(stream)
+        raw = stream.get_rawdata() if hasattr(stream, "get_rawdata") else None
+        digest.update(raw if raw is not None else stream.get_data())
+    return digest.hexdigest()
+
+
+class PageCache:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: SQLite file of the cache (PDF_PAGE_CACHE_PATH)
+        """
+        self.path = path or os.getenv("PDF_PAGE_CACHE_PATH", "data/pdf_page_cache.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Build workers in other processes may write at the same time
+        self._db = sqlite3.connect(self.path, timeout=30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "pdf_sha256 TEXT NOT NULL, page INTEGER NOT NULL, fingerprint TEXT NOT NULL, "
+            "text TEXT NOT NULL, PRIMARY KEY (pdf_sha256, page))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_fingerprint ON pages (fingerprint)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents (pdf_sha256 TEXT PRIMARY KEY, pages INTEGER NOT NULL)"
+        )
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def document_pages(self, pdf_hash: str) -> Optional[int]:
+        """Page count of a PDF whose every page is cached"""
+        row = self._db.execute("SELECT pages FROM documents WHERE pdf_sha256 = ?", (pdf_hash,)).fetchone()
+        return row[0] if row else None
+
+    def page(self, pdf_hash: str, number: int) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT text FROM pages WHERE pdf_sha256 = ? AND page = ?", (pdf_hash, number)
+        ).fetchone()
+        return row[0] if row else None
+
+    def by_fingerprint(self, fingerprint: str) -> Optional[str]:
+        """Text of an identical page from an earlier version of the file (or another file)"""
+        row = self._db.execute("SELECT text FROM pages WHERE fingerprint = ? LIMIT 1", (fingerprint,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, pdf_hash: str, number: int, fingerprint: str, text: str) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO pages (pdf_sha256, page, fingerprint, text) VALUES (?, ?, ?, ?)",
+            (pdf_hash, number, fingerprint, text),
+        )
+
+    def complete(self, pdf_hash: str, pages: int) -> None:
+        self._db.execute("INSERT OR REPLACE INTO documents (pdf_sha256, pages) VALUES (?, ?)", (pdf_hash, pages))
+        self.commit()
+
+    def commit(self) -> None:
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def iter_pages(
+    pdf_path: str,
+    cache: Optional[PageCache] = None,
+    start_page: int = 0,
+    end_page: Optional[int] = None,
+    pdf_hash: Optional[str] = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for pages [start_page, end_page) in order;
+    pages without a text layer yield ""
+    """
+    if cache is not None:
+        pdf_hash = pdf_hash or file_sha256(pdf_path)
+        total = cache.document_pages(pdf_hash)
+        if total is not None:
+            # Whole file already extracted: no need to parse it at all
+            for number in range(start_page, min(end_page if end_page is not None else total, total)):
+                text = cache.page(pdf_hash, number)
+                if text is None:
+                    start_page = number
+                    break
+                cache.hits += 1
+                yield number, text
+            else:
+                return
 
-def extract_text_from_pdf(pdf_path, output_txt_path):
     with pdfplumber.open(pdf_path) as pdf:
-        text = ""
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
-    
-    with open(output_txt_path, 'w', encoding='utf-8') as f:
-        f.write(text)
-    print(f"Text extracted to {output_txt_path}")
+        total = len(pdf.pages)
+        end = min(end_page if end_page is not None else total, total)
+        for number in range(start_page, end):
+            page = pdf.pages[number]
+            text = None
+            if cache is not None:
+                text = cache.page(pdf_hash, number)
+                if text is None:
+                    fingerprint = page_fingerprint(page)
+                    text = cache.by_fingerprint(fingerprint)
+                    if text is None:
+                        text = page.extract_text() or ""
+                        cache.misses += 1
+                    else:
+                        cache.hits += 1
+                    cache.put(pdf_hash, number, fingerprint, text)
+                    if (number - start_page + 1) % COMMIT_EVERY == 0:
+                        cache.commit()
+                else:
+                    cache.hits += 1
+            else:
+                text = page.extract_text() or ""
+            # Drop the page's parsed layout before moving on
+            page.close()
+            yield number, text
+        if cache is not None:
+            if start_page == 0 and end == total:
+                cache.complete(pdf_hash, total)
+            else:
+                cache.commit()
+
+
+def extract_text_from_pdf(pdf_path: str, output_txt_path: str, cache: Optional[PageCache] = None) -> int:
+    """Write the text of every page (one trailing newline each) to output_txt_path; returns the page count"""
+    tmp_path = output_txt_path + ".tmp"
+    pages = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for _, text in iter_pages(pdf_path, cache):
+            f.write(text)
+            f.write("\n")
+            pages += 1
+    # A failed run never leaves a half-written text behind
+    os.replace(tmp_path, output_txt_path)
+    print(f"Text extracted to {output_txt_path} ({pages} pages)")
+    return pages
+
 
 if __name__ == "__main__":
-    pdf_path = r"c:\Users\HP\ABIMANYU AI\backend\data\docs\The Bhagavad Gita.pdf"
-    output_txt_path = "bhagavad_gita_text.txt"
-    extract_text_from_pdf(pdf_path, output_txt_path)
\ No newline at end of file
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Extract the text of a PDF page by page")
+    parser.add_argument(
+        "pdf_path", nargs="?",
+        default=os.path.join(backend_dir, "data", "docs", "The Bhagavad Gita.pdf")
+    )
+    parser.add_argument(
+        "output_txt_path", nargs="?",
+        default=os.path.join(backend_dir, "data", "extracted", "bhagavad_gita_text.txt")
+    )
+    parser.add_argument(
+        "--cache", default=os.path.join(backend_dir, "data", "pdf_page_cache.sqlite3"),
+        help="SQLite page cache ('' to disable)"
+    )
+    args = parser.parse_args()
+    page_cache = PageCache(args.cache) if args.cache else None
+    extract_text_from_pdf(args.pdf_path, args.output_txt_path, page_cache)
+    if page_cache is not None:
+        print(f"Page cache: {page_cache.stats()}")
+        page_cache.close()
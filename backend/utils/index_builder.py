@@ -0,0 +1,194 @@
+"""
+Streaming building blocks for RAGPipeline.build_index
+Pages are extracted in a process pool, chunked as a stream, and progress is
+checkpointed so an interrupted build resumes where it stopped.
+"""
+
+import json
+import os
+from concurrent.futures import Executor
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pdfplumber
+
+from utils.extract_pdf import PageCache, file_sha256, iter_pages
+
+
+def _extract_page_range(
+    pdf_path: str, start: int, end: int, cache_path: Optional[str] = None, pdf_hash: Optional[str] = None
+) -> List[str]:
+    """Process-pool worker: extract text of pages [start, end) of one PDF"""
+    cache = PageCache(cache_path) if cache_path else None
+    try:
+        return [text for _, text in iter_pages(pdf_path, cache, start, end, pdf_hash)]
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def count_pages(pdf_path: str) -> int:
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def iter_pdf_pages(
+    pdf_path: str,
+    executor: Executor,
+    start_page: int = 0,
+    pages_per_task: int = 16,
+    max_in_flight: int = 8,
+    cache_path: Optional[str] = None,
+) -> Iterator[tuple]:
+    """
+    Yield (page_number, text) in page order while later ranges extract in parallel
+
+    At most `max_in_flight` page ranges are pending at once, so extraction never
+    runs arbitrarily far ahead of the consumer. With a page cache, pages already
+    extracted (from this file or an unchanged page of an earlier version) are reused.
+    """
+    cache = PageCache(cache_path) if cache_path else None
+    pdf_hash = file_sha256(pdf_path) if cache is not None else None
+    total = (cache.document_pages(pdf_hash) if cache is not None else None) or count_pages(pdf_path)
+    ranges = [(s, min(s + pages_per_task, total)) for s in range(start_page, total, pages_per_task)]
+    pending = []
+    next_range = 0
+    while next_range < len(ranges) or pending:
+        while next_range < len(ranges) and len(pending) < max_in_flight:
+            start, end = ranges[next_range]
+            future = executor.submit(_extract_page_range, pdf_path, start, end, cache_path, pdf_hash)
+            pending.append((start, future))
+            next_range += 1
+        start, future = pending.pop(0)
+        for offset, text in enumerate(future.result()):
+            yield start + offset, text
+    if cache is not None:
+        # Workers cache ranges; the whole-file record lets the next run skip parsing
+        if start_page == 0:
+            cache.complete(pdf_hash, total)
+        cache.close()
+
+
+def iter_text_pages(txt_path: str, start_page: int = 0, lines_per_page: int = 50) -> Iterator[tuple]:
+    """
+    Yield (page_number, text) blocks of an already-extracted text file. Only the block's
+    final newline is dropped (StreamingChunker.feed adds it back), so blank lines at a
+    block boundary still separate paragraphs.
+    """
+    with open(txt_path, "r", encoding="utf-8") as f:
+        page, lines = 0, []
+        for line in f:
+            lines.append(line)
+            if len(lines) == lines_per_page:
+                if page >= start_page:
+                    yield page, _without_final_newline("".join(lines))
+                page, lines = page + 1, []
+        if lines and page >= start_page:
+            yield page, _without_final_newline("".join(lines))
+
+
+def _without_final_newline(text: str) -> str:
+    return text[:-1] if text.endswith("\n") else text
+
+
+class StreamingChunker:
+    """
+    Feed page texts in, get finished chunks out
+
+    The last (possibly incomplete) chunk stays buffered so text running across
+    a page boundary is chunked together, like splitting the whole book at once.
+    """
+
+    def __init__(self, splitter, flush_chars: int = 4000, buffer: str = ""):
+        self.splitter = splitter
+        self.flush_chars = flush_chars
+        self.buffer = buffer
+
+    def feed(self, text: str) -> List[str]:
+        if text:
+            self.buffer += text + "\n"
+        if len(self.buffer) < self.flush_chars:
+            return []
+        chunks = self.splitter.split_text(self.buffer)
+        if len(chunks) <= 1:
+            return []
+        tail = chunks[-1]
+        pos = self.buffer.rfind(tail)
+        self.buffer = self.buffer[pos:] if pos >= 0 else tail
+        return chunks[:-1]
+
+    def flush(self) -> List[str]:
+        chunks = self.splitter.split_text(self.buffer) if self.buffer.strip() else []
+        self.buffer = ""
+        return chunks
+
+
+class EmbeddingSpool:
+    """Append-only float32 embedding file, the resumable copy of what the flat index holds"""
+
+    def __init__(self, path: str, dimension: Optional[int] = None, rows: int = 0):
+        self.path = path
+        self.dimension = dimension
+        self.rows = rows
+        mode = "r+b" if rows and os.path.exists(path) else "wb"
+        self._file = open(path, mode)
+        if self.dimension:
+            # Drop rows written after the last checkpoint
+            self._file.truncate(rows * self.dimension * 4)
+            self._file.seek(rows * self.dimension * 4)
+
+    def append(self, embeddings: np.ndarray) -> None:
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.dimension = embeddings.shape[1]
+        self._file.write(embeddings.tobytes())
+        self.rows += embeddings.shape[0]
+
+    def checkpoint(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def read(self) -> np.ndarray:
+        """Memory-map everything appended so far as an (rows, dimension) array"""
+        self.checkpoint()
+        if not self.rows:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dimension))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class BuildCheckpoint:
+    """JSON progress record: which PDFs are done, where the current one stopped"""
+
+    def __init__(self, path: str, pdf_files: List[str]):
+        self.path = path
+        self.signature = [[p, os.path.getsize(p), int(os.path.getmtime(p))] for p in pdf_files]
+        self.state = {
+            "signature": self.signature,
+            "pdf_index": 0,
+            "next_page": 0,
+            "rows": 0,
+            "dimension": None,
+            "carry": "",
+            "pending": [],
+        }
+
+    def load(self) -> bool:
+        """Restore a checkpoint written for exactly the same input PDFs"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if state.get("signature") != self.signature:
+            return False
+        self.state = state
+        return True
+
+    def save(self, **updates) -> None:
+        self.state.update(updates)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
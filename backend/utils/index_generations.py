@@ -0,0 +1,85 @@
+"""
+Generation directories for blue/green index rebuilds
+Every finished build lives in its own directory (gen-000001, gen-000002, ...) and a
+one-line CURRENT file names the live one. A rebuild writes into staging/, which is
+renamed to the next generation and then published by atomically replacing CURRENT,
+so a crash at any point leaves either the old or the new generation live, never a mix.
+"""
+
+import os
+import re
+import shutil
+from typing import Iterable, Optional
+
+POINTER_NAME = "CURRENT"
+STAGING_NAME = "staging"
+GENERATION_RE = re.compile(r"^gen-(\d+)$")
+
+
+class IndexGenerations:
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory holding the generation directories, staging/ and CURRENT
+        """
+        self.root = root
+        self.pointer_path = os.path.join(root, POINTER_NAME)
+        self.staging_dir = os.path.join(root, STAGING_NAME)
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def name(number: int) -> str:
+        return f"gen-{number:06d}"
+
+    def path(self, number: int) -> str:
+        return os.path.join(self.root, self.name(number))
+
+    def current(self) -> Optional[int]:
+        """Number of the live generation, or None if nothing was published yet"""
+        try:
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                match = GENERATION_RE.match(f.read().strip())
+        except FileNotFoundError:
+            return None
+        if match and os.path.isdir(self.path(int(match.group(1)))):
+            return int(match.group(1))
+        return None
+
+    def existing(self) -> list:
+        """Numbers of every generation directory on disk, oldest first"""
+        numbers = []
+        for entry in os.listdir(self.root):
+            match = GENERATION_RE.match(entry)
+            if match and os.path.isdir(os.path.join(self.root, entry)):
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def publish(self, source: Optional[str] = None) -> int:
+        """Turn staging/ (or another finished directory) into the next generation and point CURRENT at it"""
+        number = max([0, *self.existing()]) + 1
+        os.replace(source or self.staging_dir, self.path(number))
+        tmp_path = self.pointer_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.name(number))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.pointer_path)
+        return number
+
+    def remove(self, number: int) -> None:
+        """Delete a generation directory (its files must no longer be mapped on Windows)"""
+        shutil.rmtree(self.path(number), ignore_errors=True)
+
+    def prune(self, keep: Iterable[int]) -> None:
+        """Delete every generation not in keep (left behind by crashes or old swaps)"""
+        keep = set(keep)
+        for number in self.existing():
+            if number not in keep:
+                self.remove(number)
+
+    def reset(self) -> None:
+        """Forget every generation and any staged build"""
+        if os.path.exists(self.pointer_path):
+            os.remove(self.pointer_path)
+        self.prune(())
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
@@ -0,0 +1,105 @@
+"""
+Background admin jobs
+Long maintenance work (index rebuilds) runs in a daemon thread instead of the request
+handler; the endpoint returns a job id at once and the job's status is polled. Only
+one job of a kind runs at a time, and the most recent jobs are kept for inspection.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+
+class JobAlreadyRunning(RuntimeError):
+    def __init__(self, job: dict):
+        super().__init__(f"{job['kind']} job {job['id']} is already running")
+        self.job = job
+
+
+class JobRunner:
+    def __init__(self, history: int = 20):
+        """
+        Args:
+            history: Finished jobs kept for the status endpoint
+        """
+        self.history = history
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # id → job record, oldest first
+        self._jobs: "OrderedDict[int, dict]" = OrderedDict()
+
+    def _running(self, kind: str) -> Optional[dict]:
+        for job in self._jobs.values():
+            if job["kind"] == kind and job["state"] in ("queued", "running"):
+                return job
+        return None
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> dict:
+        """
+        Start fn(*args, progress=..., **kwargs) in a thread; fn may call progress(dict)
+        to publish intermediate state. Raises JobAlreadyRunning if a `kind` job is active.
+        """
+        with self._lock:
+            running = self._running(kind)
+            if running is not None:
+                raise JobAlreadyRunning(dict(running))
+            job = {
+                "id": next(self._ids),
+                "kind": kind,
+                "state": "queued",
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "seconds": None,
+                "progress": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job["id"]] = job
+            while len(self._jobs) > self.history:
+                oldest = next(iter(self._jobs.values()))
+                if oldest["state"] in ("queued", "running"):
+                    break
+                self._jobs.popitem(last=False)
+
+        def progress(update: dict) -> None:
+            with self._lock:
+                job["progress"] = dict(update)
+
+        def run() -> None:
+            with self._lock:
+                job.update(state="running", started_at=time.time())
+            try:
+                result = fn(*args, progress=progress, **kwargs)
+                if result is False:
+                    state, error = "failed", "job reported failure, see server log"
+                else:
+                    state, error = "succeeded", None
+            except Exception as e:
+                result, state, error = None, "failed", str(e)
+                print(f"❌ {kind} job {job['id']} failed: {e}")
+            with self._lock:
+                finished = time.time()
+                job.update(
+                    state=state, result=result, error=error, finished_at=finished,
+                    seconds=round(finished - job["started_at"], 2)
+                )
+
+        threading.Thread(target=run, name=f"job-{kind}-{job['id']}", daemon=True).start()
+        return self.get(job["id"])
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self, kind: Optional[str] = None) -> List[dict]:
+        """Known jobs, newest first"""
+        with self._lock:
+            return [dict(j) for j in reversed(self._jobs.values()) if kind is None or j["kind"] == kind]
+
+
+# Process-wide runner used by the admin endpoints
+jobs = JobRunner()
@@ -0,0 +1,66 @@
+"""
+Background model loading
+Embedding models take tens of seconds to load on CPU; loading them in a thread lets
+the pipelines serve lexical (BM25) results in the meantime.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class BackgroundLoader:
+    def __init__(self, factory: Callable[[], Any], name: str = "model-loader", start: bool = True):
+        """
+        Args:
+            factory: Zero-argument function that builds the model
+            name: Loader thread name
+            start: Begin loading immediately
+        """
+        self.factory = factory
+        self.name = name
+        self._value: Any = None
+        self._error: Optional[BaseException] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        if start:
+            self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _load(self) -> None:
+        started = time.monotonic()
+        try:
+            self._value = self.factory()
+        except BaseException as e:
+            self._error = e
+            print(f"❌ {self.name} failed: {e}")
+        finally:
+            self.load_seconds = round(time.monotonic() - started, 2)
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and self._error is None
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Return the model, waiting for it to finish loading if needed"""
+        self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} still loading")
+        if self._error is not None:
+            raise RuntimeError(f"{self.name} failed to load: {self._error}")
+        return self._value
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "failed": self._error is not None,
+            "load_seconds": self.load_seconds,
+        }
@@ -0,0 +1,273 @@
+"""
+Token-budgeted prompt assembly for ai_response
+Retrieved chunks are de-duplicated (overlapping neighbours merged, near-copies dropped),
+re-ranked with MMR so the context covers different passages, and packed into a context
+budget; history keeps the most recent turns that fit and folds older ones into a short
+extractive summary. Token counts are estimates (≈ 4 characters per token) — close
+enough for budgeting across providers that tokenize differently.
+"""
+
+import math
+import os
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.bm25 import tokenize
+
+# Consecutive chunks share up to chunk_overlap (100) characters; shorter matches are coincidence
+MIN_MERGE_OVERLAP = 40
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str) -> int:
+    chars_per_token = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))
+    return math.ceil(len(text) / chars_per_token) if text else 0
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut text to roughly `tokens` tokens at a word boundary"""
+    limit = int(tokens * float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4")))
+    if len(text) <= limit:
+        return text
+    # Leave room for the " …" marker so the result still fits
+    cut = text[:limit - 2].rsplit(" ", 1)[0]
+    return cut.rstrip() + " …"
+
+
+def format_chunk(doc: dict) -> str:
+    """Chunk text prefixed with its verse reference when known"""
+    metadata = doc.get("metadata") or {}
+    if "chapter" in metadata:
+        return f"[Bhagavad Gita {metadata['chapter']}.{metadata['verse']}] {doc['text']}"
+    return doc["text"]
+
+
+def _suffix_prefix_overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of a that is a prefix of b"""
+    for size in range(min(len(a), len(b)) - 1, MIN_MERGE_OVERLAP - 1, -1):
+        if a.endswith(b[:size]):
+            return size
+    return 0
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def dedupe_chunks(docs: List[dict], near_duplicate: float = 0.8) -> List[dict]:
+    """
+    Drop chunks contained in (or nearly identical to) a better-ranked one and merge
+    chunks that overlap a kept neighbour, keeping the better rank
+    """
+    kept: List[dict] = []
+    for doc in docs:
+        text = doc["text"].strip()
+        tokens = set(tokenize(text))
+        duplicate = False
+        for other in kept:
+            if text in other["text"] or _jaccard(tokens, other["_tokens"]) >= near_duplicate:
+                duplicate = True
+                break
+            same_source = (other.get("metadata") or {}).get("source") == (doc.get("metadata") or {}).get("source")
+            if not same_source:
+                continue
+            if other["text"] in text:
+                other.update(text=text, _tokens=tokens, embedding=doc.get("embedding"))
+                duplicate = True
+                break
+            tail = _suffix_prefix_overlap(other["text"], text)
+            head = _suffix_prefix_overlap(text, other["text"]) if not tail else 0
+            if tail or head:
+                merged = other["text"] + text[tail:] if tail else text + other["text"][head:]
+                # The merged span has no single stored embedding; fall back to lexical similarity
+                other.update(text=merged, _tokens=set(tokenize(merged)), embedding=None)
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(dict(doc, text=text, _tokens=tokens))
+    return kept
+
+
+def mmr_order(
+    docs: List[dict],
+    query_vector: Optional[Sequence[float]] = None,
+    diversity: float = 0.3,
+) -> List[dict]:
+    """
+    Maximal marginal relevance: repeatedly take the chunk maximizing
+    (1 - diversity) * relevance - diversity * max similarity to those already taken.
+    Uses embeddings when every chunk has one, otherwise retrieval rank and token overlap.
+    """
+    if len(docs) <= 1:
+        return docs
+    vectors = None
+    if query_vector is not None and all(d.get("embedding") is not None for d in docs):
+        vectors = np.asarray([d["embedding"] for d in docs], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(query_vector, dtype=np.float32)
+        relevance = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        similarity = vectors @ vectors.T
+    else:
+        relevance = np.array([1.0 - i / len(docs) for i in range(len(docs))])
+        similarity = np.array([[_jaccard(a["_tokens"], b["_tokens"]) for b in docs] for a in docs])
+
+    chosen: List[int] = []
+    remaining = list(range(len(docs)))
+    while remaining:
+        def score(i: int) -> float:
+            redundancy = max((similarity[i][j] for j in chosen), default=0.0)
+            return (1 - diversity) * relevance[i] - diversity * redundancy
+        best = max(remaining, key=score)
+        chosen.append(best)
+        remaining.remove(best)
+    return [docs[i] for i in chosen]
+
+
+def summarize_messages(messages: List[Dict[str, str]], tokens: int) -> str:
+    """Extractive summary: the first sentence of each earlier user turn, newest kept first"""
+    points = []
+    for msg in messages:
+        if msg["role"] == "user" and msg["content"].strip():
+            points.append(SENTENCE_RE.split(msg["content"].strip(), 1)[0])
+    summary = ""
+    for point in reversed(points):
+        candidate = f"{point} / {summary}" if summary else point
+        if count_tokens(candidate) > tokens:
+            break
+        summary = candidate
+    return summary
+
+
+class PromptBuilder:
+    def __init__(
+        self,
+        budget: Optional[int] = None,
+        context_budget: Optional[int] = None,
+        summary_budget: Optional[int] = None,
+        mmr_diversity: Optional[float] = None,
+    ):
+        """
+        Args:
+            budget: Total tokens for the prompt plus the history sent with it
+            context_budget: Maximum tokens of retrieved text
+            summary_budget: Maximum tokens of the summary of dropped history
+            mmr_diversity: MMR trade-off (0 = relevance only, 1 = diversity only)
+        """
+        self.budget = budget or int(os.getenv("PROMPT_TOKEN_BUDGET", "1800"))
+        self.context_budget = context_budget or int(os.getenv("PROMPT_CONTEXT_TOKENS", "600"))
+        self.summary_budget = summary_budget or int(os.getenv("PROMPT_SUMMARY_TOKENS", "80"))
+        self.mmr_diversity = mmr_diversity if mmr_diversity is not None else float(os.getenv("PROMPT_MMR_DIVERSITY", "0.3"))
+        self.builds = 0
+        self.summarized = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.last_report: Optional[dict] = None
+
+    def select_context(
+        self,
+        docs: List[dict],
+        budget: int,
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> Tuple[List[str], int]:
+        """Formatted chunks in MMR order that fit the budget, and their token count"""
+        selected, used = [], 0
+        for doc in mmr_order(dedupe_chunks(docs), query_vector, self.mmr_diversity):
+            text = format_chunk(doc)
+            tokens = count_tokens(text)
+            if used + tokens > budget:
+                if selected or budget - used < 50:
+                    continue
+                # A single oversized chunk is cut rather than dropped
+                text = truncate_to_tokens(text, budget - used)
+                tokens = count_tokens(text)
+            selected.append(text)
+            used += tokens
+        return selected, used
+
+    def fit_history(
+        self,
+        history: List[Dict[str, str]],
+        budget: int,
+    ) -> Tuple[List[Dict[str, str]], str, int]:
+        """Most recent messages that fit the budget, plus a summary of the dropped ones"""
+        kept: List[Dict[str, str]] = []
+        used = 0
+        for position in range(len(history) - 1, -1, -1):
+            tokens = count_tokens(history[position]["content"])
+            if used + tokens > budget:
+                break
+            kept.insert(0, history[position])
+            used += tokens
+        # Providers expect the conversation to open with a user turn
+        while kept and kept[0]["role"] != "user":
+            used -= count_tokens(kept.pop(0)["content"])
+        dropped = history[:len(history) - len(kept)]
+        summary = summarize_messages(dropped, min(self.summary_budget, max(0, budget - used))) if dropped else ""
+        return kept, summary, used + count_tokens(summary)
+
+    def build(
+        self,
+        render: Callable[[str, str], str],
+        user_input: str,
+        docs: List[dict],
+        history: Optional[List[Dict[str, str]]] = None,
+        query_vector: Optional[Sequence[float]] = None,
+        system: str = "",
+    ) -> Tuple[str, List[Dict[str, str]], dict]:
+        """
+        Args:
+            render: Builds the prompt from (context, earlier-conversation summary)
+            user_input: Current message (dropped from the end of history if repeated there)
+            docs: Retrieved chunks, best first: {"text", "metadata", optional "embedding"}
+            history: Prior turns [{"role", "content"}], oldest first
+            query_vector: Query embedding for MMR relevance
+            system: Static instructions sent alongside the prompt (counted against the budget)
+
+        Returns:
+            (prompt, history to send, token report)
+        """
+        history = list(history or [])
+        # The current message is already in the prompt; don't send it twice
+        if history and history[-1]["role"] == "user" and history[-1]["content"].strip() == user_input.strip():
+            history.pop()
+
+        system_tokens = count_tokens(system)
+        fixed = system_tokens + count_tokens(render("", ""))
+        context_chunks, context_tokens = self.select_context(
+            docs, max(0, min(self.context_budget, self.budget - fixed)), query_vector
+        )
+        context = "\n\n---\n\n".join(context_chunks)
+        history_budget = max(0, self.budget - system_tokens - count_tokens(render(context, "")))
+        kept_history, summary, history_tokens = self.fit_history(history, history_budget)
+        prompt = render(context, summary)
+
+        report = {
+            "budget": self.budget,
+            "prompt_tokens": count_tokens(prompt),
+            "system_tokens": system_tokens,
+            "context_tokens": context_tokens,
+            "context_chunks": f"{len(context_chunks)}/{len(docs)}",
+            "history_tokens": history_tokens,
+            "history_messages": f"{len(kept_history)}/{len(history)}",
+            "summarized": bool(summary),
+        }
+        report["total_tokens"] = system_tokens + report["prompt_tokens"] + sum(count_tokens(m["content"]) for m in kept_history)
+        self.builds += 1
+        self.summarized += report["summarized"]
+        self.total_tokens += report["total_tokens"]
+        self.max_tokens = max(self.max_tokens, report["total_tokens"])
+        self.last_report = report
+        return prompt, kept_history, report
+
+    def stats(self) -> dict:
+        return {
+            "budget": self.budget,
+            "context_budget": self.context_budget,
+            "prompts": self.builds,
+            "avg_tokens": round(self.total_tokens / self.builds, 1) if self.builds else 0.0,
+            "max_tokens": self.max_tokens,
+            "summarized": self.summarized,
+            "last": self.last_report,
+        }
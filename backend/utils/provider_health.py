@@ -0,0 +1,140 @@
+"""
+Per-provider latency and error tracking with a circuit breaker
+Each LLM provider keeps an EWMA and a window of recent latencies (for p50/p95) and of
+recent outcomes (for the error rate). After enough consecutive failures the breaker
+opens and the provider is skipped; once the cooldown has passed one probe request is
+let through (half-open), and its outcome closes or re-opens the breaker.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+class ProviderHealth:
+    def __init__(
+        self,
+        name: str,
+        window: Optional[int] = None,
+        alpha: float = 0.2,
+        failure_threshold: Optional[int] = None,
+        cooldown_seconds: Optional[float] = None,
+    ):
+        """
+        Args:
+            name: Provider name
+            window: Recent calls kept for percentiles and the error rate (LLM_HEALTH_WINDOW)
+            alpha: EWMA smoothing factor
+            failure_threshold: Consecutive failures that open the breaker (LLM_BREAKER_FAILURES)
+            cooldown_seconds: How long an open breaker rejects calls (LLM_BREAKER_COOLDOWN_SECONDS)
+        """
+        self.name = name
+        self.alpha = alpha
+        window = window or int(os.getenv("LLM_HEALTH_WINDOW", "200"))
+        self.failure_threshold = failure_threshold or int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+        self.cooldown = (
+            cooldown_seconds if cooldown_seconds is not None
+            else float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+        )
+        self._lock = threading.Lock()
+        self._latencies: "deque[float]" = deque(maxlen=window)
+        self._outcomes: "deque[bool]" = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self.calls = 0
+        self.failures = 0
+        self.cancelled = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now; in half-open state only one probe at a time"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def _observe(self, seconds: float) -> None:
+        self.ewma = seconds if self.ewma is None else self.alpha * seconds + (1 - self.alpha) * self.ewma
+
+    def success(self, seconds: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self._latencies.append(seconds)
+            self._outcomes.append(True)
+            self._observe(seconds)
+            self.consecutive_failures = 0
+            if self.opened_at is not None:
+                print(f"✅ {self.name} circuit closed")
+            self.opened_at = None
+            self._probing = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self._outcomes.append(False)
+            self.consecutive_failures += 1
+            if self._probing or self.consecutive_failures >= self.failure_threshold:
+                if self.opened_at is None or self._probing:
+                    print(f"⚠️ {self.name} circuit open for {self.cooldown:.0f}s "
+                          f"after {self.consecutive_failures} failures")
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def abandoned(self, seconds: Optional[float] = None) -> None:
+        """
+        A call was cancelled (lost a hedge race). Its elapsed time is only a lower bound,
+        so it moves the EWMA (a slow provider stops being routed first) but is kept out
+        of the percentiles.
+        """
+        with self._lock:
+            self.cancelled += 1
+            if seconds is not None:
+                self._observe(seconds)
+            self._probing = False
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return 1.0 - sum(self._outcomes) / len(self._outcomes)
+
+    def stats(self) -> dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "error_rate": round(self.error_rate(), 4),
+            "consecutive_failures": self.consecutive_failures,
+            "ewma_ms": round(self.ewma * 1000, 1) if self.ewma is not None else None,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
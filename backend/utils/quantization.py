@@ -0,0 +1,191 @@
+"""
+Reduced-precision vector storage
+float16, or int8 with a per-dimension scale and offset (x ≈ code * scale + offset).
+Similarity is computed directly on the quantized codes, block by block, so the full
+float32 matrix never has to exist in memory; a float32 copy stays on disk, memory-mapped,
+for exact re-scoring of the top candidates.
+"""
+
+import os
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+_BLOCK_ROWS = 4096
+
+
+def vector_dtype_from_env() -> str:
+    dtype = os.getenv("RAG_VECTOR_DTYPE", "float32").lower()
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unknown RAG_VECTOR_DTYPE '{dtype}', expected one of {VECTOR_DTYPES}")
+    return dtype
+
+
+class QuantizedVectors:
+    def __init__(
+        self,
+        dtype: str,
+        codes: np.ndarray,
+        scale: Optional[np.ndarray] = None,
+        offset: Optional[np.ndarray] = None,
+        ids: Optional[Sequence] = None,
+    ):
+        self.dtype = dtype
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+        self.ids: List = list(ids) if ids is not None else list(range(len(codes)))
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray, dtype: str, ids: Optional[Sequence] = None) -> "QuantizedVectors":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if dtype == "float16":
+            return cls(dtype, vectors.astype(np.float16), ids=ids)
+        if dtype == "int8":
+            low = vectors.min(axis=0)
+            high = vectors.max(axis=0)
+            scale = np.maximum(high - low, 1e-12) / 255.0
+            codes = np.clip(np.rint((vectors - low) / scale) - 128, -128, 127).astype(np.int8)
+            return cls(dtype, codes, scale.astype(np.float32), (low + 128 * scale).astype(np.float32), ids)
+        return cls("float32", vectors, ids=ids)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def dequantize(self, rows: Sequence[int]) -> np.ndarray:
+        block = self.codes[np.asarray(rows, dtype=np.int64)].astype(np.float32)
+        if self.dtype == "int8":
+            block = block * self.scale + self.offset
+        return block
+
+    def inner_product(self, query: np.ndarray) -> np.ndarray:
+        """q · x for every stored vector, computed on the codes"""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if self.dtype == "int8":
+            # q · (c * s + o) = c · (q * s) + q · o
+            weights, bias = query * self.scale, float(query @ self.offset)
+        else:
+            weights, bias = query, 0.0
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), _BLOCK_ROWS):
+            block = self.codes[start:start + _BLOCK_ROWS].astype(np.float32)
+            scores[start:start + _BLOCK_ROWS] = block @ weights + bias
+        return scores
+
+    def search_rows(self, query: np.ndarray, k: int) -> np.ndarray:
+        """Row numbers of the top-k vectors by inner product (MiniLM vectors are unit length)"""
+        if not len(self.codes) or k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        scores = self.inner_product(query)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def search(self, query: np.ndarray, k: int) -> List[object]:
+        """Ids of the top-k vectors"""
+        return [self.ids[i] for i in self.search_rows(query, k)]
+
+    @property
+    def nbytes(self) -> int:
+        extra = (self.scale.nbytes + self.offset.nbytes) if self.dtype == "int8" else 0
+        return int(self.codes.nbytes + extra)
+
+    @property
+    def float32_nbytes(self) -> int:
+        return int(self.codes.size * 4)
+
+    def stats(self) -> dict:
+        return {
+            "dtype": self.dtype,
+            "vectors": len(self),
+            "memory_mb": round(self.nbytes / 2**20, 3),
+            "float32_memory_mb": round(self.float32_nbytes / 2**20, 3),
+            "memory_saving": round(1 - self.nbytes / self.float32_nbytes, 4) if self.float32_nbytes else 0.0,
+        }
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp.npz"
+        arrays = {"codes": self.codes, "ids": np.asarray(self.ids), "dtype": np.asarray(self.dtype)}
+        if self.dtype == "int8":
+            arrays.update(scale=self.scale, offset=self.offset)
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "QuantizedVectors":
+        with np.load(path, allow_pickle=False) as data:
+            dtype = str(data["dtype"])
+            return cls(
+                dtype,
+                data["codes"],
+                data["scale"] if dtype == "int8" else None,
+                data["offset"] if dtype == "int8" else None,
+                data["ids"].tolist(),
+            )
+
+
+def write_vectors(path: str, vectors: np.ndarray) -> None:
+    """Raw float32 rows, memory-mapped back by open_vectors for exact re-scoring"""
+    tmp_path = path + ".tmp"
+    np.ascontiguousarray(vectors, dtype=np.float32).tofile(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def open_vectors(path: str, dimension: int) -> Optional[np.ndarray]:
+    """Memory-map a float32 vector file; only the rows touched by re-scoring are paged in"""
+    if not dimension or not os.path.exists(path) or not os.path.getsize(path):
+        return None
+    rows = os.path.getsize(path) // (4 * dimension)
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dimension))
+
+
+def rerank(query: np.ndarray, rows: Sequence[int], vectors: np.ndarray, k: int) -> List[int]:
+    """Re-order candidate rows by exact float32 inner product, keep the best k"""
+    rows = [int(r) for r in rows if 0 <= r < len(vectors)]
+    if not rows:
+        return []
+    scores = np.asarray(vectors[np.asarray(rows)], dtype=np.float32) @ np.asarray(query, dtype=np.float32).reshape(-1)
+    return [rows[i] for i in np.argsort(-scores)[:k]]
+
+
+def quantization_report(
+    vectors: np.ndarray,
+    quantized: QuantizedVectors,
+    k: int = 10,
+    sample_size: int = 200,
+    rescore_factor: int = 0,
+) -> dict:
+    """
+    recall@k of search on the quantized codes against exact float32 search,
+    using stored vectors as queries, plus the memory saved
+    """
+    n = len(vectors)
+    k = min(k, n)
+    report = {"k": k, "queries": 0, "recall": None, **quantized.stats()}
+    if k <= 0:
+        return report
+
+    rng = np.random.default_rng(0)
+    sample = rng.choice(n, size=min(sample_size, n), replace=False)
+    hits = rescored_hits = 0
+    elapsed = 0.0
+    for row in sample:
+        query = np.asarray(vectors[row], dtype=np.float32)
+        exact = set(np.argsort(-(vectors @ query))[:k].tolist())
+        started = time.perf_counter()
+        approx = quantized.search_rows(query, k * max(1, rescore_factor))
+        elapsed += time.perf_counter() - started
+        hits += len(exact & set(approx[:k].tolist()))
+        if rescore_factor > 1:
+            rescored_hits += len(exact & set(rerank(query, approx, vectors, k)))
+
+    report.update(
+        queries=len(sample),
+        recall=round(hits / (k * len(sample)), 4),
+        ms_per_query=round(elapsed * 1000 / len(sample), 4),
+    )
+    if rescore_factor > 1:
+        report.update(rescore_factor=rescore_factor, rescored_recall=round(rescored_hits / (k * len(sample)), 4))
+    return report
@@ -0,0 +1,117 @@
+"""
+Query caches for the RAG pipelines
+Normalized query → embedding, and (query, k) → chunk ids, both bounded LRU with TTL.
+Entries are tied to an index generation number: any rebuild or ingest bumps it
+and drops everything cached against the old index.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive cache key for a query"""
+    return " ".join(query.lower().split())
+
+
+class QueryCache:
+    """Two-tier cache in front of a retriever: embeddings, then result ids"""
+
+    def __init__(
+        self,
+        max_embeddings: Optional[int] = None,
+        max_results: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        ttl = ttl if ttl is not None else float(os.getenv("RAG_QUERY_CACHE_TTL", "3600"))
+        self.embeddings = LRUCache(
+            max_embeddings if max_embeddings is not None else int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", "2048")),
+            ttl,
+        )
+        self.results = LRUCache(
+            max_results if max_results is not None else int(os.getenv("RAG_RESULT_CACHE_SIZE", "2048")),
+            ttl,
+        )
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def get_embedding(self, query: str) -> Optional[Any]:
+        return self.embeddings.get((self.generation, normalize_query(query)))
+
+    def put_embedding(self, query: str, embedding: Any) -> None:
+        self.embeddings.put((self.generation, normalize_query(query)), embedding)
+
+    def get_result(self, query: str, k: int, scope: Hashable = None) -> Optional[list]:
+        return self.results.get((self.generation, normalize_query(query), k, scope))
+
+    def put_result(self, query: str, k: int, ids: list, generation: int, scope: Hashable = None) -> None:
+        """Store result ids computed against `generation` (dropped if the index moved on)"""
+        if generation == self.generation:
+            self.results.put((generation, normalize_query(query), k, scope), list(ids))
+
+    def bump_generation(self) -> int:
+        """Invalidate everything cached against the previous index"""
+        with self._lock:
+            self.generation += 1
+            self.embeddings.clear()
+            self.results.clear()
+            return self.generation
+
+    def stats(self) -> dict:
+        return {
+            "generation": self.generation,
+            "embedding_cache": self.embeddings.stats(),
+            "result_cache": self.results.stats(),
+        }
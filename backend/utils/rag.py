@@ -4,11 +4,29 @@ Chunks PDFs → Creates embeddings → Stores in vector DB → Retrieves relevan
 """
 
 import os
+import json
+import hashlib
+import threading
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, List, Optional
+import numpy as np
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from utils.query_cache import QueryCache
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.model_loader import BackgroundLoader
+from utils.bm25 import BM25Index, reciprocal_rank_fusion
+from utils.verse_index import VerseIndex, parse_verses, parse_verse_reference
+from utils.readiness import readiness
+from utils.prompt_builder import format_chunk
+from utils.emotion_pools import EmotionPools, index_signature
+from utils.shards import ShardSet
+from nlp.emotion import DEFAULT_GITA_EMOTION, GITA_EMOTION_KEYWORDS, emotion_seed_query
+from utils.quantization import (
+    QuantizedVectors, open_vectors, quantization_report, rerank, vector_dtype_from_env, write_vectors
+)
 
 
 class SimpleTextSplitter:
@@ -22,24 +40,56 @@ class SimpleTextSplitter:
         if not text:
             return []
         
-        # Split by paragraphs first
-        paragraphs = text.split('\n\n')
-        chunks = []
-        current_chunk = ""
-        
-        for para in paragraphs:
-            if len(current_chunk) + len(para) < self.chunk_size:
-                current_chunk += para + "\n\n"
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = para + "\n\n"
+        # Units are spans of the original text: paragraphs first, then lines for
+        # paragraphs longer than a chunk (the extracted book has no blank lines),
+        # then hard cuts for single over-long lines
+        units = []
+        for para_start, para_end in self._spans(text, 0, len(text), "\n\n"):
+            if para_end - para_start <= self.chunk_size:
+                units.append((para_start, para_end))
+                continue
+            for line_start, line_end in self._spans(text, para_start, para_end, "\n"):
+                for cut in range(line_start, line_end, self.chunk_size):
+                    units.append((cut, min(cut + self.chunk_size, line_end)))
         
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        # Merge consecutive units up to chunk_size, starting each new chunk with
+        # the trailing units of the previous one that fit within chunk_overlap
+        chunks = []
+        first = 0
+        while first < len(units):
+            last = first
+            while last + 1 < len(units) and units[last + 1][1] - units[first][0] <= self.chunk_size:
+                last += 1
+            chunk = text[units[first][0]:units[last][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if last + 1 >= len(units):
+                break
+            # Overlap only if the next chunk still has room for the next unit
+            next_first = last + 1
+            while (
+                next_first - 1 > first
+                and units[last][1] - units[next_first - 1][0] <= self.chunk_overlap
+                and units[last + 1][1] - units[next_first - 1][0] <= self.chunk_size
+            ):
+                next_first -= 1
+            first = next_first
         
         return chunks
     
+    @staticmethod
+    def _spans(text: str, start: int, end: int, separator: str):
+        """(start, end) spans of text[start:end] split on separator"""
+        pos = start
+        while pos < end:
+            cut = text.find(separator, pos, end)
+            if cut < 0:
+                yield pos, end
+                return
+            if cut > pos:
+                yield pos, cut
+            pos = cut + len(separator)
+    
     def split_documents(self, documents):
         """Split documents"""
         all_chunks = []
@@ -50,27 +100,105 @@ class SimpleTextSplitter:
         return all_chunks
 
 
+class LazyEmbeddings(Embeddings):
+    """Embeddings whose model loads in the background; calls block until it is ready"""
+    def __init__(self, loader: BackgroundLoader):
+        self.loader = loader
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.loader.get().embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.loader.get().embed_query(text)
+
+
+MANIFEST_NAME = "ingest_manifest.json"
+BM25_NAME = "bm25_index.json"
+VERSE_INDEX_NAME = "verse_index.json"
+QUANTIZED_NAME = "quantized_vectors.npz"
+VECTORS_NAME = "vectors.f32"
+EMOTION_POOLS_NAME = "emotion_pools.json"
+# v2: size-bounded chunks carrying chapter/verse metadata
+# v3: one Chroma collection (shard) per source file
+MANIFEST_VERSION = 3
+# Chroma rejects very large add() calls, so writes are sliced but persisted once
+ADD_BATCH_SIZE = 512
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_id(source: str, chunk: str) -> str:
+    """Stable id for a chunk: identical text from the same source maps to the same id"""
+    return _sha256(f"{source}\0{chunk}".encode("utf-8"))
+
+
 class RAGPipeline:
     def __init__(self, persist_dir: str = "data/vector_db"):
         """Initialize RAG pipeline with vector database"""
         self.persist_dir = persist_dir
+        self.manifest_path = os.path.join(persist_dir, MANIFEST_NAME)
+        self.bm25_path = os.path.join(persist_dir, BM25_NAME)
+        self.verse_index_path = os.path.join(persist_dir, VERSE_INDEX_NAME)
+        self.quantized_path = os.path.join(persist_dir, QUANTIZED_NAME)
+        self.vectors_path = os.path.join(persist_dir, VECTORS_NAME)
         os.makedirs(persist_dir, exist_ok=True)
         
-        # Use lightweight sentence-transformers model
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2",
-            model_kwargs={"device": "cpu"}
+        # Use lightweight sentence-transformers model, loaded in the background
+        self.embedder_loader = BackgroundLoader(
+            lambda: HuggingFaceEmbeddings(
+                model_name="all-MiniLM-L6-v2",
+                model_kwargs={"device": "cpu"}
+            ),
+            name="rag-embeddings-loader"
         )
+        self.embeddings = LazyEmbeddings(self.embedder_loader)
         
-        # Load or create vector store
+        # Unsharded collection of earlier versions; only its client is used now
         self.vectorstore = Chroma(
             persist_directory=persist_dir,
             embedding_function=self.embeddings
         )
         
-        self.retriever = self.vectorstore.as_retriever(
-            search_kwargs={"k": 3}  # Retrieve top 3 relevant chunks
-        )
+        # One collection per source file, searched in parallel and rebuilt independently
+        manifest = self._load_manifest()
+        self.shards = self._open_shards()
+        self.shards.discover(self._manifest_shards(manifest))
+        # chunk id → source file, for source-filtered lexical search
+        self.chunk_sources: Dict[str, str] = self._chunk_sources(manifest)
+        
+        # Repeated queries skip the encoder (embedding tier) and the search (result tier)
+        self.query_cache = QueryCache()
+        # Concurrent queries share one batched encoder call
+        self.batcher = EmbeddingBatcher(self.embeddings.embed_documents, name="rag-embedder")
+        
+        # Lexical index over the same chunks: answers alone until the embedder is
+        # ready, then supplies candidates fused with the vector results
+        self.bm25: Optional[BM25Index] = self._load_bm25()
+        self.bm25_candidates = int(os.getenv("RAG_BM25_CANDIDATES", "20"))
+        # A BM25 top score at or above this skips the embedder entirely (0 = never)
+        self.bm25_skip_vector_score = float(os.getenv("RAG_BM25_SKIP_VECTOR_SCORE", "0"))
+        self.retrieval_modes = {
+            "verse_lookup": 0, "emotion_pool": 0, "lexical": 0, "lexical_confident": 0, "hybrid": 0, "vector": 0
+        }
+        
+        # Chapter → verse → span map for direct verse references
+        self.verse_index = self._load_verse_index()
+        
+        # Optional float16/int8 copy of the collection's vectors, searched in-process
+        # instead of Chroma's float32 index (which stays, so this costs memory rather
+        # than saving it); top candidates can be re-scored exactly
+        self.vector_dtype = vector_dtype_from_env()
+        self.rescore_factor = int(os.getenv("RAG_RESCORE_FACTOR", "0"))
+        self.quantization_report = None
+        self.quantized: Optional[QuantizedVectors] = None
+        self.rescore_vectors = None
+        self._load_quantized()
+        
+        # Ranked candidate chunks per detected emotion, re-ranked per message in /chat
+        self.use_emotion_pools = os.getenv("RAG_EMOTION_POOLS", "1") == "1"
+        self.emotion_pools = EmotionPools(os.path.join(persist_dir, EMOTION_POOLS_NAME))
         
         print("✅ RAG Pipeline initialized")
     
@@ -91,7 +219,8 @@ class RAGPipeline:
     def load_text(self, text: str, metadata: dict = None) -> None:
         """Add raw text to vector store"""
         try:
-            chunks = self.chunk_text(text)
+            source = (metadata or {}).get("source", "")
+            chunks = list(dict.fromkeys(self.chunk_text(text)))
             
             # Create documents with metadata
             documents = [
@@ -99,47 +228,507 @@ class RAGPipeline:
                 for chunk in chunks
             ]
             
-            # Add to vector store
+            # Add to the source's shard (content-addressed ids make re-adding a no-op)
             if documents:
-                self.vectorstore.add_documents(documents)
-                self.vectorstore.persist()
-                print(f"Added {len(documents)} text chunks to vector store")
+                ids = [chunk_id(source, chunk) for chunk in chunks]
+                existing = set(self.shards.get(ids=ids, sources=[source])["ids"])
+                new_docs = [d for d, i in zip(documents, ids) if i not in existing]
+                new_ids = [i for i in ids if i not in existing]
+                self.shards.add(source, new_docs, new_ids, ADD_BATCH_SIZE)
+                self.shards.persist([source])
+                if new_ids:
+                    # Ad-hoc sources aren't files in the ingest directory; remember their shard
+                    manifest = self._load_manifest()
+                    extra = manifest["extra"].setdefault(source, {"chunks": []})
+                    extra["chunks"] = list(dict.fromkeys(extra["chunks"] + new_ids))
+                    self._save_manifest(manifest)
+                    self.chunk_sources.update((cid, source) for cid in new_ids)
+                    self.query_cache.bump_generation()
+                    self._rebuild_bm25()
+                    self._rebuild_quantized()
+                print(f"Added {len(new_ids)} text chunks to vector store ({len(ids) - len(new_ids)} already present)")
             else:
                 print("No chunks created from text")
         
         except Exception as e:
             print(f"Error adding text to vector store: {str(e)}")
     
-    def retrieve(self, query: str, k: int = 3) -> List[str]:
+    def _open_shards(self) -> ShardSet:
+        return ShardSet(
+            self.vectorstore._client, self.embeddings, self.persist_dir,
+            max_workers=int(os.getenv("RAG_SHARD_WORKERS", "4"))
+        )
+
+    def _load_manifest(self) -> dict:
+        """
+        Load the ingest manifest: file hash + chunk ids per ingested source, and
+        chunk ids of sources added directly through load_text ("extra")
+        """
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                manifest.setdefault("extra", {})
+                return manifest
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Could not read ingest manifest: {e}")
+        return {"version": MANIFEST_VERSION, "sources": {}, "extra": {}}
+
+    @staticmethod
+    def _manifest_shards(manifest: dict) -> List[str]:
+        return [*manifest["sources"], *manifest["extra"]]
+
+    @staticmethod
+    def _chunk_sources(manifest: dict) -> Dict[str, str]:
+        return {
+            cid: name
+            for entries in (manifest["sources"], manifest["extra"])
+            for name, entry in entries.items()
+            for cid in entry["chunks"]
+        }
+
+    def _save_manifest(self, manifest: dict) -> None:
+        """Write manifest atomically so a crash never leaves it half-written"""
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _file_signature(path: Path) -> dict:
+        stat = path.stat()
+        return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+    def snapshot_matches(self, txt_dir: str) -> bool:
+        """
+        True if the persisted store was built from exactly the files now in txt_dir
+        (same names, sizes and mtimes), so startup can load it without re-ingesting
+        """
+        sources = self._load_manifest()["sources"]
+        if not sources or self.shards.count() == 0:
+            return False
+        files = {p.name: p for p in Path(txt_dir).glob("*.txt")}
+        if set(files) != set(sources):
+            return False
+        for name, path in files.items():
+            entry = sources[name]
+            if "size" not in entry or self._file_signature(path) != {"size": entry["size"], "mtime": entry["mtime"]}:
+                return False
+        # Derived indexes are cheap to rebuild from the store; the verse index is not
+        expected_verses = sum(1 for entry in sources.values() if entry.get("verses"))
+        return len(self.verse_index.sources) >= expected_verses
+
+    def warm_up(self) -> None:
+        """Finish loading the embedder and run one dummy query through the vector path"""
+        self.embedder_loader.get()
+        if self.shards.count() > 0:
+            # Encodes through the batcher and pages in the vector index
+            self._vector_search("warm up", 1)
+            # Pools built lexically while the embedder loaded gain vector candidates
+            self.refresh_emotion_pools()
+        else:
+            self.embeddings.embed_query("warm up")
+
+    def ingest_directory(
+        self,
+        txt_dir: str,
+        sources: Optional[Iterable[str]] = None,
+        rebuild: bool = False
+    ) -> Dict[str, int]:
+        """
+        Incrementally sync all *.txt files in a directory into their shards.
+        Unchanged files are skipped by content hash, only new chunks are embedded,
+        chunks that disappeared are deleted, and everything is persisted once.
+        
+        Args:
+            txt_dir: Directory of extracted texts, one shard per file
+            sources: Only sync these file names; the other shards are left as they are
+            rebuild: Drop the selected shards and re-embed them even if unchanged
+        """
+        manifest = self._load_manifest()
+        old_sources = manifest["sources"]
+
+        # A store without a manifest was filled by an older loader (append-only, or
+        # one shared collection) and may hold duplicates, so start it over once.
+        if not old_sources and not manifest["extra"] and (
+            self.vectorstore._collection.count() > 0 or self.shards.count() > 0
+        ):
+            print("⚠️ Vector store has no ingest manifest, rebuilding it once")
+            self.clear_db()
+
+        selected = set(sources) if sources is not None else None
+        # Shards outside the selection are carried over untouched
+        new_sources = {
+            name: entry for name, entry in old_sources.items()
+            if selected is not None and name not in selected
+        }
+        dropped = []
+        # Rebuilt shards are re-embedded into staging collections and swapped in at the
+        # end; the live ones keep answering searches until then
+        rebuilding = {name for name in old_sources if rebuild and (selected is None or name in selected)}
+        staged = []
+
+        verses_changed = False
+        to_add: Dict[str, tuple] = {}
+        to_delete: Dict[str, List[str]] = {}
+
+        for txt_file in sorted(Path(txt_dir).glob("*.txt")):
+            if selected is not None and txt_file.name not in selected:
+                continue
+            try:
+                raw = txt_file.read_bytes()
+                text = raw.decode("utf-8")
+            except Exception as e:
+                print(f"❌ Error loading {txt_file.name}: {str(e)}")
+                # Keep whatever we had for it rather than deleting on a read or decode error
+                if txt_file.name in old_sources:
+                    new_sources[txt_file.name] = old_sources[txt_file.name]
+                continue
+
+            file_hash = _sha256(raw)
+            previous = old_sources.get(txt_file.name) if txt_file.name not in rebuilding else None
+            if txt_file.name in rebuilding:
+                self.shards.stage(txt_file.name)
+                staged.append(txt_file.name)
+            if previous and previous["sha256"] == file_hash:
+                new_sources[txt_file.name] = dict(previous, **self._file_signature(txt_file))
+                # Verse index lost but the text is unchanged: re-parse, no embedding needed
+                if previous.get("verses") and txt_file.name not in self.verse_index.sources:
+                    self.verse_index.set_source(txt_file.name, file_hash, parse_verses(text))
+                    verses_changed = True
+                continue
+
+            verses = parse_verses(text)
+            if verses:
+                self.verse_index.set_source(txt_file.name, file_hash, verses)
+            else:
+                self.verse_index.drop_source(txt_file.name)
+            verses_changed = True
+
+            chunks = list(dict.fromkeys(self.chunk_text(text)))
+            ids = [chunk_id(txt_file.name, chunk) for chunk in chunks]
+            # Ids are scoped to their source, so only this shard's chunks can already exist
+            known_ids = set(previous["chunks"]) if previous else set()
+            docs, doc_ids = [], []
+            cursor = 0
+            for chunk, cid in zip(chunks, ids):
+                start = text.find(chunk, cursor)
+                if start >= 0:
+                    cursor = start
+                if cid not in known_ids:
+                    metadata = {"source": txt_file.name}
+                    verse = self.verse_index.locate(txt_file.name, start, start + len(chunk)) if start >= 0 else None
+                    if verse:
+                        metadata["chapter"], metadata["verse"] = verse
+                    docs.append(Document(page_content=chunk, metadata=metadata))
+                    doc_ids.append(cid)
+            if docs:
+                to_add[txt_file.name] = (docs, doc_ids)
+            if previous:
+                kept = set(ids)
+                stale = [cid for cid in previous["chunks"] if cid not in kept]
+                if stale:
+                    to_delete[txt_file.name] = stale
+            new_sources[txt_file.name] = {
+                "sha256": file_hash, "chunks": ids, "verses": len(verses), **self._file_signature(txt_file)
+            }
+
+        deleted = 0
+        for name, entry in old_sources.items():
+            if name not in new_sources:
+                # Source file gone: its whole shard goes with it
+                if name not in dropped:
+                    self.shards.drop(name)
+                    dropped.append(name)
+                if name in self.verse_index.sources:
+                    self.verse_index.drop_source(name)
+                    verses_changed = True
+        deleted += sum(len(old_sources[name]["chunks"]) for name in dropped + staged)
+        if verses_changed:
+            self.verse_index.save(self.verse_index_path)
+
+        for name, ids in to_delete.items():
+            self.shards.delete(name, ids)
+            deleted += len(ids)
+        for name, (docs, ids) in to_add.items():
+            self.shards.add(name, docs, ids, ADD_BATCH_SIZE, staged=name in staged)
+        for name in staged:
+            self.shards.swap(name)
+        added = sum(len(ids) for _, ids in to_add.values())
+        changed = bool(added or deleted or dropped or staged)
+        if changed:
+            self.shards.persist()
+            self.query_cache.bump_generation()
+        if changed or self.bm25 is None:
+            self._rebuild_bm25()
+        if self.vector_dtype != "float32" and (changed or self.quantized is None):
+            self._rebuild_quantized()
+
+        manifest["sources"] = new_sources
+        self._save_manifest(manifest)
+        self.chunk_sources = self._chunk_sources(manifest)
+
+        stats = {"added": added, "deleted": deleted, "sources": len(new_sources)}
+        scope = f"{len(selected)} selected of {stats['sources']}" if selected is not None else str(stats["sources"])
+        if changed:
+            print(f"✅ RAG ingest: +{stats['added']} / -{stats['deleted']} chunks across {scope} sources")
+        else:
+            print(f"✅ RAG ingest: {scope} sources unchanged, nothing to embed")
+        return stats
+
+    def rebuild_shard(self, source: str, txt_dir: str = "data/extracted") -> Dict[str, int]:
+        """
+        Re-embed one source file's shard from scratch, leaving the other shards untouched;
+        the current shard keeps serving until the new one replaces it
+        """
+        if not self.known_source(source, txt_dir):
+            raise ValueError(f"Unknown source: {source}")
+        return self.ingest_directory(txt_dir, sources=[source], rebuild=True)
+
+    def known_source(self, source: str, txt_dir: str = "data/extracted") -> bool:
+        """A plain file name that is indexed or waiting in txt_dir"""
+        if Path(source).name != source:
+            return False
+        return source in self._load_manifest()["sources"] or (Path(txt_dir) / source).is_file()
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing the cached vector for repeated queries"""
+        embedding = self.query_cache.get_embedding(query)
+        if embedding is None:
+            embedding = self.batcher.embed(query)
+            self.query_cache.put_embedding(query, embedding)
+        return embedding
+
+    def _get_chunks_by_ids(self, ids: List[str], with_embeddings: bool = False) -> List[dict]:
+        """Fetch chunk texts and metadata (optionally stored embeddings) for ids, preserving order"""
+        if not ids:
+            return []
+        include = ["documents", "metadatas"] + (["embeddings"] if with_embeddings else [])
+        # Only ask the shards that own these ids (all of them if one is unknown)
+        owners = {self.chunk_sources.get(cid) for cid in ids}
+        found = self.shards.get(ids=ids, include=include, sources=None if None in owners else owners)
+        embeddings = found["embeddings"] if with_embeddings else None
+        by_id = {}
+        for i, (cid, text, metadata) in enumerate(zip(found["ids"], found["documents"], found["metadatas"])):
+            by_id[cid] = {"text": text, "metadata": metadata or {}}
+            if embeddings is not None:
+                by_id[cid]["embedding"] = embeddings[i]
+        return [by_id[cid] for cid in ids if cid in by_id]
+
+    def _load_verse_index(self) -> VerseIndex:
+        try:
+            if os.path.exists(self.verse_index_path):
+                return VerseIndex.load(self.verse_index_path)
+        except Exception as e:
+            print(f"Could not load verse index: {e}")
+        return VerseIndex()
+
+    def _load_bm25(self) -> Optional[BM25Index]:
+        try:
+            if os.path.exists(self.bm25_path):
+                return BM25Index.load(self.bm25_path)
+        except Exception as e:
+            print(f"Could not load BM25 index: {e}")
+        return None
+
+    def _rebuild_bm25(self) -> None:
+        """Rebuild the lexical index from the stored chunks (no embedding needed)"""
+        stored = self.shards.get(include=["documents"])
+        self.bm25 = BM25Index.from_documents(zip(stored["ids"], stored["documents"]))
+        self.bm25.save(self.bm25_path)
+        self.refresh_emotion_pools()
+
+    def refresh_emotion_pools(self) -> None:
+        """Load or rebuild the per-emotion pools unless they match the current index"""
+        if not self.use_emotion_pools:
+            return
+        if not self.bm25 or not len(self.bm25):
+            self.emotion_pools.clear()
+            return
+        signature = index_signature(self.bm25.doc_ids)
+        want_vectors = self.embedder_ready
+        fetch = lambda ids: self._get_chunks_by_ids(ids, with_embeddings=True)
+        if self.emotion_pools.is_current(signature, want_vectors):
+            return
+        if self.emotion_pools.signature is None and self.emotion_pools.load(signature, fetch):
+            if self.emotion_pools.is_current(signature, want_vectors):
+                return
+        seeds = {e: emotion_seed_query(e) for e in [*GITA_EMOTION_KEYWORDS, DEFAULT_GITA_EMOTION]}
+        self.emotion_pools.build(
+            seeds, self.bm25, fetch, signature,
+            vector_search=self._vector_search if want_vectors else None
+        )
+
+    def _load_quantized(self) -> None:
+        if self.vector_dtype == "float32" or not os.path.exists(self.quantized_path):
+            return
+        try:
+            quantized = QuantizedVectors.load(self.quantized_path)
+            if quantized.dtype == self.vector_dtype:
+                self.quantized = quantized
+                self.rescore_vectors = open_vectors(self.vectors_path, quantized.codes.shape[1])
+        except Exception as e:
+            print(f"Could not load quantized vectors: {e}")
+
+    def _rebuild_quantized(self) -> None:
+        """Quantize the stored embeddings (no re-embedding) and measure the recall cost"""
+        if self.vector_dtype == "float32":
+            return
+        stored = self.shards.get(include=["embeddings"])
+        if not stored["ids"]:
+            self.quantized = self.rescore_vectors = None
+            return
+        vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+        quantized = QuantizedVectors.quantize(vectors, self.vector_dtype, ids=stored["ids"])
+        quantized.save(self.quantized_path)
+        self.rescore_vectors = None  # unmap before replacing the file (Windows)
+        # The float32 re-scoring copy is only written when re-scoring is on
+        if self.rescore_factor > 1:
+            write_vectors(self.vectors_path, vectors)
+        elif os.path.exists(self.vectors_path):
+            os.remove(self.vectors_path)
+        self.quantized = quantized
+        self.rescore_vectors = open_vectors(self.vectors_path, vectors.shape[1])
+        self.quantization_report = quantization_report(
+            vectors, quantized, rescore_factor=self.rescore_factor
+        )
+        footprint = self._vector_footprint()
+        print(f"✅ Quantized {len(quantized)} vectors to {self.vector_dtype}: "
+              f"recall@{self.quantization_report['k']} {self.quantization_report['recall']}, "
+              f"+{footprint['added_mb']} MB on top of Chroma's {footprint['chroma_float32_mb']} MB float32 store")
+
+    def _vector_footprint(self) -> dict:
+        """
+        What the quantized copy actually costs: Chroma keeps its own float32 vectors and
+        HNSW graph, so the quantized codes (and the re-scoring file) come on top of them
+        """
+        chroma_bytes = self.quantized.float32_nbytes if self.quantized is not None else 0
+        quantized_bytes = self.quantized.nbytes if self.quantized is not None else 0
+        rescore_bytes = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        return {
+            "chroma_float32_mb": round(chroma_bytes / 2**20, 3),
+            "quantized_mb": round(quantized_bytes / 2**20, 3),
+            "rescore_file_mb": round(rescore_bytes / 2**20, 3),
+            "added_mb": round((quantized_bytes + rescore_bytes) / 2**20, 3),
+            "total_mb": round((chroma_bytes + quantized_bytes + rescore_bytes) / 2**20, 3),
+        }
+
+    @property
+    def embedder_ready(self) -> bool:
+        return self.embedder_loader.ready
+
+    def _vector_search(self, query: str, k: int, sources: Optional[List[str]] = None) -> List[str]:
+        # The quantized copy spans every shard, so filtered searches go to the shards
+        if self.quantized is not None and sources is None:
+            embedding = np.asarray(self.embed_query(query), dtype=np.float32)
+            rows = self.quantized.search_rows(embedding, k * max(1, self.rescore_factor))
+            if self.rescore_factor > 1 and self.rescore_vectors is not None:
+                rows = rerank(embedding, rows, self.rescore_vectors, k)
+            return [self.quantized.ids[row] for row in rows[:k]]
+        return self.shards.query(self.embed_query(query), k, sources)
+
+    def retrieve(self, query: str, k: int = 3, sources: Optional[List[str]] = None) -> List[str]:
         """Retrieve relevant chunks for a query"""
+        return [doc["text"] for doc in self.retrieve_documents(query, k, sources=sources)]
+    
+    def retrieve_documents(
+        self,
+        query: str,
+        k: int = 3,
+        with_embeddings: bool = False,
+        sources: Optional[List[str]] = None
+    ) -> List[dict]:
+        """
+        Retrieve relevant chunks with their metadata (source, chapter, verse),
+        optionally only from the given source files
+        """
         try:
-            retriever = self.vectorstore.as_retriever(
-                search_kwargs={"k": k}
-            )
-            results = retriever.get_relevant_documents(query)
+            sources = sorted(set(sources)) if sources is not None else None
+            scope = tuple(sources) if sources is not None else None
+            generation = self.query_cache.generation
+            ids = self.query_cache.get_result(query, k, scope)
+            if ids is not None:
+                return self._get_chunks_by_ids(ids, with_embeddings)
+            
+            allow = None
+            if sources is not None:
+                wanted = set(sources)
+                allow = lambda cid: self.chunk_sources.get(cid) in wanted
+            lexical = self.bm25.search(query, max(k, self.bm25_candidates), allow) if self.bm25 else []
             
-            # Extract text from documents
-            chunks = [doc.page_content for doc in results]
-            return chunks
+            # Embedder still warming up: serve lexical results, but don't cache them
+            if lexical and not self.embedder_ready:
+                self.retrieval_modes["lexical"] += 1
+                return self._get_chunks_by_ids([cid for cid, _ in lexical[:k]], with_embeddings)
+            
+            if lexical and self.bm25_skip_vector_score and lexical[0][1] >= self.bm25_skip_vector_score:
+                self.retrieval_modes["lexical_confident"] += 1
+                ids = [cid for cid, _ in lexical[:k]]
+            elif lexical:
+                self.retrieval_modes["hybrid"] += 1
+                vector_ids = self._vector_search(query, max(k, self.bm25_candidates), sources)
+                ids = reciprocal_rank_fusion([vector_ids, [cid for cid, _ in lexical]], k)
+            else:
+                self.retrieval_modes["vector"] += 1
+                ids = self._vector_search(query, k, sources)
+            
+            self.query_cache.put_result(query, k, ids, generation, scope)
+            return self._get_chunks_by_ids(ids, with_embeddings)
         
         except Exception as e:
             print(f"Error retrieving chunks: {str(e)}")
             return []
     
-    def get_context(self, query: str, k: int = 3) -> str:
+    def lookup_verse(self, query: str) -> Optional[dict]:
+        """Answer an explicit "Chapter X Verse Y" reference from the verse index"""
+        reference = parse_verse_reference(query)
+        if reference is None:
+            return None
+        return self.verse_index.lookup(*reference)
+    
+    def get_context_documents(
+        self,
+        query: str,
+        k: int = 3,
+        with_embeddings: bool = False,
+        emotion: Optional[str] = None,
+        sources: Optional[List[str]] = None
+    ) -> List[dict]:
+        """
+        Chunks for the LLM prompt: the referenced verse alone, the emotion's
+        precomputed pool re-ranked for this query, or a full-index retrieval.
+        Pools span every shard, so a source filter always takes the retrieval path.
+        """
+        verse = self.lookup_verse(query)
+        if verse and (sources is None or verse["source"] in sources):
+            self.retrieval_modes["verse_lookup"] += 1
+            metadata = {"source": verse["source"], "chapter": verse["chapter"], "verse": verse["verse"]}
+            return [{"text": verse["text"], "metadata": metadata}]
+        if emotion and sources is None and self.use_emotion_pools and self.emotion_pools.has(emotion):
+            query_vector = self.embed_query(query) if self.embedder_ready else None
+            docs = self.emotion_pools.rank(emotion, query, k, query_vector)
+            if docs:
+                self.retrieval_modes["emotion_pool"] += 1
+                return docs
+        return self.retrieve_documents(query, k, with_embeddings, sources)
+    
+    def get_context(self, query: str, k: int = 3, sources: Optional[List[str]] = None) -> str:
         """Get formatted context for LLM"""
-        chunks = self.retrieve(query, k)
+        docs = self.get_context_documents(query, k, sources=sources)
         
-        if not chunks:
+        if not docs:
             return ""
         
-        context = "\n\n---\n\n".join(chunks)
+        context = "\n\n---\n\n".join(format_chunk(doc) for doc in docs)
         return f"Reference Information:\n{context}"
     
     def clear_db(self) -> None:
         """Clear vector database"""
         try:
             from shutil import rmtree
+            self.quantized = self.rescore_vectors = None  # unmap vectors.f32 first (Windows)
             if os.path.exists(self.persist_dir):
                 rmtree(self.persist_dir)
             os.makedirs(self.persist_dir, exist_ok=True)
@@ -149,19 +738,45 @@ class RAGPipeline:
                 persist_directory=self.persist_dir,
                 embedding_function=self.embeddings
             )
+            self.shards.close()
+            self.shards = self._open_shards()
+            self.chunk_sources = {}
+            self.query_cache.bump_generation()
+            self.bm25 = None
+            self.verse_index = VerseIndex()
+            self.emotion_pools.clear()
             print("Vector database cleared")
         except Exception as e:
             print(f"Error clearing database: {str(e)}")
     
+    def _quantization_stats(self) -> Optional[dict]:
+        """Recall of the quantized copy and its real footprint (it adds to Chroma's, saves nothing)"""
+        if self.quantized is None:
+            return None
+        report = dict(self.quantization_report or self.quantized.stats())
+        for key in ("memory_mb", "float32_memory_mb", "memory_saving"):
+            report.pop(key, None)
+        report["footprint"] = self._vector_footprint()
+        return report
+
     def get_stats(self) -> dict:
         """Get vector database statistics"""
         try:
-            collection = self.vectorstore._collection
-            count = collection.count()
+            shard_counts = self.shards.counts()
             return {
-                "total_chunks": count,
+                "total_chunks": sum(shard_counts.values()),
+                "shards": shard_counts,
                 "embedding_model": "all-MiniLM-L6-v2",
-                "persist_dir": self.persist_dir
+                "persist_dir": self.persist_dir,
+                "query_cache": self.query_cache.stats(),
+                "embedding_batcher": self.batcher.stats(),
+                "embedder": self.embedder_loader.stats(),
+                "bm25_chunks": len(self.bm25) if self.bm25 else 0,
+                "indexed_verses": len(self.verse_index),
+                "emotion_pools": self.emotion_pools.stats(),
+                "retrieval_modes": dict(self.retrieval_modes),
+                "vector_dtype": self.vector_dtype,
+                "quantization": self._quantization_stats()
             }
         except Exception as e:
             return {"error": str(e)}
@@ -169,35 +784,59 @@ class RAGPipeline:
 
 # Global RAG instance
 rag_pipeline = None
+_init_lock = threading.Lock()
 
 
 def init_rag(pdf_dir: str = "data/extracted"):
-    """Initialize RAG with PDFs from directory"""
-    global rag_pipeline
+    """
+    Initialize RAG with PDFs from directory (once per process)
     
-    rag_pipeline = RAGPipeline()
+    A persisted store matching the extracted files is loaded as-is; otherwise the
+    directory is synced incrementally. The pipeline is published as soon as the
+    index is usable (BM25 answers while the embedder loads), then the embedder is
+    warmed with a dummy query. RAG_INGEST_ON_STARTUP=always forces the sync.
+    """
+    global rag_pipeline
     
-    # Load PDFs from directory
-    if os.path.exists(pdf_dir):
-        pdf_files = list(Path(pdf_dir).glob("*.txt"))
+    with _init_lock:
+        if rag_pipeline is not None:
+            return rag_pipeline
         
-        for txt_file in pdf_files:
-            try:
-                with open(txt_file, 'r', encoding='utf-8') as f:
-                    text = f.read()
-                    rag_pipeline.load_text(
-                        text, 
-                        metadata={"source": txt_file.name}
-                    )
-            except Exception as e:
-                print(f"❌ Error loading {txt_file.name}: {str(e)}")
+        readiness.begin("index")
+        try:
+            pipeline = RAGPipeline()
+            if not os.path.exists(pdf_dir):
+                readiness.degraded("index", f"{pdf_dir} not found, retrieval disabled")
+            elif os.getenv("RAG_INGEST_ON_STARTUP", "auto").lower() != "always" and pipeline.snapshot_matches(pdf_dir):
+                if pipeline.bm25 is None:
+                    pipeline._rebuild_bm25()
+                if pipeline.vector_dtype != "float32" and pipeline.quantized is None:
+                    pipeline._rebuild_quantized()
+                pipeline.refresh_emotion_pools()
+                readiness.ready("index", f"snapshot loaded, {len(pipeline.bm25 or [])} chunks")
+            else:
+                # Sync extracted texts into the vector store, embedding only what changed
+                stats = pipeline.ingest_directory(pdf_dir)
+                readiness.ready("index", f"ingested +{stats['added']} / -{stats['deleted']} chunks")
+        except Exception as e:
+            # /chat still answers without retrieval, so this doesn't fail /health
+            print(f"❌ RAG index unavailable: {e}")
+            readiness.degraded("index", f"{e}; answering without retrieval")
+            return None
+        rag_pipeline = pipeline
     
-    return rag_pipeline
+    readiness.begin("embedder")
+    try:
+        pipeline.warm_up()
+        readiness.ready("embedder", f"loaded in {pipeline.embedder_loader.load_seconds}s")
+    except Exception as e:
+        # Keyword (BM25) retrieval keeps working without the embedder
+        print(f"❌ Embedder failed to load: {e}")
+        readiness.degraded("embedder", f"{e}; keyword retrieval only")
+    
+    return pipeline
 
 
-def get_rag() -> RAGPipeline:
-    """Get global RAG instance"""
-    global rag_pipeline
-    if rag_pipeline is None:
-        rag_pipeline = RAGPipeline()
+def get_rag() -> Optional[RAGPipeline]:
+    """Get global RAG instance (None until init_rag has loaded the index)"""
     return rag_pipeline
@@ -7,46 +7,168 @@ Prevents memory crashes by loading only relevant chunks instead of entire PDFs
 import os
 import pickle
 import glob
-from typing import List, Optional
-import pdfplumber
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
 from pathlib import Path
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
+from utils.query_cache import QueryCache
+from utils.embedding_batcher import EmbeddingBatcher
+from utils import ann_index
+from utils.ann_index import IndexConfig
+from utils.quantization import open_vectors
+from utils.chunk_store import ChunkStore, ChunkStoreWriter
+from utils.model_loader import BackgroundLoader
+from utils.bm25 import BM25Index, reciprocal_rank_fusion
+from utils.index_builder import BuildCheckpoint, EmbeddingSpool, StreamingChunker, iter_pdf_pages, iter_text_pages
+from utils.index_generations import IndexGenerations
+from utils.extract_pdf import PageCache, iter_pages
+
+INDEX_NAME = "vector_index.faiss"
+VECTORS_NAME = "vectors.f32"
+CHUNKS_DATA_NAME = "chunks.bin"
+CHUNKS_OFFSETS_NAME = "chunks.idx"
+BM25_NAME = "bm25_index.json"
+
+
+class IndexSnapshot:
+    """One published generation: the index, chunk texts and BM25 that belong together"""
+
+    def __init__(self, generation: int, path: str, vector_store, chunks, bm25, rescore_vectors=None):
+        self.generation = generation
+        self.path = path
+        self.vector_store = vector_store
+        self.chunks = chunks
+        self.bm25 = bm25
+        self.rescore_vectors = rescore_vectors
+
+    def close(self) -> None:
+        """Unmap the chunk store and vectors (required before deleting the files on Windows)"""
+        if isinstance(self.chunks, ChunkStore):
+            self.chunks.close()
+        self.chunks = []
+        self.rescore_vectors = None
+
 
 class RAGPipeline:
-    def __init__(self, data_dir: str = "data", model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        data_dir: str = "data",
+        model_name: str = "all-MiniLM-L6-v2",
+        index_config: Optional[IndexConfig] = None
+    ):
         """
         Initialize RAG Pipeline
         
         Args:
             data_dir: Directory containing PDFs
             model_name: Sentence transformer model for embeddings
+            index_config: Index type and parameters (defaults to RAG_INDEX_* env settings)
         """
         self.data_dir = data_dir
         self.model_name = model_name
-        self.embedder = SentenceTransformer(model_name)
-        self.vector_store = None
-        self.chunks = []
-        self.index_path = os.path.join(data_dir, "vector_index.faiss")
-        self.chunks_path = os.path.join(data_dir, "chunks.pkl")
+        # The model loads in the background; BM25 answers queries until it is ready
+        self.embedder_loader = BackgroundLoader(
+            lambda: SentenceTransformer(model_name), name="faiss-embedder-loader"
+        )
+        self.index_config = index_config or IndexConfig()
+        self.recall_report = None
+        # Each build is published as data/index/gen-NNNNNN; data/index/CURRENT names the live one.
+        # Searches read self._live once, so they never mix one generation's index with
+        # another's chunks, and a rebuild swaps it in a single assignment.
+        self.generations = IndexGenerations(os.path.join(data_dir, "index"))
+        self._live: Optional[IndexSnapshot] = None
+        # Replaced snapshot, kept open for searches still using it until the next swap
+        self._retired: Optional[IndexSnapshot] = None
+        self._build_lock = threading.Lock()
+        # Files of the single-directory layout used before generations (migrated on load);
+        # chunks.pkl is only read to migrate even older data
+        self.legacy_chunks_path = os.path.join(data_dir, "chunks.pkl")
+        self.bm25_candidates = int(os.getenv("RAG_BM25_CANDIDATES", "20"))
+        self.bm25_skip_vector_score = float(os.getenv("RAG_BM25_SKIP_VECTOR_SCORE", "0"))
+        self.retrieval_modes = {"lexical": 0, "lexical_confident": 0, "hybrid": 0}
+        # Staging directory of an in-progress (or interrupted) build, checkpoint included
+        self.build_dir = self.generations.staging_dir
+        self.build_workers = int(os.getenv("RAG_BUILD_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+        self.build_batch_size = int(os.getenv("RAG_BUILD_BATCH_SIZE", "256"))
+        # Extracted page texts, reused by rebuilds for pages that did not change
+        self.page_cache_path = os.path.join(data_dir, "pdf_page_cache.sqlite3")
+        self.query_cache = QueryCache()
+        self.batcher = EmbeddingBatcher(self._encode_queries, name="faiss-embedder")
         
         # Load existing index if available
         self._load_index()
 
+    @property
+    def vector_store(self):
+        live = self._live
+        return live.vector_store if live else None
+
+    @property
+    def chunks(self):
+        live = self._live
+        return live.chunks if live else []
+
+    @property
+    def bm25(self) -> Optional[BM25Index]:
+        live = self._live
+        return live.bm25 if live else None
+
+    @property
+    def rescore_vectors(self):
+        live = self._live
+        return live.rescore_vectors if live else None
+
+    @property
+    def generation(self) -> Optional[int]:
+        live = self._live
+        return live.generation if live else None
+
+    def _files(self, directory: str) -> dict:
+        """Paths of one generation's files"""
+        index_path = os.path.join(directory, INDEX_NAME)
+        return {
+            # The exact flat index is always kept as the recall baseline
+            "index": index_path,
+            "ann": ann_index.index_path_for(index_path, self.index_config.variant),
+            # float32 copy of the vectors (memory-mapped) for exact re-scoring of approximate hits
+            "vectors": os.path.join(directory, VECTORS_NAME),
+            "chunks_data": os.path.join(directory, CHUNKS_DATA_NAME),
+            "chunks_offsets": os.path.join(directory, CHUNKS_OFFSETS_NAME),
+            "bm25": os.path.join(directory, BM25_NAME),
+        }
+
+    @property
+    def embedder(self) -> SentenceTransformer:
+        """Sentence transformer model (blocks until the background load finishes)"""
+        return self.embedder_loader.get()
+
+    @property
+    def embedder_ready(self) -> bool:
+        return self.embedder_loader.ready
+
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode a micro-batch of queries into float32 rows"""
+        return self.embedder.encode(
+            queries, batch_size=len(queries), convert_to_numpy=True
+        ).astype(np.float32)
+
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """Extract text from PDF file"""
-        text = ""
+        texts = []
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
+            cache = PageCache(self.page_cache_path)
+            try:
+                texts = [text for _, text in iter_pages(pdf_path, cache) if text]
+            finally:
+                cache.close()
         except Exception as e:
             print(f"Error extracting PDF {pdf_path}: {e}")
-        return text
+        return "".join(text + "\n" for text in texts)
 
     def chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
         """
@@ -60,78 +182,357 @@ class RAGPipeline:
         Returns:
             List of text chunks
         """
-        splitter = RecursiveCharacterTextSplitter(
+        return self._splitter(chunk_size, overlap).split_text(text)
+
+    def _splitter(self, chunk_size: int = 500, overlap: int = 100) -> RecursiveCharacterTextSplitter:
+        return RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=overlap,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
-        return splitter.split_text(text)
 
-    def build_index(self) -> bool:
+    def build_index(
+        self,
+        resume: bool = True,
+        sources: Optional[List[str]] = None,
+        progress: Optional[Callable[[dict], None]] = None
+    ) -> bool:
         """
         Build vector index from all PDFs in data directory
         
+        Pages are extracted in a process pool and chunks are embedded in fixed-size
+        batches as they arrive, so peak memory no longer grows with the corpus.
+        Everything is written to data/index/staging/ (checkpointed after every batch)
+        while the live generation keeps serving; the finished build is published as
+        the next generation and swapped in atomically.
+        
+        Args:
+            resume: Continue from the checkpoint of an interrupted build
+            sources: Explicit .pdf/.txt files to index instead of data/docs/*.pdf
+            progress: Called with {"phase", "sources_done", "sources", "chunks"} as the build advances
+            
         Returns:
             True if successful, False otherwise
         """
+        if not self._build_lock.acquire(blocking=False):
+            print("Index build already running, not starting another")
+            return False
         try:
-            pdf_files = glob.glob(os.path.join(self.data_dir, "docs", "*.pdf"))
+            return self._build_index(resume, sources, progress)
+        finally:
+            self._build_lock.release()
+
+    def _build_index(
+        self,
+        resume: bool,
+        sources: Optional[List[str]],
+        progress: Optional[Callable[[dict], None]]
+    ) -> bool:
+        writer = spool = None
+        try:
+            pdf_files = sorted(sources) if sources else sorted(glob.glob(os.path.join(self.data_dir, "docs", "*.pdf")))
             if not pdf_files:
                 print("No PDF files found in data/docs/")
                 return False
             
-            all_chunks = []
+            checkpoint = BuildCheckpoint(os.path.join(self.build_dir, "checkpoint.json"), pdf_files)
+            resumed = resume and checkpoint.load()
+            files = self._files(self.build_dir)
+            if resumed:
+                # The chunk store may have been checkpointed past the build checkpoint (crash
+                # in between); cut it back to the rows the checkpoint (and the spool) hold
+                try:
+                    writer = ChunkStoreWriter(
+                        files["chunks_data"], files["chunks_offsets"], resume=True, rows=checkpoint.state["rows"]
+                    )
+                except ValueError as e:
+                    print(f"⚠️ Cannot resume the index build ({e}), starting over")
+                    resumed = False
+                    checkpoint = BuildCheckpoint(checkpoint.path, pdf_files)
+            if not resumed:
+                # Leftovers of a build for other inputs
+                shutil.rmtree(self.build_dir, ignore_errors=True)
+            os.makedirs(self.build_dir, exist_ok=True)
+            start_pdf = checkpoint.state["pdf_index"]
+            start_page = checkpoint.state["next_page"]
+            start_carry = checkpoint.state["carry"]
+            pending = list(checkpoint.state["pending"])
+            if resumed:
+                print(f"Resuming index build at PDF {start_pdf + 1}/{len(pdf_files)}, "
+                      f"page {start_page} ({checkpoint.state['rows']} chunks already embedded)")
+            
+            if writer is None:
+                writer = ChunkStoreWriter(files["chunks_data"], files["chunks_offsets"])
+            spool = EmbeddingSpool(
+                os.path.join(self.build_dir, "embeddings.f32"),
+                checkpoint.state["dimension"],
+                checkpoint.state["rows"]
+            )
+            flat_index = None
+            if spool.rows:
+                flat_index = faiss.IndexFlatL2(spool.dimension)
+                flat_index.add(np.asarray(spool.read()))
             
-            # Extract and chunk all PDFs
-            for pdf_path in pdf_files:
-                print(f"Processing: {pdf_path}")
-                text = self.extract_text_from_pdf(pdf_path)
-                chunks = self.chunk_text(text)
-                all_chunks.extend(chunks)
-                print(f"  → Extracted {len(chunks)} chunks")
+            def embed_batch(batch: List[str]) -> None:
+                nonlocal flat_index
+                embeddings = self.embedder.encode(
+                    batch, batch_size=len(batch), convert_to_numpy=True
+                ).astype(np.float32)
+                if flat_index is None:
+                    flat_index = faiss.IndexFlatL2(embeddings.shape[1])
+                flat_index.add(embeddings)
+                spool.append(embeddings)
+                writer.extend(batch)
             
-            if not all_chunks:
-                print("No chunks generated from PDFs")
-                return False
+            def save_progress(pdf_index: int, next_page: int, carry: str) -> None:
+                writer.checkpoint()
+                spool.checkpoint()
+                checkpoint.save(
+                    pdf_index=pdf_index, next_page=next_page, rows=len(writer),
+                    dimension=spool.dimension, carry=carry, pending=pending
+                )
+                if progress:
+                    progress({"phase": "embedding", "sources_done": pdf_index,
+                              "sources": len(pdf_files), "chunks": len(writer)})
             
-            self.chunks = all_chunks
+            # Extract pages in parallel, chunk as a stream, embed in fixed-size batches
+            splitter = self._splitter()
+            with ProcessPoolExecutor(max_workers=self.build_workers) as executor:
+                for pdf_index in range(start_pdf, len(pdf_files)):
+                    pdf_path = pdf_files[pdf_index]
+                    resuming_this = pdf_index == start_pdf
+                    print(f"Processing: {pdf_path}")
+                    rows_before = len(writer) + len(pending)
+                    chunker = StreamingChunker(splitter, buffer=start_carry if resuming_this else "")
+                    if pdf_path.lower().endswith(".pdf"):
+                        pages = iter_pdf_pages(
+                            pdf_path, executor,
+                            start_page=start_page if resuming_this else 0,
+                            max_in_flight=self.build_workers * 2,
+                            cache_path=self.page_cache_path
+                        )
+                    else:
+                        pages = iter_text_pages(pdf_path, start_page=start_page if resuming_this else 0)
+                    for page_number, page_text in pages:
+                        pending.extend(chunker.feed(page_text))
+                        if len(pending) >= self.build_batch_size:
+                            while len(pending) >= self.build_batch_size:
+                                embed_batch(pending[:self.build_batch_size])
+                                del pending[:self.build_batch_size]
+                            save_progress(pdf_index, page_number + 1, chunker.buffer)
+                    pending.extend(chunker.flush())
+                    save_progress(pdf_index + 1, 0, "")
+                    print(f"  → Extracted {len(writer) + len(pending) - rows_before} chunks")
             
-            # Generate embeddings
-            print(f"Generating embeddings for {len(all_chunks)} chunks...")
-            embeddings = self.embedder.encode(all_chunks, convert_to_numpy=True)
+            if pending:
+                embed_batch(pending)
+                pending.clear()
+                save_progress(len(pdf_files), 0, "")
             
-            # Create FAISS index
-            dimension = embeddings.shape[1]
-            self.vector_store = faiss.IndexFlatL2(dimension)
-            self.vector_store.add(embeddings.astype(np.float32))
+            if not len(writer):
+                print("No chunks generated from PDFs")
+                writer.abort()
+                writer = None
+                return False
+            
+            # Create the configured ANN index from the spooled embeddings
+            if progress:
+                progress({"phase": "indexing", "sources_done": len(pdf_files),
+                          "sources": len(pdf_files), "chunks": len(writer)})
+            vector_store = flat_index
+            if self.index_config.variant != "flat":
+                print(f"Building {self.index_config.variant} index...")
+                vector_store = ann_index.build_index(np.asarray(spool.read()), self.index_config)
+                if ann_index.index_type_of(vector_store) != self.index_config.index_type:
+                    # Fell back to exact search (too few vectors): the generation is a plain
+                    # flat one, not a flat index saved under the configured type's name
+                    vector_store = flat_index
             
-            # Save index and chunks
-            os.makedirs(self.data_dir, exist_ok=True)
-            faiss.write_index(self.vector_store, self.index_path)
+            # Finish every file of the new generation inside staging/
+            faiss.write_index(flat_index, files["index"])
+            if vector_store is not flat_index:
+                faiss.write_index(vector_store, files["ann"])
+            staged_chunks = writer.close()
+            writer = None
+            bm25 = BM25Index.from_documents(enumerate(staged_chunks))
+            staged_chunks.close()  # unmapped before staging/ is renamed (Windows)
+            bm25.save(files["bm25"])
+            spool.close()
+            if vector_store is not flat_index:
+                # The spool already is the raw float32 matrix; keep it for re-scoring
+                os.replace(spool.path, files["vectors"])
+            else:
+                os.remove(spool.path)
+            spool = None
+            os.remove(checkpoint.path)
             
-            with open(self.chunks_path, "wb") as f:
-                pickle.dump(self.chunks, f)
+            # Publish: staging/ becomes the next generation and CURRENT points at it
+            generation = self.generations.publish()
+            self._swap(self._open_snapshot(generation, vector_store=vector_store, bm25=bm25))
+            if os.path.exists(self.legacy_chunks_path):
+                os.remove(self.legacy_chunks_path)
             
-            print(f"✅ Index built successfully! Total chunks: {len(all_chunks)}")
+            print(f"✅ Index built successfully! Generation {generation}, total chunks: {len(self.chunks)}")
+            if vector_store is not flat_index:
+                self.recall_report = self.evaluate_recall(exact_index=flat_index)
+                print(f"  → recall@{self.recall_report['k']}: {self.recall_report['recall']}, "
+                      f"{self.recall_report['memory_mb']} MB vs {self.recall_report['flat_memory_mb']} MB flat")
             return True
             
         except Exception as e:
-            print(f"Error building index: {e}")
+            print(f"Error building index: {e} (progress kept in {self.build_dir}, rerun to resume)")
             return False
+        finally:
+            # Leave unfinished files in place for the next run to resume from
+            if writer is not None:
+                writer.release()
+            if spool is not None:
+                spool.close()
+
+    def _open_snapshot(self, generation: int, vector_store=None, bm25: Optional[BM25Index] = None) -> IndexSnapshot:
+        """Open a published generation (reusing objects the build already holds in memory)"""
+        path = self.generations.path(generation)
+        files = self._files(path)
+        approximate = os.path.exists(files["ann"]) and files["ann"] != files["index"]
+        if vector_store is None:
+            if approximate:
+                vector_store = faiss.read_index(files["ann"])
+                ann_index.apply_search_params(vector_store, self.index_config)
+            else:
+                vector_store = faiss.read_index(files["index"])
+        chunks = ChunkStore(files["chunks_data"], files["chunks_offsets"])
+        if bm25 is None:
+            if os.path.exists(files["bm25"]):
+                bm25 = BM25Index.load(files["bm25"])
+            else:
+                bm25 = BM25Index.from_documents(enumerate(chunks))
+                bm25.save(files["bm25"])
+        rescore_vectors = None
+        if approximate and os.path.exists(files["vectors"]):
+            rescore_vectors = open_vectors(files["vectors"], vector_store.d)
+        return IndexSnapshot(generation, path, vector_store, chunks, bm25, rescore_vectors)
+
+    def _swap(self, snapshot: IndexSnapshot) -> None:
+        """Make snapshot live; the one it replaces is retired, the one before that deleted"""
+        previous, self._live = self._live, snapshot
+        self.query_cache.bump_generation()
+        # Searches that read self._live before the swap may still be using `previous`,
+        # so it stays open until the next swap rather than being unmapped right away
+        if self._retired is not None:
+            self._retired.close()
+            self.generations.remove(self._retired.generation)
+        self._retired = previous
+
+    def _migrate_legacy_chunks(self, data_path: str, offsets_path: str) -> None:
+        """Convert an old chunks.pkl into the mmap chunk store once"""
+        with open(self.legacy_chunks_path, "rb") as f:
+            chunks = pickle.load(f)
+        ChunkStore.write(chunks, data_path, offsets_path)
+        os.remove(self.legacy_chunks_path)
+        print(f"Migrated {len(chunks)} chunks from chunks.pkl to chunk store")
+
+    def _migrate_legacy_layout(self) -> Optional[int]:
+        """Move an index built into data/ directly (before generations) into the first generation"""
+        legacy = self._files(self.data_dir)
+        if not os.path.exists(legacy["index"]):
+            return None
+        if not ChunkStore.exists(legacy["chunks_data"], legacy["chunks_offsets"]):
+            if not os.path.exists(self.legacy_chunks_path):
+                return None
+            self._migrate_legacy_chunks(legacy["chunks_data"], legacy["chunks_offsets"])
+        importing = os.path.join(self.generations.root, "importing")
+        shutil.rmtree(importing, ignore_errors=True)
+        os.makedirs(importing)
+        for key, path in legacy.items():
+            if os.path.exists(path):
+                os.replace(path, self._files(importing)[key])
+        # The old scratch directory can't be resumed into staging/
+        shutil.rmtree(os.path.join(self.data_dir, "index_build"), ignore_errors=True)
+        generation = self.generations.publish(importing)
+        print(f"Moved existing index into {self.generations.path(generation)}")
+        return generation
 
     def _load_index(self) -> bool:
-        """Load existing vector index from disk"""
+        """Load the live generation from disk"""
         try:
-            if os.path.exists(self.index_path) and os.path.exists(self.chunks_path):
-                self.vector_store = faiss.read_index(self.index_path)
-                with open(self.chunks_path, "rb") as f:
-                    self.chunks = pickle.load(f)
-                print(f"✅ Loaded existing index with {len(self.chunks)} chunks")
-                return True
+            generation = self.generations.current()
+            if generation is None:
+                generation = self._migrate_legacy_layout()
+                if generation is None:
+                    return False
+            self._live = self._open_snapshot(generation)
+            # Generations left behind by a crash between publish and cleanup
+            self.generations.prune([generation])
+            self.query_cache.bump_generation()
+            print(f"✅ Loaded existing index generation {generation} with {len(self.chunks)} chunks")
+            return True
         except Exception as e:
             print(f"Could not load index: {e}")
         return False
 
+    def evaluate_recall(
+        self,
+        k: int = 10,
+        sample_size: int = 200,
+        queries: Optional[List[str]] = None,
+        exact_index=None
+    ) -> dict:
+        """
+        Measure recall@k of the live index against the exact flat index
+        
+        Args:
+            k: Number of neighbours compared per query
+            sample_size: Stored vectors used as queries when no queries are given
+            queries: Optional real query strings to encode and test with
+            exact_index: Flat index to compare against (read from disk if omitted)
+            
+        Returns:
+            Recall report with index parameters and per-query latencies
+        """
+        live = self._live
+        if live is None:
+            return {"error": "index not built"}
+        if exact_index is None:
+            exact_index = faiss.read_index(self._files(live.path)["index"])
+        
+        if queries:
+            query_vectors = self.embedder.encode(queries, convert_to_numpy=True).astype(np.float32)
+        else:
+            rng = np.random.default_rng(0)
+            sample = rng.choice(exact_index.ntotal, size=min(sample_size, exact_index.ntotal), replace=False)
+            query_vectors = np.vstack([exact_index.reconstruct(int(i)) for i in sample]).astype(np.float32)
+        
+        report = ann_index.recall_at_k(exact_index, live.vector_store, query_vectors, k)
+        report.update(self.index_config.to_dict())
+        built = ann_index.index_type_of(live.vector_store)
+        if built != self.index_config.index_type:
+            report.update(index_type=built, variant=built, configured_variant=self.index_config.variant)
+        report.update(ann_index.memory_report(live.vector_store, exact_index))
+        report["generation"] = live.generation
+        searcher = self._searcher(live)
+        if searcher is not live.vector_store:
+            rescored = ann_index.recall_at_k(exact_index, searcher, query_vectors, k)
+            report.update(rescored_recall=rescored["recall"], rescored_ms_per_query=rescored["approx_ms_per_query"])
+        self.recall_report = report
+        return report
+
+    def _searcher(self, live: IndexSnapshot):
+        """The snapshot's index, wrapped with exact re-scoring when configured and possible"""
+        if live.rescore_vectors is not None and self.index_config.rescore_factor > 1:
+            return ann_index.RescoredSearch(live.vector_store, live.rescore_vectors, self.index_config.rescore_factor)
+        return live.vector_store
+
+    def _vector_search(self, query: str, k: int, live: IndexSnapshot) -> List[int]:
+        # Encode query (cached per normalized query)
+        query_embedding = self.query_cache.get_embedding(query)
+        if query_embedding is None:
+            query_embedding = self.batcher.embed(query).reshape(1, -1)
+            self.query_cache.put_embedding(query, query_embedding)
+        
+        # Search in vector store
+        distances, found = self._searcher(live).search(query_embedding, min(k, len(live.chunks)))
+        return [int(idx) for idx in found[0] if idx >= 0]
+
     def retrieve_relevant_chunks(self, query: str, k: int = 3) -> List[str]:
         """
         Retrieve top k most relevant chunks for a query
@@ -143,21 +544,37 @@ class RAGPipeline:
         Returns:
             List of relevant text chunks
         """
-        if self.vector_store is None or not self.chunks:
+        # One snapshot for the whole query, even if a rebuild swaps in a new one meanwhile
+        live = self._live
+        if live is None or not live.chunks:
             return []
         
         try:
-            # Encode query
-            query_embedding = self.embedder.encode([query], convert_to_numpy=True)
+            generation = self.query_cache.generation
+            # Result ids are row numbers of this generation's chunk store
+            indices = self.query_cache.get_result(query, k, live.generation)
+            if indices is None:
+                lexical = live.bm25.search(query, max(k, self.bm25_candidates)) if live.bm25 else []
+                
+                if lexical and not self.embedder_ready:
+                    # Embedder still warming up: lexical only, not cached
+                    self.retrieval_modes["lexical"] += 1
+                    return [live.chunks[idx] for idx, _ in lexical[:k]]
+                
+                if lexical and self.bm25_skip_vector_score and lexical[0][1] >= self.bm25_skip_vector_score:
+                    self.retrieval_modes["lexical_confident"] += 1
+                    indices = [idx for idx, _ in lexical[:k]]
+                else:
+                    vector_indices = self._vector_search(query, max(k, self.bm25_candidates) if lexical else k, live)
+                    if lexical:
+                        self.retrieval_modes["hybrid"] += 1
+                        indices = reciprocal_rank_fusion([vector_indices, [idx for idx, _ in lexical]], k)
+                    else:
+                        indices = vector_indices[:k]
+                self.query_cache.put_result(query, k, indices, generation, live.generation)
             
-            # Search in vector store
-            distances, indices = self.vector_store.search(
-                query_embedding.astype(np.float32), 
-                min(k, len(self.chunks))
-            )
-            
-            # Get relevant chunks
-            relevant_chunks = [self.chunks[idx] for idx in indices[0]]
+            # Get relevant chunks (only these rows are decoded from the store)
+            relevant_chunks = [live.chunks[idx] for idx in indices]
             return relevant_chunks
             
         except Exception as e:
@@ -193,13 +610,19 @@ class RAGPipeline:
         return context
 
     def clear_index(self):
-        """Clear vector index"""
-        self.vector_store = None
-        self.chunks = []
-        if os.path.exists(self.index_path):
-            os.remove(self.index_path)
-        if os.path.exists(self.chunks_path):
-            os.remove(self.chunks_path)
+        """Clear vector index (waits for a running build to finish)"""
+        with self._build_lock:
+            live, self._live = self._live, None
+            self.query_cache.bump_generation()
+            for snapshot in (live, self._retired):
+                if snapshot is not None:
+                    snapshot.close()
+            self._retired = None
+            self.recall_report = None
+            self.generations.reset()
+            for path in [*self._files(self.data_dir).values(), self.legacy_chunks_path]:
+                if os.path.exists(path):
+                    os.remove(path)
         print("✅ Index cleared")
 
 
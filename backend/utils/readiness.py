@@ -0,0 +1,72 @@
+"""
+Worker readiness phases for /health
+Startup walks through db → index → embedder → providers; the load balancer only
+routes traffic once every phase is ready (or degraded but still able to serve).
+"""
+
+import threading
+import time
+from typing import Optional
+
+PHASES = ("db", "index", "embedder", "providers")
+# degraded: usable with reduced quality (e.g. no LLM provider → local fallback answers,
+# no index or embedder → answers without retrieval); only a phase the app can't serve
+# without (the database) is marked failed
+SERVING_STATES = ("ready", "degraded")
+
+
+class Readiness:
+    def __init__(self, phases=PHASES):
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._phases = {
+            name: {"state": "pending", "detail": None, "seconds": None, "_began": None}
+            for name in phases
+        }
+
+    def begin(self, phase: str) -> None:
+        with self._lock:
+            self._phases[phase].update(state="starting", _began=time.monotonic())
+
+    def _finish(self, phase: str, state: str, detail: Optional[str]) -> None:
+        with self._lock:
+            entry = self._phases[phase]
+            began = entry["_began"] or self._started
+            entry.update(state=state, detail=detail, seconds=round(time.monotonic() - began, 2))
+
+    def ready(self, phase: str, detail: Optional[str] = None) -> None:
+        self._finish(phase, "ready", detail)
+
+    def degraded(self, phase: str, detail: str) -> None:
+        self._finish(phase, "degraded", detail)
+
+    def failed(self, phase: str, detail: str) -> None:
+        self._finish(phase, "failed", detail)
+        print(f"❌ Startup phase '{phase}' failed: {detail}")
+
+    def state(self, phase: str) -> str:
+        with self._lock:
+            return self._phases[phase]["state"]
+
+    @property
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(p["state"] in SERVING_STATES for p in self._phases.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            phases = {
+                name: {k: v for k, v in entry.items() if not k.startswith("_")}
+                for name, entry in self._phases.items()
+            }
+            failed = any(p["state"] == "failed" for p in phases.values())
+            serving = all(p["state"] in SERVING_STATES for p in phases.values())
+        return {
+            "status": "ready" if serving else ("failed" if failed else "starting"),
+            "uptime_seconds": round(time.monotonic() - self._started, 1),
+            "phases": phases,
+        }
+
+
+# Process-wide readiness, filled in by main.startup and init_rag
+readiness = Readiness()
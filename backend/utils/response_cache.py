@@ -0,0 +1,226 @@
+"""
+Semantic response cache for /chat
+Near-identical messages ("I'm scared about exams" / "I am scared of my exam") with the
+same detected emotion reuse a stored reply instead of a new LLM call. Lookups compare
+the query embedding against stored ones by cosine similarity; entries expire after a
+TTL, the cache is size-bounded (least recently used first out) and every entry is
+written through to SQLite so the cache survives restarts.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticResponseCache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        enabled: Optional[bool] = None,
+        threshold: Optional[float] = None,
+        ttl: Optional[float] = None,
+        maxsize: Optional[int] = None,
+    ):
+        """
+        Args:
+            path: SQLite file of the on-disk tier ("" = memory only)
+            enabled: Opt-in switch (RESPONSE_CACHE_ENABLED, default off)
+            threshold: Minimum cosine similarity for a hit
+            ttl: Seconds an entry stays valid
+            maxsize: Entries kept; the least recently used are evicted first
+        """
+        self.enabled = enabled if enabled is not None else os.getenv("RESPONSE_CACHE_ENABLED", "0") == "1"
+        self.threshold = threshold if threshold is not None else float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+        self.maxsize = maxsize if maxsize is not None else int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+        self.path = path if path is not None else os.getenv("RESPONSE_CACHE_PATH", "data/response_cache.sqlite3")
+        self._lock = threading.Lock()
+        # id → {"emotion", "vector", "reply", "expires_at", "last_used"}
+        self._entries: Dict[int, dict] = {}
+        # emotion → (ids, stacked unit vectors), rebuilt lazily after changes
+        self._matrices: Dict[str, tuple] = {}
+        self._touched: set = set()
+        self._next_id = 1
+        self._db: Optional[sqlite3.Connection] = None
+        # SQLite writes queued under _lock and run in order by _flush, outside it, so
+        # lookups never wait on the disk
+        self._pending: List[tuple] = []
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        if self.enabled:
+            self._open()
+
+    def _open(self) -> None:
+        """Open the SQLite tier and load the live entries back into memory"""
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "id INTEGER PRIMARY KEY, emotion TEXT NOT NULL, embedding BLOB NOT NULL, "
+                "reply TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            rows = self._db.execute(
+                "SELECT id, emotion, embedding, reply, expires_at, last_used FROM responses "
+                "ORDER BY last_used DESC"
+            ).fetchall()
+            stale = [row[0] for row in rows[self.maxsize:]]
+            if stale:
+                self._db.executemany("DELETE FROM responses WHERE id = ?", [(i,) for i in stale])
+            self._db.commit()
+            for entry_id, emotion, blob, reply, expires_at, last_used in rows[:self.maxsize]:
+                self._entries[entry_id] = {
+                    "emotion": emotion,
+                    "vector": np.frombuffer(blob, dtype=np.float32),
+                    "reply": reply,
+                    "expires_at": expires_at,
+                    "last_used": last_used,
+                }
+            self._next_id = max(self._entries, default=0) + 1
+            if self._entries:
+                print(f"✅ Response cache: {len(self._entries)} entries loaded from {self.path}")
+        except Exception as e:
+            print(f"Response cache disk tier unavailable ({e}), using memory only")
+            self._db = None
+
+    def _matrix(self, emotion: str) -> tuple:
+        cached = self._matrices.get(emotion)
+        if cached is None:
+            ids = [i for i, e in self._entries.items() if e["emotion"] == emotion]
+            vectors = [self._entries[i]["vector"] for i in ids]
+            dims = {len(v) for v in vectors}
+            matrix = np.vstack(vectors) if vectors and len(dims) == 1 else None
+            cached = self._matrices[emotion] = (ids, matrix)
+        return cached
+
+    def _drop(self, entry_ids: List[int]) -> None:
+        """Remove entries from memory (and queue their removal from disk); caller holds the lock"""
+        for entry_id in entry_ids:
+            entry = self._entries.pop(entry_id, None)
+            if entry is not None:
+                self._matrices.pop(entry["emotion"], None)
+            self._touched.discard(entry_id)
+        if self._db is not None and entry_ids:
+            self._pending.append(("DELETE FROM responses WHERE id = ?", [(i,) for i in entry_ids]))
+
+    def _flush(self) -> None:
+        """Run the queued SQLite writes; only one thread writes at a time, in queue order"""
+        if self._db is None:
+            return
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            try:
+                for sql, rows in pending:
+                    self._db.executemany(sql, rows)
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Response cache write failed: {e}")
+
+    def get(self, emotion: str, embedding: Sequence[float]) -> Optional[str]:
+        """Stored reply for the most similar cached message above the threshold"""
+        if not self.enabled:
+            return None
+        query = _unit(embedding)
+        now = time.time()
+        with self._lock:
+            ids, matrix = self._matrix(emotion)
+            if matrix is None or matrix.shape[1] != len(query):
+                self.misses += 1
+                return None
+            scores = matrix @ query
+            for pos in np.argsort(-scores):
+                if scores[pos] < self.threshold:
+                    break
+                entry = self._entries[ids[pos]]
+                if entry["expires_at"] <= now:
+                    continue
+                entry["last_used"] = now
+                self._touched.add(ids[pos])
+                self.hits += 1
+                return entry["reply"]
+            self.misses += 1
+            return None
+
+    def put(self, emotion: str, embedding: Sequence[float], reply: str) -> None:
+        """Store a reply; blocking (SQLite write), so call it off the event loop"""
+        if not self.enabled or not reply:
+            return
+        vector = _unit(embedding)
+        now = time.time()
+        with self._lock:
+            expired = [i for i, e in self._entries.items() if e["expires_at"] <= now]
+            self.expirations += len(expired)
+            self._drop(expired)
+            overflow = len(self._entries) + 1 - self.maxsize
+            if overflow > 0:
+                oldest = sorted(self._entries, key=lambda i: self._entries[i]["last_used"])[:overflow]
+                self.evictions += len(oldest)
+                self._drop(oldest)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            entry = {"emotion": emotion, "vector": vector, "reply": reply, "expires_at": now + self.ttl, "last_used": now}
+            self._entries[entry_id] = entry
+            self._matrices.pop(emotion, None)
+            self.stores += 1
+
+            if self._db is not None:
+                self._pending.append((
+                    "INSERT INTO responses (id, emotion, embedding, reply, expires_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(entry_id, emotion, vector.tobytes(), reply, entry["expires_at"], now)],
+                ))
+                # Recency of hits since the last write, so restarts keep the hot entries
+                self._pending.append((
+                    "UPDATE responses SET last_used = ? WHERE id = ?",
+                    [(self._entries[i]["last_used"], i) for i in self._touched if i in self._entries],
+                ))
+                self._touched.clear()
+        self._flush()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._drop(list(self._entries))
+        self._flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "persistent": self._db is not None,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Process-wide cache used by ai_response
+response_cache = SemanticResponseCache()
@@ -0,0 +1,165 @@
+"""
+Per-source Chroma shards for the /chat RAG pipeline
+Each corpus file lives in its own collection (sharing one Chroma client), so a
+corpus can be re-embedded or dropped without touching the others. Vector queries
+fan out to the shards in parallel and the per-shard top-k lists are merged by
+distance; a source filter restricts the fan-out to the named shards. A shard is
+rebuilt into a staging collection and swapped in when complete, so searches keep
+using the old one meanwhile.
+"""
+
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_community.vectorstores import Chroma
+
+
+def shard_name(source: str) -> str:
+    """Valid Chroma collection name for a source file (3-63 chars, alphanumeric ends)"""
+    stem = re.sub(r"[^a-zA-Z0-9_-]+", "-", source.rsplit(".", 1)[0]).strip("-_")[:40] or "default"
+    digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:8]
+    return f"src-{stem}-{digest}"
+
+
+def staging_name(source: str) -> str:
+    """Collection a source's shard is rebuilt into before it replaces the live one"""
+    return f"{shard_name(source)}-next"
+
+
+class ShardSet:
+    def __init__(self, client, embedding_function, persist_directory: str, max_workers: int = 4):
+        """
+        Args:
+            client: Chroma client shared by every shard
+            persist_directory: Directory the client persists to
+            embedding_function: Embeddings used when documents are added
+            max_workers: Threads for the parallel fan-out
+        """
+        self.client = client
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        # source → langchain Chroma wrapper of that source's collection
+        self.stores: Dict[str, Chroma] = {}
+        # source → staging collection of a shard being rebuilt
+        self.staged: Dict[str, Chroma] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-shard")
+
+    def _collection(self, source: str, name: str) -> Chroma:
+        return Chroma(
+            client=self.client,
+            persist_directory=self.persist_directory,
+            collection_name=name,
+            embedding_function=self.embedding_function,
+            collection_metadata={"source": source}
+        )
+
+    def open(self, source: str) -> Chroma:
+        store = self.stores.get(source)
+        if store is None:
+            store = self.stores[source] = self._collection(source, shard_name(source))
+        return store
+
+    def stage(self, source: str) -> None:
+        """Start an empty staging collection for rebuilding a source's shard"""
+        self._delete_collection(staging_name(source))  # left over from an interrupted rebuild
+        self.staged[source] = self._collection(source, staging_name(source))
+
+    def swap(self, source: str) -> None:
+        """
+        Make the staged collection the source's shard. Searches pick it up at once (the
+        store is replaced in one assignment); the old collection is deleted afterwards
+        and the new one takes over its name, so a restart finds it as usual.
+        """
+        staged = self.staged.pop(source)
+        staged.persist()
+        self.stores[source] = staged
+        self._delete_collection(shard_name(source))
+        staged._collection.modify(name=shard_name(source))
+
+    def discover(self, sources: Iterable[str]) -> None:
+        for source in sources:
+            self.open(source)
+
+    def sources(self) -> List[str]:
+        return list(self.stores)
+
+    def _selected(self, sources: Optional[Iterable[str]]) -> List[Tuple[str, Chroma]]:
+        if sources is None:
+            return list(self.stores.items())
+        return [(s, self.stores[s]) for s in sources if s in self.stores]
+
+    def _fan_out(self, fn, sources: Optional[Iterable[str]] = None) -> list:
+        """Run fn(source, store) on the selected shards, in parallel when there are several"""
+        selected = self._selected(sources)
+        if len(selected) <= 1:
+            return [fn(source, store) for source, store in selected]
+        return list(self._executor.map(lambda item: fn(*item), selected))
+
+    def add(self, source: str, documents: list, ids: List[str], batch_size: int, staged: bool = False) -> None:
+        """
+        Add documents in slices Chroma accepts (to the source's staging collection if
+        `staged`); caller persists once afterwards
+        """
+        store = self.staged[source] if staged else self.open(source)
+        for start in range(0, len(documents), batch_size):
+            store.add_documents(documents[start:start + batch_size], ids=ids[start:start + batch_size])
+
+    def delete(self, source: str, ids: List[str]) -> None:
+        if source in self.stores and ids:
+            self.stores[source].delete(ids=ids)
+
+    def drop(self, source: str) -> None:
+        """Delete a whole shard"""
+        self.stores.pop(source, None)
+        self._delete_collection(shard_name(source))
+
+    def _delete_collection(self, name: str) -> None:
+        try:
+            self.client.delete_collection(name)
+        except Exception:
+            pass  # never created
+
+    def persist(self, sources: Optional[Iterable[str]] = None) -> None:
+        for _, store in self._selected(sources):
+            store.persist()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def count(self, sources: Optional[Iterable[str]] = None) -> int:
+        return sum(self._fan_out(lambda _, store: store._collection.count(), sources))
+
+    def counts(self) -> Dict[str, int]:
+        return {source: store._collection.count() for source, store in self.stores.items()}
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None,
+            sources: Optional[Iterable[str]] = None) -> dict:
+        """Chroma get() merged across shards: {"ids", "documents", "metadatas", "embeddings"}"""
+        include = include or []
+        merged = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        kwargs = {"include": include}
+        if ids is not None:
+            kwargs["ids"] = ids
+        for found in self._fan_out(lambda _, store: store._collection.get(**kwargs), sources):
+            merged["ids"].extend(found["ids"])
+            for key in ("documents", "metadatas", "embeddings"):
+                if key in include:
+                    merged[key].extend(found[key])
+        return merged
+
+    def query(self, embedding: List[float], k: int, sources: Optional[Iterable[str]] = None) -> List[str]:
+        """Top-k ids over the selected shards, merged by distance"""
+        def search(_, store):
+            available = store._collection.count()
+            if not available:
+                return []
+            result = store._collection.query(
+                query_embeddings=[embedding], n_results=min(k, available), include=["distances"]
+            )
+            return list(zip(result["ids"][0], result["distances"][0]))
+
+        hits = [hit for shard_hits in self._fan_out(search, sources) for hit in shard_hits]
+        hits.sort(key=lambda hit: hit[1])
+        return [doc_id for doc_id, _ in hits[:k]]
@@ -0,0 +1,115 @@
+"""
+Single-flight coalescing of identical concurrent requests
+The first caller for a key runs the work; callers arriving with the same key while it
+is in flight await the same result instead of starting their own. The work runs as its
+own task, so a caller that disconnects (is cancelled) doesn't cancel it for the others.
+Streamed work is shared the same way: every caller gets all items from the start.
+"""
+
+import asyncio
+import contextlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class _Broadcast:
+    """Items of one shared stream so far, and the callers still reading them"""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.error: Optional[BaseException] = None
+        self.finished = False
+        self.listeners = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def changed(self) -> None:
+        await self._changed.wait()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of fn() for this key, shared with every concurrent caller of the same key"""
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark a failure as retrieved: if every caller was cancelled, nobody else will
+        if not task.cancelled():
+            task.exception()
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Items of fn() for this key, shared with every concurrent caller of the same key;
+        a caller joining late first gets the items it missed. Unlike do(), the work is
+        cancelled once its last caller stops reading, as a lone stream would be.
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            self.leaders += 1
+            flight = self._streams[key] = _Broadcast()
+            flight.task = asyncio.ensure_future(self._produce(key, flight, fn))
+        else:
+            self.coalesced += 1
+        flight.listeners += 1
+        sent = 0
+        try:
+            while True:
+                if sent < len(flight.items):
+                    sent += 1
+                    yield flight.items[sent - 1]
+                elif flight.finished:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    await flight.changed()
+        finally:
+            flight.listeners -= 1
+            if not flight.listeners and not flight.finished:
+                flight.task.cancel()
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+
+    async def _produce(self, key: Hashable, flight: _Broadcast, fn: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async with contextlib.aclosing(fn()) as items:
+                async for item in items:
+                    flight.items.append(item)
+                    flight.notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.finished = True
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+            flight.notify()
+
+    def stats(self) -> dict:
+        calls = self.leaders + self.coalesced
+        return {
+            "calls": calls,
+            "executed": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / calls, 4) if calls else 0.0,
+            "in_flight": len(self._in_flight) + len(self._streams),
+        }
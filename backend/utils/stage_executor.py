@@ -0,0 +1,100 @@
+"""
+Deadline-bounded executor for blocking request stages
+Runs a blocking call (embedding, vector search, ...) in a small thread pool so it
+never stalls the event loop, and gives up waiting after a deadline. A timed-out call
+keeps its worker until it finishes, so the number of calls in flight is capped too:
+past the cap new calls are rejected at once instead of queueing behind stuck ones.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class StageOverloaded(RuntimeError):
+    """Raised when a stage already has max_in_flight calls running"""
+
+
+class StageExecutor:
+    def __init__(self, name: str, max_workers: int, timeout: float, max_in_flight: Optional[int] = None):
+        """
+        Args:
+            name: Stage name (worker thread prefix, stats)
+            max_workers: Threads running the blocking calls
+            timeout: Default deadline in seconds (0 = wait indefinitely)
+            max_in_flight: Calls allowed running or queued at once (default 2 × workers)
+        """
+        self.name = name
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight or max_workers * 2
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.calls = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.errors = 0
+        self._finished = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _release(self, started: float) -> None:
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._in_flight -= 1
+            self._finished += 1
+            self._total_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """
+        Await fn(*args) on the pool
+
+        Raises:
+            StageOverloaded: max_in_flight calls are already running
+            asyncio.TimeoutError: the deadline passed (the call keeps running)
+        """
+        with self._lock:
+            self.calls += 1
+            if self._in_flight >= self.max_in_flight:
+                self.rejected += 1
+                raise StageOverloaded(f"{self.name}: {self._in_flight} calls in flight")
+            self._in_flight += 1
+
+        started = time.monotonic()
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._release(started))
+        deadline = self.timeout if timeout is None else timeout
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), deadline or None)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self._finished
+            return {
+                "timeout_seconds": self.timeout,
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "calls": self.calls,
+                "completed": self.completed,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                # Worker-side duration, including calls that outlived their deadline
+                "avg_ms": round(self._total_seconds * 1000 / finished, 2) if finished else 0.0,
+                "max_ms": round(self._max_seconds * 1000, 2),
+            }
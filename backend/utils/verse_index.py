@@ -0,0 +1,162 @@
+"""
+Chapter/verse structural index for the Bhagavad Gita text
+The extracted book prints each translation followed by a "(chapter.verse)" marker,
+e.g. "... never to its fruits. (2.47)". Parsing those gives a chapter → verse → span
+map, so explicit references like "Chapter 2 Verse 47" are answered by lookup
+instead of semantic search, and chunks can be tagged with the verse they belong to.
+"""
+
+import bisect
+import json
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+# Verses per chapter (700-verse recension used by the book)
+VERSE_COUNTS = [47, 72, 43, 42, 29, 47, 30, 28, 34, 42, 55, 20, 35, 27, 20, 24, 28, 78]
+
+# Translation marker(s) at the end of a line: "(2.47)", "(1.4-6)", "(1.21) (1.22)", "(3.9)."
+_MARKER = r"\(\d{1,2}\.\d{1,2}(?:\s*[-–]\s*\d{1,2})?\)"
+MARKER_RE = re.compile(rf"(?:{_MARKER}\s*)+\.?[ \t]*$", re.MULTILINE)
+SINGLE_MARKER_RE = re.compile(r"\((\d{1,2})\.(\d{1,2})(?:\s*[-–]\s*(\d{1,2}))?\)")
+# Devanagari verse blocks (transliterated by the PDF extractor) end with "&& n &&"
+SANSKRIT_END_RE = re.compile(r"&&[^\n]*\n")
+# Running page headers/footers injected into the text by the PDF extraction
+PAGE_HEADER_RE = re.compile(r"^(?:\d+ The Bhagavad Gita|Chapter \d+ \d+)\s*$\n?", re.MULTILINE)
+
+REFERENCE_PATTERNS = [
+    # "chapter 2 verse 47", "chapter 2, verse 47", "ch. 2 v. 47", "chapter 2 sloka 47"
+    re.compile(r"\bch(?:apter|\.)?\s*(\d{1,2})\s*[,:]?\s*(?:verse|v\.?|sloka|shloka)\s*(\d{1,2})\b", re.I),
+    # "BG 2.47", "gita 2:47", "verse 2.47", "Gita (2.47)"; a bare "(2.5)" is too often
+    # something else ("(2.5) hours") to skip retrieval for
+    re.compile(r"\b(?:bg|gita|verse|sloka|shloka)\s*\(?(\d{1,2})[.:](\d{1,2})\b", re.I),
+]
+
+
+def is_valid_verse(chapter: int, verse: int) -> bool:
+    return 1 <= chapter <= len(VERSE_COUNTS) and 1 <= verse <= VERSE_COUNTS[chapter - 1]
+
+
+def parse_verse_reference(query: str) -> Optional[Tuple[int, int]]:
+    """Find an explicit chapter/verse reference in a user message"""
+    for pattern in REFERENCE_PATTERNS:
+        for match in pattern.finditer(query):
+            chapter, verse = int(match.group(1)), int(match.group(2))
+            if is_valid_verse(chapter, verse):
+                return chapter, verse
+    return None
+
+
+def _clean(span_text: str) -> str:
+    return " ".join(PAGE_HEADER_RE.sub("", span_text).split())
+
+
+def parse_verses(text: str) -> Dict[Tuple[int, int], dict]:
+    """
+    Locate every verse translation in the book text
+
+    Markers are accepted only in reading order (chapter never goes back, never
+    skips ahead by more than one), which filters out the cross-references found
+    in the introduction and commentary.
+
+    Returns:
+        {(chapter, verse): {"start": int, "end": int, "text": str}}
+    """
+    sanskrit_ends = [m.end() for m in SANSKRIT_END_RE.finditer(text)]
+    verses: Dict[Tuple[int, int], dict] = {}
+    last = (1, 0)
+    prev_end = 0
+    for match in MARKER_RE.finditer(text):
+        markers = SINGLE_MARKER_RE.findall(match.group(0))
+        chapter, first = int(markers[0][0]), int(markers[0][1])
+        last_chapter, last_verse = int(markers[-1][0]), int(markers[-1][2] or markers[-1][1])
+        if last_chapter != chapter:
+            continue
+        if not (is_valid_verse(chapter, first) and is_valid_verse(chapter, last_verse)):
+            continue
+        if not verses and (chapter, first) != (1, 1):
+            continue
+        if verses and not ((chapter == last[0] and first > last[1]) or (chapter == last[0] + 1 and first <= 2)):
+            continue
+
+        # The translation starts after the Sanskrit block or the previous marker
+        i = bisect.bisect_right(sanskrit_ends, match.start()) - 1
+        start = max(prev_end, sanskrit_ends[i] if i >= 0 else 0)
+        end = match.start()
+        entry = {"start": start, "end": end, "text": _clean(text[start:end])}
+        for verse in range(first, last_verse + 1):
+            verses[(chapter, verse)] = entry
+        last = (chapter, last_verse)
+        prev_end = match.end()
+    return verses
+
+
+class VerseIndex:
+    """Verse lookups and span → verse tagging over one or more parsed sources"""
+
+    def __init__(self):
+        # source name → {"sha256": str, "verses": {(c, v): entry}}
+        self.sources: Dict[str, dict] = {}
+        self._starts: Dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return sum(len(s["verses"]) for s in self.sources.values())
+
+    def set_source(self, source: str, sha256: str, verses: Dict[Tuple[int, int], dict]) -> None:
+        self.sources[source] = {"sha256": sha256, "verses": verses}
+        self._starts[source] = sorted((entry["start"], key) for key, entry in verses.items())
+
+    def drop_source(self, source: str) -> None:
+        self.sources.pop(source, None)
+        self._starts.pop(source, None)
+
+    def lookup(self, chapter: int, verse: int) -> Optional[dict]:
+        """O(1) verse lookup: {"source", "chapter", "verse", "text"} or None"""
+        for source, data in self.sources.items():
+            entry = data["verses"].get((chapter, verse))
+            if entry:
+                return {"source": source, "chapter": chapter, "verse": verse, "text": entry["text"]}
+        return None
+
+    def locate(self, source: str, start: int, end: int, max_gap: int = 6000) -> Optional[Tuple[int, int]]:
+        """
+        Verse a text span belongs to: the last verse starting before the span ends
+        (commentary after a translation belongs to that verse), unless the span
+        lies more than `max_gap` characters past it, e.g. in the appendices
+        """
+        starts = self._starts.get(source)
+        if not starts:
+            return None
+        i = bisect.bisect_left(starts, (end,)) - 1
+        if i < 0:
+            return None
+        key = starts[i][1]
+        if start - self.sources[source]["verses"][key]["end"] > max_gap:
+            return None
+        return key
+
+    def save(self, path: str) -> None:
+        data = {
+            source: {
+                "sha256": entry["sha256"],
+                "verses": {f"{c}.{v}": e for (c, v), e in entry["verses"].items()},
+            }
+            for source, entry in self.sources.items()
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VerseIndex":
+        index = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for source, entry in data.items():
+            verses = {}
+            for key, e in entry["verses"].items():
+                chapter, verse = key.split(".")
+                verses[(int(chapter), int(verse))] = e
+            index.set_source(source, entry["sha256"], verses)
+        return index
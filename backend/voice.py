@@ -3,6 +3,7 @@ import os
 import requests
 import base64
 from dotenv import load_dotenv
+from services import simulated
 try:
     from elevenlabs.client import ElevenLabs
     from elevenlabs import save
@@ -13,12 +14,18 @@ load_dotenv()
 
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 
+# Local stand-in for load testing (SIMULATE_PROVIDERS=tts)
+_simulated_tts = simulated.SimulatedTTS() if simulated.enabled("tts") else None
+
 def generate_voice_bytes(text: str, reference_path: str = "data/reference_voice.m4a"):
     """
     Generates audio bytes for the given text.
     Attempts to use ElevenLabs for cloning if key is available.
     """
     print(f"Generating voice for: {text[:20]}...")
+
+    if _simulated_tts is not None:
+        return _simulated_tts.generate(text)
     
     # 1. Try ElevenLabs
     if ELEVENLABS_API_KEY and ElevenLabs:
@@ -6,6 +6,12 @@ export interface ChatResponse {
   audio?: string;
 }
 
+export interface StreamHandlers {
+  onToken?: (text: string) => void;
+  onSentiment?: (sentiment: string) => void;
+  onAudio?: (audio: string | null) => void;
+}
+
 export interface ChatHistoryItem {
   id: number;
   content: string;
@@ -48,18 +54,104 @@ export async function sendMessage(message: string): Promise<ChatResponse> {
     return response.json();
   } catch (error: any) {
     clearTimeout(timeoutId);
+    throw toConnectionError(error);
+  }
+}
+
+// Handle specific error types for better UX debugging
+function toConnectionError(error: any): Error {
+  if (error.name === 'AbortError') {
+    return new Error('Divine connection timed out. Please try again.');
+  }
+
+  if (error instanceof TypeError && error.message.includes('fetch')) {
+    console.error("Connection Failed: Please ensure the backend is running.", error);
+    return new Error('Connection failed. Please ensure the backend is running at http://localhost:8000');
+  }
+
+  return error;
+}
+
+/**
+ * Streaming variant of sendMessage over Server-Sent Events (POST /chat/stream).
+ * Reply pieces are passed to onToken as they are generated; sentiment and audio
+ * follow once the reply is complete. The 30s timeout only fires if the stream
+ * goes silent, so long answers are no longer cut off.
+ */
+export async function streamMessage(message: string, handlers: StreamHandlers = {}): Promise<ChatResponse> {
+  const controller = new AbortController();
+  let timeoutId = setTimeout(() => controller.abort(), 30000);
+  const resetTimeout = () => {
+    clearTimeout(timeoutId);
+    timeoutId = setTimeout(() => controller.abort(), 30000);
+  };
+  const result: ChatResponse = { reply: '', sentiment: 'neutral' };
 
-    // Handle specific error types for better UX debugging
-    if (error.name === 'AbortError') {
-      throw new Error('Divine connection timed out. Please try again.');
+  try {
+    const response = await fetch(`${API_URL}/chat/stream`, {
+      method: 'POST',
+      headers: getAuthHeader(),
+      body: JSON.stringify({ message }),
+      signal: controller.signal
+    });
+
+    if (!response.ok || !response.body) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || `Server error: ${response.status}`);
     }
 
-    if (error instanceof TypeError && error.message.includes('fetch')) {
-      console.error("Connection Failed: Please ensure the backend is running.", error);
-      throw new Error('Connection failed. Please ensure the backend is running at http://localhost:8000');
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      resetTimeout();
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line: "event: <name>\ndata: <json>\n\n"
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary >= 0) {
+        const raw = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        let event = 'message';
+        let data = '';
+        for (const line of raw.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        const payload = data ? JSON.parse(data) : {};
+
+        switch (event) {
+          case 'token':
+            result.reply += payload.text;
+            handlers.onToken?.(payload.text);
+            break;
+          case 'sentiment':
+            result.sentiment = payload.sentiment;
+            handlers.onSentiment?.(payload.sentiment);
+            break;
+          case 'audio':
+            result.audio = payload.audio ?? undefined;
+            handlers.onAudio?.(payload.audio ?? null);
+            break;
+          case 'done':
+            result.reply = payload.reply;
+            break;
+          case 'error':
+            throw new Error(payload.message);
+        }
+      }
     }
 
-    throw error;
+    clearTimeout(timeoutId);
+    return result;
+  } catch (error: any) {
+    clearTimeout(timeoutId);
+    throw toConnectionError(error);
   }
 }
 
@@ -4,7 +4,7 @@ import ChatMessage from "@/components/ChatMessage";
 import ChatInput from "@/components/ChatInput";
 import TopMenu from "@/components/TopMenu";
 import MentalHealthGraph from "@/components/MentalHealthGraph";
-import { sendMessage, getChatHistory, clearChatHistory } from "@/lib/api";
+import { streamMessage, getChatHistory, clearChatHistory } from "@/lib/api";
 import { welcomeMessage } from "@/lib/abimanyu-responses";
 import { useAuth } from "@/lib/AuthContext";
 import { LogOut, Trash2, X } from "lucide-react";
@@ -70,15 +70,32 @@ const Index = () => {
       window.speechSynthesis.cancel();
     }
 
+    const abimanyuId = `abimanyu-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`;
+    let started = false;
+
     try {
-      const response = await sendMessage(text);
+      // Show the reply as it is generated instead of waiting for all of it
+      const response = await streamMessage(text, {
+        onToken: (chunk) => {
+          if (!started) {
+            started = true;
+            setIsTyping(false);
+            setMessages(prev => [...prev, { id: abimanyuId, text: chunk, isAbimanyu: true }]);
+          } else {
+            setMessages(prev => prev.map(m => m.id === abimanyuId ? { ...m, text: m.text + chunk } : m));
+          }
+        }
+      });
+
       const abimanyuMessage: Message = {
-        id: `abimanyu-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`,
+        id: abimanyuId,
         text: response.reply,
         isAbimanyu: true
       };
-
-      setMessages(prev => [...prev, abimanyuMessage]);
+      setMessages(prev => started
+        ? prev.map(m => m.id === abimanyuId ? abimanyuMessage : m)
+        : [...prev, abimanyuMessage]
+      );
 
       // Use Web Speech API to speak the response
       if ('speechSynthesis' in window) {